@@ -1,178 +1,1372 @@
 # import the necessary packages
 import os
 import sys
-import glob
 import re
 import ast
-from typing import Tuple
+import abc
+import argparse
+import configparser
+import hashlib
+import io
+import json
+import signal
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import tokenize
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import attrgetter
+from pathlib import PurePath
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+# Pattern of the header of a unified diff hunk, with the first line and the number of lines of the new version
+DIFF_HUNK_PATTERN = re.compile(r"@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# Size of the buffer of the report stream, large reports are written in big blocks
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+class Finding:
+    """Represents one issue found in a file: where it is (path, line, column), its code and its message."""
+
+    __slots__ = ("path", "line", "column", "code", "message")
+
+    def __init__(self, path: str, line: int, column: int, code: str, message: str):
+        """The initializer for the class.
 
+        Keyword arguments:
+        path -- Name of the file
+        line -- Number of the line, starting at 1
+        column -- Number of the column, starting at 1
+        code -- Code of the rule (e.g. S001)
+        message -- Description of the issue
+        """
+
+        self.path = path
+        self.line = line
+        self.column = column
+        self.code = code
+        self.message = message
+
+    def __reduce__(self):
+        """Pickle the finding as a plain tuple of its fields, it is sent back from the worker processes."""
+
+        return Finding, (self.path, self.line, self.column, self.code, self.message)
+
+    def __eq__(self, other) -> bool:
+        """Check if two findings have the same fields."""
+
+        return isinstance(other, Finding) and self.fields() == other.fields()
+
+    def __repr__(self) -> str:
+        """Return the representation of the finding."""
+
+        return f"Finding{self.fields()!r}"
+
+    def __str__(self) -> str:
+        """Return the finding in the text report format."""
+
+        return f"{self.path}: Line {self.line}: {self.code} {self.message}"
+
+    def fields(self) -> Tuple[str, int, int, str, str]:
+        """Return the fields of the finding as a tuple."""
+
+        return self.path, self.line, self.column, self.code, self.message
+
+
+class Rule:
+    """Represents a rule of the registry: its code, its description and the function that checks it.
+
+    A line rule (node_types is None) is called with the scanner and the text of each line and returns None or a
+    (column, message) tuple. It is only called for the lines that contain one of its triggers, if it has any.
+    An AST rule is called with the analyzer and each node of one of its node types and yields
+    (line, column, message) tuples.
+    """
+
+    def __init__(self, code: str, description: str, check: Callable, triggers: Optional[Tuple[str, ...]] = None,
+                 node_types: Optional[Tuple[type, ...]] = None):
+        """The initializer for the class.
+
+        Keyword arguments:
+        code -- Code of the rule (e.g. S001)
+        description -- Short description of the issue
+        check -- Function that checks a line or an AST node
+        triggers -- Substrings that a line must contain for the rule to be checked, None checks every line
+        node_types -- AST node types checked by the rule, None for a line rule
+        """
+
+        self.code = code
+        self.description = description
+        self.check = check
+        self.triggers = triggers
+        self.node_types = node_types
 
-class MaxLineLengthError(Exception):
-    """Return the error code and description when a line exceeds the max line length according to PEP8."""
+
+class RuleRegistry:
+    """Registry of the line and AST rules, they register themselves with the line_rule and ast_rule decorators."""
 
     def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+        """The initializer for the class."""
+
+        self.rules = {}
+
+    def register(self, rule: Rule):
+        """Add a rule to the registry.
+
+        Keyword arguments:
+        rule -- Rule to add, its code must be unique
+        """
+
+        if rule.code in self.rules:
+            raise ValueError(f"The rule {rule.code} is already registered")
+        self.rules[rule.code] = rule
+
+    def line_rule(self, code: str, description: str, triggers: Optional[Tuple[str, ...]] = None) -> Callable:
+        """Return a decorator that registers a function as a line rule.
+
+        Keyword arguments:
+        code -- Code of the rule (e.g. S001)
+        description -- Short description of the issue
+        triggers -- Substrings that a line must contain for the rule to be checked, None checks every line
+        """
+
+        def decorator(check: Callable) -> Callable:
+            self.register(Rule(code, description, check, triggers=triggers))
+            return check
+
+        return decorator
+
+    def ast_rule(self, code: str, description: str, node_types: Tuple[type, ...]) -> Callable:
+        """Return a decorator that registers a function as an AST rule.
+
+        Keyword arguments:
+        code -- Code of the rule (e.g. S010)
+        description -- Short description of the issue
+        node_types -- AST node types checked by the rule (FunctionDef, AsyncFunctionDef or ClassDef)
+        """
+
+        def decorator(check: Callable) -> Callable:
+            self.register(Rule(code, description, check, node_types=node_types))
+            return check
+
+        return decorator
+
+    def select(self, select: Optional[Iterable[str]] = None, ignore: Iterable[str] = ()) -> List[Rule]:
+        """Return the enabled rules sorted by code.
+
+        Keyword arguments:
+        select -- Codes or code prefixes of the enabled rules (e.g. S00), every rule is enabled if it is None
+        ignore -- Codes or code prefixes of the disabled rules, they win over the selected ones
+        """
+
+        select = tuple(select) if select is not None else ("",)
+        ignore = tuple(ignore)
+        return [rule for code, rule in sorted(self.rules.items())
+                if code.startswith(select) and not (ignore and code.startswith(ignore))]
+
+
+# Registry of every rule of the analyzer
+RULES = RuleRegistry()
+
+# Node types of the function rules
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# Patterns of the rules, compiled once
+SEMICOLON_PATTERN = re.compile(r";\s*$|;(\s*#.*)?$")
+SEMICOLON_IN_COMMENT_PATTERN = re.compile(r"#.*;\s*$")
+TODO_PATTERN = re.compile(r"#.* (todo)( .*)?$", flags=re.IGNORECASE)
+CONSTRUCTION_SPACES_PATTERN = re.compile(r"^ *(def|class) {2,}")
+CLASS_NAME_PATTERN = re.compile(r"\b(?<=class) +([a-z_]\w*|\w*_\w*)")
+FUNCTION_NAME_PATTERN = re.compile(r"\b(?<=def) +([A-Z]*\w*[A-Z]\w*)")
+NOT_SNAKE_CASE_PATTERN = re.compile(r"[A-Z]*\w*[A-Z]\w*")
+
+
+@RULES.line_rule("S001", "The line exceeds the max line length according to PEP8.")
+def check_line_length(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if the line length is according to PEP8 (max 79 characters).
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    if len(text) > scanner.max_line_length:
+        return scanner.max_line_length + 1, "Too long"
+
+
+@RULES.line_rule("S002", "The number of indentation spaces is not a multiple of 4.")
+def check_indentation(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if the number of indentation spaces is according to PEP8 (multiple of 4).
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    if text.startswith(" ") and (len(text) - len(text.lstrip(" "))) % scanner.indentation_size != 0:
+        return 1, "Invalid indentation"
+
+
+@RULES.line_rule("S003", "There is a semicolon after a statement.", triggers=(";",))
+def check_semicolons(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if there is an unnecessary semicolon after a statement.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Answer from the tokens of the file when they are available, they know the semicolons inside strings
+    tokens = scanner.tokens
+    if tokens is not None:
+        column = tokens.semicolons.get(scanner.line_number)
+        return (column + 1, "Unnecessary semicolon") if column is not None else None
+
+    # Detect a semicolon in the end of the line, followed or not by an inline comment
+    match = SEMICOLON_PATTERN.search(text)
+
+    # Detect if the semicolon is inside an inline comment
+    if match and not SEMICOLON_IN_COMMENT_PATTERN.search(text):
+        return match.start() + 1, "Unnecessary semicolon"
+
+
+@RULES.line_rule("S004", "There are less than 2 spaces before an inline comment.", triggers=("#",))
+def check_comment_spaces(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    r"""Check if the number of spaces before inline comments is according to PEP8 (min 2).
+
+    This is the string search version of the patterns r"^.+\S ?#" (comment with less than 2 spaces to the code)
+    and r" {2}#.*#" (# inside a well spaced inline comment), which backtrack over the whole line.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Answer from the tokens of the file when they are available, they know the # inside strings
+    tokens = scanner.tokens
+    if tokens is not None:
+        comment = tokens.comments.get(scanner.line_number)
+        code_end = tokens.code_ends.get(scanner.line_number)
+        if comment is not None and code_end is not None and comment[0] - code_end < scanner.min_comment_space:
+            return comment[0] + 1, "At least two spaces required before inline comments"
+        return None
+
+    # Detect if the # is inside an inline comment
+    comment = text.find("  #")
+    if comment != -1 and text.find("#", comment + 3) != -1:
+        return None
+
+    # Detect the last # with code right before it, or code and one space, as the greedy pattern does
+    position = text.rfind("#")
+    while position >= 2:
+        if not text[position - 1].isspace() or \
+                (text[position - 1] == " " and position >= 3 and not text[position - 2].isspace()):
+            return position + 1, "At least two spaces required before inline comments"
+        position = text.rfind("#", 0, position)
+
+
+@RULES.line_rule("S005", "A TODO was found in a comment.", triggers=("#",))
+def check_todo_comments(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if there are TODOs inside comments.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Only search the comment of the line when the tokens of the file are available
+    tokens = scanner.tokens
+    if tokens is not None:
+        comment = tokens.comments.get(scanner.line_number)
+        if comment is None or "todo" not in comment[1].lower():
+            return None
+        match = TODO_PATTERN.search(comment[1])
+        return (comment[0] + match.start(1) + 1, "TODO found") if match else None
+
+    # Skip the pattern, which backtracks over long lines, when there is no TO DO at all
+    if "todo" not in text.lower():
+        return None
+
+    # Detect a TO DO inside an inline comment
+    match = TODO_PATTERN.search(text)
+    if match:
+        return match.start(1) + 1, "TODO found"
+
+
+@RULES.line_rule("S006", "More than 2 blank lines were found before a code line.")
+def check_blank_lines(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if more than 2 blank lines were found before a code line.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    if scanner.blank_count > scanner.max_blank_lines and text.strip():
+        return 1, "More than two blank lines used before this line"
+
+
+@RULES.line_rule("S007", "There is more than 1 space after the construction name (def or class).",
+                 triggers=("def", "class"))
+def check_construction_spaces(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if the number of spaces after a construction name is according to PEP8 (max 1).
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Detect more than 1 space after a construction_name
+    match = CONSTRUCTION_SPACES_PATTERN.search(text)
+    if match:
+        return match.start(1) + 1, f"Too many spaces after '{match.group().strip()}'"
+
+
+@RULES.line_rule("S008", "The class name is not in CamelCase.", triggers=("class",))
+def check_class_name(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if a given class name is in CamelCase.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Detect if a class_name is not in CamelCase
+    match = CLASS_NAME_PATTERN.search(text)
+    if match:
+        return match.start(1) + 1, f"Class name '{match.group().strip()}' should use CamelCase"
+
+
+@RULES.line_rule("S009", "The function name is not in snake_case.", triggers=("def",))
+def check_function_name(scanner: "LineScanner", text: str) -> Optional[Tuple[int, str]]:
+    """Check if a given function name is in snake_case.
+
+    Keyword arguments:
+    scanner -- Scanner that holds the settings and the state of the file
+    text -- Text of the line
+    """
+
+    # Detect if a function_name is not in snake_case
+    match = FUNCTION_NAME_PATTERN.search(text)
+    if match:
+        return match.start(1) + 1, f"Function name '{match.group().strip()}' should use snake_case"
+
+
+@RULES.ast_rule("S010", "A function argument name is not in snake_case.", FUNCTION_NODES)
+def check_function_args_names(analyzer: "StaticCodeAnalyzer", node: ast.AST) -> Iterator[Tuple[int, int, str]]:
+    """Check if the arguments names of a function are in snake_case, only the first wrong one is reported.
+
+    Keyword arguments:
+    analyzer -- Analyzer of the file
+    node -- AST tree object of the function
+    """
+
+    for arg in node.args.args:
+        # Detect if arg_name is not in snake_case
+        if NOT_SNAKE_CASE_PATTERN.search(arg.arg):
+            yield node.lineno, arg.col_offset + 1, f"Argument name '{arg.arg}' should be snake_case"
+            return
+
+
+@RULES.ast_rule("S011", "A variable name inside a function is not in snake_case.", FUNCTION_NODES)
+def check_function_var_names(analyzer: "StaticCodeAnalyzer", node: ast.AST) -> Iterator[Tuple[int, int, str]]:
+    """Check if variables names inside functions are in snake_case.
+
+    Keyword arguments:
+    analyzer -- Analyzer of the file
+    node -- AST tree object of the function
+    """
+
+    # Set used to avoid analyzing the same variable in different assignment statements
+    var_checked = set()
+
+    # Iterate over each assignment of the function body
+    for a in node.body:
+        if not isinstance(a, ast.Assign):
+            continue
+
+        if isinstance(a.targets[0], ast.Name):
+            var_name = a.targets[0].id
+        elif isinstance(a.targets[0], ast.Attribute):
+            var_name = a.targets[0].attr
+        else:
+            continue
+
+        # If the variable wasn't analyzed yet, detect if var_name is not in snake_case
+        if var_name not in var_checked and NOT_SNAKE_CASE_PATTERN.search(var_name):
+            # Update the checked variables set
+            var_checked.add(var_name)
+            yield a.lineno, a.col_offset + 1, f"Variable '{var_name}' in function should be snake_case"
+
+
+@RULES.ast_rule("S012", "A function argument has a mutable object as default value.", FUNCTION_NODES)
+def check_function_args_mutable(analyzer: "StaticCodeAnalyzer", node: ast.AST) -> Iterator[Tuple[int, int, str]]:
+    """Check if a function has mutable default values, it is reported once per function.
+
+    Keyword arguments:
+    analyzer -- Analyzer of the file
+    node -- AST tree object of the function
+    """
+
+    for arg in node.args.defaults:
+        # Detect if the default value is a list, a dict or a set
+        if isinstance(arg, (ast.List, ast.Dict, ast.Set)):
+            yield node.lineno, arg.col_offset + 1, "Default argument value is mutable"
+            return
+
+
+class RuleProfile:
+    """Cumulative time, number of calls and number of hits of each rule, collected with --profile."""
+
+    def __init__(self):
+        """The initializer for the class."""
+
+        # [calls, hits, seconds] of each rule code
+        self.stats = {}
+
+    def instrument(self, rule: Rule) -> Callable:
+        """Return the check function of a rule wrapped to update its statistics.
+
+        Keyword arguments:
+        rule -- Rule to instrument
+        """
+
+        stats = self.stats.setdefault(rule.code, [0, 0, 0.0])
+        check = rule.check
+
+        if rule.node_types is None:
+            def timed_check(*args):
+                start = time.perf_counter()
+                result = check(*args)
+                stats[2] += time.perf_counter() - start
+                stats[0] += 1
+                if result is not None:
+                    stats[1] += 1
+                return result
+        else:
+            def timed_check(*args):
+                # The AST rules are generators, they are consumed inside the timed block
+                start = time.perf_counter()
+                results = list(check(*args))
+                stats[2] += time.perf_counter() - start
+                stats[0] += 1
+                stats[1] += len(results)
+                return results
+
+        return timed_check
+
+    def take(self) -> Dict[str, List]:
+        """Return a copy of the statistics and reset them, used to send them from the worker processes."""
+
+        stats = {code: list(values) for code, values in self.stats.items()}
+        for values in self.stats.values():
+            values[:] = [0, 0, 0.0]
+        return stats
+
+    def merge(self, stats: Dict[str, List]):
+        """Add the statistics of another profile to this one.
+
+        Keyword arguments:
+        stats -- Statistics returned by take()
+        """
+
+        for code, (calls, hits, seconds) in stats.items():
+            values = self.stats.setdefault(code, [0, 0, 0.0])
+            values[0] += calls
+            values[1] += hits
+            values[2] += seconds
+
+    def report(self, stream: TextIO):
+        """Write the statistics of each rule, the most expensive first.
+
+        Keyword arguments:
+        stream -- Text stream where the report is written
+        """
+
+        stream.write(f"{'Rule':<6}{'Calls':>12}{'Hits':>12}{'Time (ms)':>12}{'us/call':>10}\n")
+        for code, (calls, hits, seconds) in sorted(self.stats.items(), key=lambda item: -item[1][2]):
+            per_call = seconds * 1e6 / calls if calls else 0.0
+            stream.write(f"{code:<6}{calls:>12}{hits:>12}{seconds * 1000:>12.1f}{per_call:>10.2f}\n")
+
+
+class TokenIndex:
+    """Comments, statement-ending semicolons and statement starts of a file, found by the tokenize module.
+
+    The line rules answer from it with a dictionary lookup, and unlike their patterns it knows which # and ;
+    are inside strings. A TokenError or a SyntaxError is raised if the file can't be tokenized.
+    """
+
+    # Tokens that are not code
+    LAYOUT_TOKENS = frozenset((tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+                               tokenize.ENDMARKER))
+
+    def __init__(self, source_text: str):
+        """The initializer for the class, tokenize the file once.
+
+        Keyword arguments:
+        source_text -- Text of the file
+        """
+
+        # (column, text) of the comment of each line
+        self.comments = {}
+
+        # Column right after the last code token of each line, to measure the spaces before an inline comment
+        self.code_ends = {}
+
+        # Column of the semicolon that ends the last statement of each line
+        self.semicolons = {}
+
+        # Sorted lines where a logical line starts, never inside a string or between brackets
+        self.statement_starts = []
+
+        last = None
+        new_statement = True
+        for token in tokenize.generate_tokens(io.StringIO(source_text).readline):
+            kind = token.type
+            if new_statement and kind not in self.LAYOUT_TOKENS:
+                self.statement_starts.append(token.start[0])
+                new_statement = False
+
+            if kind == tokenize.COMMENT:
+                self.comments[token.start[0]] = (token.start[1], token.string)
+            elif kind == tokenize.NEWLINE:
+                new_statement = True
+                if last is not None and last.type == tokenize.OP and last.string == ";":
+                    self.semicolons[last.start[0]] = last.start[1]
+            elif kind not in self.LAYOUT_TOKENS:
+                self.code_ends[token.end[0]] = token.end[1]
+                last = token
+                continue
+
+            # A statement only ends with a semicolon when it is the last code token before the NEWLINE
+            if kind != tokenize.COMMENT and kind != tokenize.NL:
+                last = None
+
+
+class LineScanner:
+    """Single-pass engine that runs every enabled line rule while visiting each line only once."""
+
+    def __init__(self, analyzer: "StaticCodeAnalyzer"):
+        """The initializer for the class, copy the rule settings from the analyzer.
+
+        Keyword arguments:
+        analyzer -- Analyzer that owns the settings (max line length, indentation size, ...) and the rules
+        """
+
+        self.max_line_length = analyzer.MAX_LINE_LENGTH
+        self.indentation_size = analyzer.INDENTATION_SIZE
+        self.max_blank_lines = analyzer.MAX_BLANK_LINES
+        self.min_comment_space = analyzer.MIN_INLINE_COMMENT_SPACE
+
+        # Number of consecutive blank lines before the current line
+        self.blank_count = 0
+
+        # Number of the current line and tokens of the file, None when the rules use their patterns
+        self.line_number = 0
+        self.tokens = None
+
+        # Consecutive rules with the same triggers are grouped, so each group costs one substring test per line
+        self.groups = []
+        for rule in analyzer.rules:
+            if rule.node_types is not None:
+                continue
+
+            check = analyzer.profile.instrument(rule) if analyzer.profile else rule.check
+            if self.groups and self.groups[-1][0] == rule.triggers:
+                self.groups[-1][1].append((rule.code, check))
+            else:
+                self.groups.append((rule.triggers, [(rule.code, check)]))
+
+    def scan(self, lines: Iterable[str], file_name: str = "", first_line: int = 1, blank_count: int = 0,
+             tokens: Optional[TokenIndex] = None) -> Iterator[Finding]:
+        """Check every line once and yield the issues found.
+
+        A rule with triggers is only called when the line contains one of them, so most lines are settled with a
+        few substring tests. The issues of one line are yielded in the order of their codes.
+
+        Keyword arguments:
+        lines -- Lines of the file, with their line endings
+        file_name -- Name of the file, used as the path of the findings
+        first_line -- Number of the first line, when only a part of the file is checked
+        blank_count -- Number of consecutive blank lines right before the first line
+        tokens -- Tokens of the whole file, the comment and semicolon rules use their patterns if it is None
+        """
+
+        groups = self.groups
+        self.blank_count = blank_count
+        self.tokens = tokens
+
+        for line_number, text in enumerate(lines, first_line):
+            self.line_number = line_number
+            for triggers, checks in groups:
+                # Skip the group if the line contains none of its triggers
+                if triggers is not None:
+                    for trigger in triggers:
+                        if trigger in text:
+                            break
+                    else:
+                        continue
+
+                for code, check in checks:
+                    result = check(self, text)
+                    if result is not None:
+                        yield Finding(file_name, line_number, result[0], code, result[1])
+
+            # Update the blank line count for the next line
+            self.blank_count = self.blank_count + 1 if text.strip() == "" else 0
+
+
+class IgnoreRule:
+    """Represents one .gitignore-style pattern, relative to the directory where it was defined."""
+
+    def __init__(self, pattern: str, base: str = ""):
+        """The initializer for the class, translate the pattern to a regular expression.
+
+        Keyword arguments:
+        pattern -- The .gitignore-style pattern (e.g. "build/", "*.pyc", "/docs", "!keep.py")
+        base -- Path of the directory of the pattern, relative to the analyzed root ("" for the root)
+        """
+
+        self.negated = pattern.startswith("!")
+        if self.negated:
+            pattern = pattern[1:]
+
+        # A trailing slash only matches directories
+        self.directory_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+
+        # A slash at the beginning or in the middle anchors the pattern to its base directory
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        self.base = base + "/" if base else ""
+        self.regex = re.compile(("" if anchored else "(?:.*/)?") + self.translate(pattern) + "$")
+
+    @staticmethod
+    def translate(pattern: str) -> str:
+        """Return the regular expression of a glob pattern where '*' and '?' don't match a '/'.
+
+        Keyword arguments:
+        pattern -- The glob pattern, without the negation and the trailing slash
+        """
+
+        regex = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                regex.append("(?:.*/)?")
+                i += 3
+            elif pattern.startswith("**", i):
+                regex.append(".*")
+                i += 2
+            elif pattern[i] == "*":
+                regex.append("[^/]*")
+                i += 1
+            elif pattern[i] == "?":
+                regex.append("[^/]")
+                i += 1
+            elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+                # Copy the character class, "[!...]" is the glob form of "[^...]"
+                end = pattern.index("]", i + 2)
+                content = pattern[i + 1:end].replace("\\", "\\\\")
+                regex.append("[^" + content[1:] + "]" if content.startswith("!") else "[" + content + "]")
+                i = end + 1
+            else:
+                regex.append(re.escape(pattern[i]))
+                i += 1
+        return "".join(regex)
+
+    def matches(self, relative_path: str, is_dir: bool) -> bool:
+        """Check if the rule matches a path.
+
+        Keyword arguments:
+        relative_path -- Path relative to the analyzed root, using '/' as separator
+        is_dir -- Flag that indicates if the path is a directory
+        """
+
+        if self.directory_only and not is_dir:
+            return False
+        if not relative_path.startswith(self.base):
+            return False
+        return self.regex.match(relative_path[len(self.base):]) is not None
+
+
+class FileFinder:
+    """Find the Python files of a directory, skipping the ignored files, virtualenvs and build directories."""
+
+    # Patterns that are always ignored, they can be re-included with a "!" pattern
+    DEFAULT_EXCLUDE = [
+        ".git/", ".hg/", ".svn/", "__pycache__/", ".tox/", ".nox/", ".venv/", "venv/", "env/",
+        ".mypy_cache/", ".pytest_cache/", "build/", "dist/", "*.egg-info/", "site-packages/", "node_modules/",
+    ]
+
+    # Name of the files with ignore patterns read in every visited directory
+    IGNORE_FILE_NAME = ".gitignore"
+
+    # File that marks the root of a virtualenv
+    VIRTUALENV_MARKER = "pyvenv.cfg"
+
+    def __init__(self, exclude: Iterable[str] = (), recursive: bool = True):
+        """The initializer for the class.
+
+        Keyword arguments:
+        exclude -- Extra .gitignore-style patterns, relative to the analyzed root
+        recursive -- Flag that indicates if the subdirectories should be visited
+        """
+
+        self.rules = [IgnoreRule(pattern) for pattern in self.DEFAULT_EXCLUDE + list(exclude)]
+        self.recursive = recursive
+
+    def read_ignore_file(self, file_name: str, base: str) -> List[IgnoreRule]:
+        """Return the rules of a .gitignore-style file, or an empty list if it can't be read.
+
+        Keyword arguments:
+        file_name -- Full name of the ignore file
+        base -- Path of the directory of the file, relative to the analyzed root
+        """
+
+        try:
+            with open(file_name, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return []
+
+        # Blank lines and comments are not patterns
+        return [IgnoreRule(line.strip(), base) for line in lines if line.strip() and not line.startswith("#")]
+
+    @staticmethod
+    def is_ignored(rules: List[IgnoreRule], relative_path: str, is_dir: bool) -> bool:
+        """Check if a path is ignored, the last matching rule decides.
+
+        Keyword arguments:
+        rules -- Ignore rules that apply to the directory of the path
+        relative_path -- Path relative to the analyzed root, using '/' as separator
+        is_dir -- Flag that indicates if the path is a directory
+        """
+
+        for rule in reversed(rules):
+            if rule.matches(relative_path, is_dir):
+                return not rule.negated
+        return False
+
+    def find(self, path_name: str) -> Iterator[str]:
+        """Yield the Python files of a directory in name order, as the tree is walked.
+
+        Keyword arguments:
+        path_name -- Full name of the directory to walk
+        """
+
+        yield from self.walk(path_name, "", self.rules)
+
+    def walk(self, directory: str, relative: str, rules: List[IgnoreRule]) -> Iterator[str]:
+        """Yield the Python files of a directory and, if recursive, of its subdirectories.
+
+        Keyword arguments:
+        directory -- Full name of the directory
+        relative -- Path of the directory relative to the analyzed root ("" for the root)
+        rules -- Ignore rules inherited from the parent directories
+        """
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            return
+
+        names = {entry.name for entry in entries}
+
+        # Skip virtualenvs that don't use one of the usual directory names
+        if relative and self.VIRTUALENV_MARKER in names:
+            return
+
+        # The patterns of the directory ignore file apply to everything below it
+        if self.IGNORE_FILE_NAME in names:
+            rules = rules + self.read_ignore_file(os.path.join(directory, self.IGNORE_FILE_NAME), relative)
+
+        for entry in entries:
+            relative_path = relative + "/" + entry.name if relative else entry.name
+
+            if entry.is_dir(follow_symlinks=False):
+                if self.recursive and not self.is_ignored(rules, relative_path, True):
+                    yield from self.walk(entry.path, relative_path, rules)
+            elif entry.name.endswith(".py") and entry.is_file():
+                if not self.is_ignored(rules, relative_path, False):
+                    yield entry.path
+
+
+class ResultCache:
+    """Persistent cache of the issues of each file, keyed by the hash of its content and the analyzer settings.
+
+    The cache is a SQLite database, so several processes can share it. Lookups touch the entries in memory and
+    the touches and new entries are written in one transaction by flush(). close() also evicts the least
+    recently used entries when the cache has more than max_entries.
+    """
+
+    # Default maximum number of files kept in the cache
+    MAX_ENTRIES = 100000
+
+    # Number of pending writes that trigger a flush
+    FLUSH_SIZE = 256
+
+    def __init__(self, file_name: str, settings_key: str, max_entries: int = MAX_ENTRIES):
+        """The initializer for the class, open or create the cache database.
+
+        Keyword arguments:
+        file_name -- Full name of the cache database file
+        settings_key -- Text that identifies the analyzer version and rule settings
+        max_entries -- Maximum number of files kept in the cache
+        """
+
+        self.file_name = file_name
+        self.settings_key = settings_key.encode()
+        self.max_entries = max_entries
+        self.touched = []
+        self.added = []
+
+        # Wait for the other processes instead of failing when the database is locked
+        self.connection = sqlite3.connect(file_name, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, issues TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+
+    def key(self, data: bytes) -> str:
+        """Return the cache key of a file content.
+
+        Keyword arguments:
+        data -- Content of the file
+        """
+
+        return hashlib.sha256(self.settings_key + b"\0" + data).hexdigest()
+
+    def get(self, key: str, file_name: str) -> Optional[List[Finding]]:
+        """Return the cached findings of a key, or None if it is not in the cache.
+
+        Keyword arguments:
+        key -- Cache key of the file content
+        file_name -- Name of the file, used as the path of the findings
+        """
+
+        row = self.connection.execute("SELECT issues FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.touched.append((time.time(), key))
+        if len(self.touched) >= self.FLUSH_SIZE:
+            self.flush()
+        return [Finding(file_name, *issue) for issue in json.loads(row[0])]
+
+    def put(self, key: str, findings: List[Finding]):
+        """Add the findings of a file content to the cache, without their path.
+
+        Keyword arguments:
+        key -- Cache key of the file content
+        findings -- Findings of the file
+        """
+
+        issues = [(finding.line, finding.column, finding.code, finding.message) for finding in findings]
+        self.added.append((key, json.dumps(issues, separators=(",", ":")), time.time()))
+        if len(self.added) >= self.FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write the pending entries and touches in a single transaction."""
+
+        if not self.added and not self.touched:
+            return
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", self.added)
+            self.connection.executemany("UPDATE results SET last_used = ? WHERE key = ?", self.touched)
+        self.added = []
+        self.touched = []
+
+    def evict(self):
+        """Delete the least recently used entries above the maximum number of entries."""
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            (count,) = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def close(self):
+        """Write the pending changes, evict the old entries and close the database."""
+
+        self.flush()
+        self.evict()
+        self.connection.close()
+
+
+class MemoryCache:
+    """In-memory cache of the issues of each file, with the interface of ResultCache, used by the daemon.
+
+    It doesn't share any state with ResultCache. The entries are kept in least recently used order and the oldest
+    ones are dropped above max_entries.
+    """
+
+    def __init__(self, settings_key: str, max_entries: int = ResultCache.MAX_ENTRIES):
+        """The initializer for the class.
+
+        Keyword arguments:
+        settings_key -- Text that identifies the analyzer version and rule settings
+        max_entries -- Maximum number of files kept in the cache
+        """
+
+        self.file_name = None
+        self.settings_key = settings_key.encode()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def key(self, data: bytes) -> str:
+        """Return the cache key of a file content.
+
+        Keyword arguments:
+        data -- Content of the file
+        """
+
+        return hashlib.sha256(self.settings_key + b"\0" + data).hexdigest()
+
+    def get(self, key: str, file_name: str) -> Optional[List[Finding]]:
+        """Return the cached findings of a key, or None if it is not in the cache.
+
+        Keyword arguments:
+        key -- Cache key of the file content
+        file_name -- Name of the file, used as the path of the findings
+        """
+
+        issues = self.entries.get(key)
+        if issues is None:
+            return None
+
+        self.entries.move_to_end(key)
+        return [Finding(file_name, *issue) for issue in issues]
+
+    def put(self, key: str, findings: List[Finding]):
+        """Add the findings of a file content to the cache, without their path.
+
+        Keyword arguments:
+        key -- Cache key of the file content
+        findings -- Findings of the file
+        """
+
+        self.entries[key] = tuple((finding.line, finding.column, finding.code, finding.message)
+                                  for finding in findings)
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def flush(self):
+        """Nothing to write, the entries are only kept in memory."""
+
+    def evict(self):
+        """Drop the least recently used entries above the maximum number of entries."""
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def close(self):
+        """Drop every entry."""
+
+        self.entries.clear()
+
+
+class DefinitionVisitor(ast.NodeVisitor):
+    """Visit the function and class definitions of a module once, calling the AST checks of the analyzer."""
+
+    # Fields of the nodes that hold statement blocks, the only places where a definition can be
+    BLOCK_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+    def __init__(self, analyzer: "StaticCodeAnalyzer", ranges: Optional[List[Tuple[int, int]]] = None):
+        """The initializer for the class.
+
+        Keyword arguments:
+        analyzer -- Analyzer that owns the AST checks
+        ranges -- Changed (first, last) line ranges, only the functions that overlap them are checked
+        """
+
+        self.analyzer = analyzer
+        self.ranges = ranges
+        self.findings = []
 
-        self.code = "S001"
-        self.message = "Too long"
-        super().__init__(f"{self.code} {self.message}")
+    def overlaps(self, node: ast.AST) -> bool:
+        """Check if the lines of a node overlap one of the changed ranges, every node does without ranges.
 
+        Keyword arguments:
+        node -- AST node of a definition
+        """
 
-class InvalidIndentationError(Exception):
-    """Return the error code and description when the number of indentation spaces is not a multiple of 4."""
+        if self.ranges is None:
+            return True
+        return any(start <= node.end_lineno and node.lineno <= end for start, end in self.ranges)
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+    def generic_visit(self, node: ast.AST):
+        """Visit the statements of the blocks of a node, skipping the expressions.
 
-        self.code = "S002"
-        self.message = "Invalid indentation"
-        super().__init__(f"{self.code} {self.message}")
+        Keyword arguments:
+        node -- AST node to visit
+        """
 
+        for field in self.BLOCK_FIELDS:
+            block = getattr(node, field, None)
+            if isinstance(block, list):
+                for child in block:
+                    self.visit(child)
 
-class UnnecessarySemicolonError(Exception):
-    """Return the error code and description when there is a semicolon after a statement."""
+    def visit_definition(self, node: ast.AST):
+        """Check a function or class definition with the rules of its node type and visit the definitions in it.
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+        Keyword arguments:
+        node -- AST node of the definition
+        """
 
-        self.code = "S003"
-        self.message = "Unnecessary semicolon"
-        super().__init__(f"{self.code} {self.message}")
+        if self.overlaps(node):
+            for code, check in self.analyzer.ast_checks.get(type(node), ()):
+                self.findings.extend(Finding(self.analyzer.file_name, line, column, code, message)
+                                     for line, column, message in check(self.analyzer, node))
+        self.generic_visit(node)
 
+    # Functions, coroutines and classes are checked by the rules registered for their node type
+    visit_FunctionDef = visit_definition
+    visit_AsyncFunctionDef = visit_definition
+    visit_ClassDef = visit_definition
 
-class InlineCommentSpaceError(Exception):
-    """Return the error code and description when there are less than 2 spaces before inline comments."""
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+class Emitter(abc.ABC):
+    """Base class of the report writers, they receive the findings of each file as soon as it is analyzed.
 
-        self.code = "S004"
-        self.message = "At least two spaces required before inline comments"
-        super().__init__(f"{self.code} {self.message}")
+    The subclasses must implement emit() and error(), an emitter that misses one of them can't be created.
+    """
 
+    # Number of findings formatted and written at once, so a stream of findings is never held in memory
+    BATCH_SIZE = 4096
 
-class TodoInCommentError(Exception):
-    """Return the error code and description when a TO DO is found in a  comment."""
+    def __init__(self, stream: Optional[TextIO] = None):
+        """The initializer for the class.
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+        Keyword arguments:
+        stream -- Text stream where the report is written, the current standard output if it is None
+        """
 
-        self.code = "S005"
-        self.message = "TODO found"
-        super().__init__(f"{self.code} {self.message}")
+        self.stream = stream
 
+    @property
+    def output(self) -> TextIO:
+        """Return the stream where the report is written."""
 
-class MaxBlankLinesError(Exception):
-    """Return the error code and description when more than 2 blank lines were found before a code line."""
+        return self.stream if self.stream is not None else sys.stdout
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
+    def start(self):
+        """Write the beginning of the report."""
 
-        self.code = "S006"
-        self.message = "More than two blank lines used before this line"
-        super().__init__(f"{self.code} {self.message}")
+        pass
 
+    @abc.abstractmethod
+    def emit(self, file_name: str, findings: Iterable[Finding]):
+        """Write the findings of a file.
 
-class ConstructionSpacesError(Exception):
-    """Return the error code and description when there is more than 1 space after the construction_name."""
+        Keyword arguments:
+        file_name -- Name of the analyzed file
+        findings -- Findings of the file, sorted by line and code, a list or a stream of them
+        """
 
-    def __init__(self, construction_name: str):
-        """The initializer for the class, define the error code and the error message.
+    @abc.abstractmethod
+    def error(self, file_name: str):
+        """Report a file that couldn't be opened.
 
         Keyword arguments:
-        construction_name -- Name of the construction (def or class)
+        file_name -- Name of the file
         """
 
-        self.code = "S007"
-        self.message = f"Too many spaces after '{construction_name}'"
-        super().__init__(f"{self.code} {self.message}")
+    def finish(self):
+        """Write the end of the report and flush it."""
+
+        self.output.flush()
 
 
-class ClassNameError(Exception):
-    """Return the error code and description when a class name is not in CamelCase."""
+class TextEmitter(Emitter):
+    """Write the findings as text, one per line (file: Line N: code message)."""
 
-    def __init__(self, class_name: str):
-        """The initializer for the class, define the error code and the error message.
+    def emit(self, file_name: str, findings: Iterable[Finding]):
+        """Write the findings of a file.
 
         Keyword arguments:
-        class_name -- Name of the class
+        file_name -- Name of the analyzed file
+        findings -- Findings of the file, sorted by line and code, a list or a stream of them
         """
 
-        self.code = "S008"
-        self.message = f"Class name '{class_name}' should use CamelCase"
-        super().__init__(f"{self.code} {self.message}")
+        for batch in iter_chunks(findings, self.BATCH_SIZE):
+            self.output.write("".join([f"{file_name}: Line {f.line}: {f.code} {f.message}\n" for f in batch]))
 
+    def error(self, file_name: str):
+        """Report a file that couldn't be opened.
 
-class FunctionNameError(Exception):
-    """Return the error code and description when a function name is not in snake_case."""
+        Keyword arguments:
+        file_name -- Name of the file
+        """
+
+        self.output.write(f"Error: Could not open file:  {file_name}\n")
+
+
+class JsonLinesEmitter(Emitter):
+    """Write the findings as JSON Lines, one object per finding."""
+
+    def emit(self, file_name: str, findings: Iterable[Finding]):
+        """Write the findings of a file.
+
+        Keyword arguments:
+        file_name -- Name of the analyzed file
+        findings -- Findings of the file, sorted by line and code, a list or a stream of them
+        """
+
+        # The path is the same for every finding, so it is encoded only once
+        path = json.dumps(file_name)
+        for batch in iter_chunks(findings, self.BATCH_SIZE):
+            self.output.write("".join([
+                f'{{"path":{path},"line":{f.line},"column":{f.column},"code":"{f.code}",'
+                f'"message":{json.dumps(f.message)}}}\n'
+                for f in batch
+            ]))
 
-    def __init__(self, function_name: str):
-        """The initializer for the class, define the error code and the error message.
+    def error(self, file_name: str):
+        """Report a file that couldn't be opened.
 
         Keyword arguments:
-        function_name -- Name of the function
+        file_name -- Name of the file
         """
 
-        self.code = "S009"
-        self.message = f"Function name '{function_name}' should use snake_case"
-        super().__init__(f"{self.code} {self.message}")
+        self.output.write(f'{{"path":{json.dumps(file_name)},"error":"Could not open file"}}\n')
 
 
-class FunctionArgNameError(Exception):
-    """Return the error code and description when a function argument name is not in snake_case."""
+class SarifEmitter(Emitter):
+    """Write the findings as a SARIF 2.1.0 log, the results are streamed as the files are analyzed."""
 
-    def __init__(self, argument_name: str):
-        """The initializer for the class, define the error code and the error message.
+    SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """The initializer for the class.
 
         Keyword arguments:
-        argument_name -- Name of the function argument
+        stream -- Text stream where the report is written, the current standard output if it is None
         """
 
-        self.code = "S010"
-        self.message = f"Argument name '{argument_name}' should be snake_case"
-        super().__init__(f"{self.code} {self.message}")
+        super().__init__(stream)
+        self.separator = ""
+        self.notifications = []
+
+    def start(self):
+        """Write the beginning of the log, up to the opening of the results list."""
 
+        rules = [{"id": code, "shortDescription": {"text": rule.description}} for code, rule in RULES.rules.items()]
+        driver = {"name": "code_analyzer", "version": StaticCodeAnalyzer.VERSION, "rules": rules}
+        header = json.dumps({"$schema": self.SCHEMA, "version": "2.1.0"})
+        self.output.write(header[:-1] + ',"runs":[{"tool":' + json.dumps({"driver": driver}) + ',"results":[')
 
-class FunctionVarNameError(Exception):
-    """Return the error code and description when a variable name inside a function is not in snake_case."""
+    def emit(self, file_name: str, findings: Iterable[Finding]):
+        """Write the results of a file.
 
-    def __init__(self, variable_name: str):
-        """The initializer for the class, define the error code and the error message.
+        Keyword arguments:
+        file_name -- Name of the analyzed file
+        findings -- Findings of the file, sorted by line and code, a list or a stream of them
+        """
+
+        # The location of the artifact is the same for every result, so it is encoded only once
+        uri = json.dumps(PurePath(file_name).as_posix())
+        for batch in iter_chunks(findings, self.BATCH_SIZE):
+            results = ",".join([
+                f'{{"ruleId":"{f.code}","level":"warning","message":{{"text":{json.dumps(f.message)}}},'
+                f'"locations":[{{"physicalLocation":{{"artifactLocation":{{"uri":{uri}}},'
+                f'"region":{{"startLine":{f.line},"startColumn":{f.column}}}}}}}]}}'
+                for f in batch
+            ])
+            self.output.write(self.separator + results)
+            self.separator = ","
+
+    def error(self, file_name: str):
+        """Register a file that couldn't be opened, it is written as a notification of the invocation.
 
         Keyword arguments:
-        variable_name -- Name of the variable
+        file_name -- Name of the file
         """
 
-        self.code = "S011"
-        self.message = f"Variable '{variable_name}' in function should be snake_case"
-        super().__init__(f"{self.code} {self.message}")
+        self.notifications.append({
+            "level": "error",
+            "message": {"text": "Could not open file"},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": PurePath(file_name).as_posix()}}}],
+        })
 
+    def finish(self):
+        """Write the invocation and the end of the log and flush it."""
 
-class FunctionArgMutableError(Exception):
-    """Return the error code and description when a function argument has mutable objects as default values."""
+        invocation = {"executionSuccessful": True, "toolExecutionNotifications": self.notifications}
+        self.output.write('],"invocations":[' + json.dumps(invocation) + "]}]}\n")
+        super().finish()
 
-    def __init__(self):
-        """The initializer for the class, define the error code and the error message."""
 
-        self.code = "S012"
-        self.message = f"Default argument value is mutable"
-        super().__init__(f"{self.code} {self.message}")
+# Report writers by format name
+EMITTERS = {"text": TextEmitter, "jsonl": JsonLinesEmitter, "sarif": SarifEmitter}
+
+
+def open_output(file_name: Optional[str]) -> TextIO:
+    """Return a text stream with a large buffer to write the report: the given file or the standard output.
+
+    Keyword arguments:
+    file_name -- Full name of the report file, the standard output is used if it is None
+    """
+
+    if file_name:
+        return open(file_name, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE)
+
+    try:
+        # Write to the standard output file descriptor through a larger buffer
+        sys.stdout.flush()
+        return open(sys.stdout.fileno(), "w", encoding=sys.stdout.encoding, buffering=OUTPUT_BUFFER_SIZE,
+                    closefd=False)
+    except (AttributeError, OSError, ValueError):
+        # The standard output was replaced by a stream without file descriptor
+        return sys.stdout
 
 
 class StaticCodeAnalyzer:
     """Represents a static code analyzer for a single files or a directory."""
 
     # Class variables
+    VERSION = "1.4"
     MAX_LINE_LENGTH = 79
     INDENTATION_SIZE = 4
     MIN_INLINE_COMMENT_SPACE = 2
     MAX_BLANK_LINES = 2
 
-    def __init__(self):
-        """The initializer for the class."""
+    # Pattern of the lines that start a top-level statement, except the clauses of compound statements
+    BLOCK_START_PATTERN = re.compile(r"(?!(?:else|elif|except|finally)\b)[A-Za-z_@]")
+
+    # Pattern of the strings, comments, brackets, line continuations and line ends, a lone quote is an unclosed string
+    LEXICAL_PATTERN = re.compile(r"""'''(?:[^'\\]|\\[\s\S]|'(?!''))*'''|"""
+                                 r"""\"\"\"(?:[^"\\]|\\[\s\S]|"(?!""))*\"\"\"|"""
+                                 r"""'(?:[^'\\\n]|\\[\s\S])*'|"(?:[^"\\\n]|\\[\s\S])*"|"""
+                                 r"""#[^\n]*|\\\r?\n|[()\[\]{}'"\n]""")
+
+    # Number of files sent at once to a worker process in parallel mode
+    CHUNK_SIZE = 16
+
+    # Default size in bytes above which a file is streamed line by line, without its AST rules
+    STREAM_SIZE = 64 << 20
+
+    def __init__(self, cache_file: Optional[str] = None, cache_size: int = ResultCache.MAX_ENTRIES,
+                 emitter: Optional[Emitter] = None, select: Optional[Iterable[str]] = None,
+                 ignore: Iterable[str] = (), profile: bool = False, stream_size: int = STREAM_SIZE,
+                 use_tokenizer: bool = False):
+        """The initializer for the class.
+
+        Keyword arguments:
+        cache_file -- Full name of the result cache database, no cache is used if it is None
+        cache_size -- Maximum number of files kept in the result cache
+        emitter -- Writer of the findings, text on the standard output if it is None
+        select -- Codes or code prefixes of the enabled rules, every rule is enabled if it is None
+        ignore -- Codes or code prefixes of the disabled rules
+        profile -- Flag that indicates if the time, calls and hits of each rule should be collected
+        stream_size -- Size in bytes above which a file is streamed and its AST rules are skipped, 0 never streams
+        use_tokenizer -- Flag that indicates if the comment and semicolon rules should use the tokens of the file
+        """
 
         self.file_name = ""
+        self.source_text = ""
         self.code_text = []
+        self.issues = []
+        self.select = list(select) if select is not None else None
+        self.ignore = list(ignore)
+        self.rules = RULES.select(self.select, self.ignore)
+        self.profile = RuleProfile() if profile else None
+        self.stream_size = stream_size
+        self.use_tokenizer = use_tokenizer
+
+        # Checks of the enabled AST rules by node type
+        self.ast_checks = {}
+        for rule in self.rules:
+            if rule.node_types is not None:
+                check = self.profile.instrument(rule) if self.profile else rule.check
+                for node_type in rule.node_types:
+                    self.ast_checks.setdefault(node_type, []).append((rule.code, check))
+
+        self.scanner = LineScanner(self)
+        self.emitter = emitter if emitter is not None else TextEmitter()
+        self.cache = ResultCache(cache_file, self.settings_key(), cache_size) if cache_file else None
+
+    def settings_key(self) -> str:
+        """Return a text that identifies the analyzer version and the settings that change its results."""
+
+        return (f"{type(self).__name__} {self.VERSION} {self.MAX_LINE_LENGTH} {self.INDENTATION_SIZE} "
+                f"{self.MIN_INLINE_COMMENT_SPACE} {self.MAX_BLANK_LINES} {self.use_tokenizer:d} "
+                f"{','.join(rule.code for rule in self.rules)}")
+
+    def worker_arguments(self) -> Dict:
+        """Return the initializer arguments of the analyzers of the worker processes."""
+
+        return {
+            "cache_file": self.cache.file_name if self.cache else None,
+            "cache_size": self.cache.max_entries if self.cache else ResultCache.MAX_ENTRIES,
+            "select": self.select,
+            "ignore": self.ignore,
+            "profile": self.profile is not None,
+            "stream_size": self.stream_size,
+            "use_tokenizer": self.use_tokenizer,
+        }
+
+    def close(self):
+        """Release the resources of the analyzer, writing the pending changes of the result cache."""
+
+        if self.cache:
+            self.cache.close()
+            self.cache = None
+
+    def read_file(self, file_name: str) -> bytes:
+        """Read the file, update the file_name, source_text and code_text attributes and return its content.
+
+        An OSError is raised if the file can't be opened.
+
+        Keyword arguments:
+        file_name -- Full name of the file to read from
+        """
+
+        with open(file_name, "rb") as f:
+            data = f.read()
+
+        self.set_source(file_name, data)
+        return data
+
+    def set_source(self, file_name: str, data: bytes):
+        """Decode the content of a file once and split it in lines, as a text mode readlines() would do.
+
+        Keyword arguments:
+        file_name -- Full name of the file
+        data -- Content of the file
+        """
+
+        # Update the instance file_name attribute
+        self.file_name = file_name
+
+        # Decode the content, translating the \r\n and \r line endings to \n
+        text = data.decode('utf-8')
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        self.source_text = text
+
+        # Update the code_text attribute with the list of lines of the file, keeping the line endings
+        self.code_text = text.split("\n")
+        last_line = self.code_text.pop()
+        self.code_text = [line + "\n" for line in self.code_text]
+        if last_line:
+            self.code_text.append(last_line)
 
     def load_file(self, file_name: str):
         """Check if the file exists and loads it.
@@ -182,295 +1376,778 @@ class StaticCodeAnalyzer:
         """
 
         try:
-            # Try to open the file
-            f = open(file_name, "r", encoding='utf-8')
+            # Try to read the file
+            self.read_file(file_name)
         except OSError:
             # If an error occur, show a message
             print("Error: Could not open file: ", file_name)
-        else:
+
+    def index_tokens(self) -> Optional[TokenIndex]:
+        """Return the tokens of the loaded file, or None if they are not used or the file can't be tokenized."""
+
+        if not self.use_tokenizer:
+            return None
+
+        try:
+            return TokenIndex(self.source_text)
+        except (tokenize.TokenError, SyntaxError):
+            # The rules fall back to their patterns
+            return None
+
+    def check_function_definition(self):
+        """Check if functions arguments are mutable and if functions args and variables names are in snake_case"""
+
+        # Don't parse the file when every AST rule is disabled
+        if not self.ast_checks:
+            return
+
+        try:
+            # Parse the source text already loaded, the file is not read again
+            tree = ast.parse(self.source_text)
+        except (SyntaxError, ValueError):
+            # If any syntax or semantic error occur while parsing, ignore
+            return
+
+        visitor = DefinitionVisitor(self)
+        visitor.visit(tree)
+        self.issues.extend(visitor.findings)
+
+    def is_large_file(self, file_name: str) -> bool:
+        """Check if a file is over the stream size, an OSError is raised if it doesn't exist.
+
+        Keyword arguments:
+        file_name -- Full name of the file
+        """
+
+        return 0 < self.stream_size < os.stat(file_name).st_size
+
+    def stream_issues(self, file_name: str) -> Iterator[Finding]:
+        """Return an iterator over the findings of the line rules of a given file, sorted by line and code.
+
+        The lines are read one at a time, so the memory used doesn't depend on the size of the file. The AST rules
+        are skipped and the tokens are not used, they need the whole file. The file is opened right away, an
+        OSError is raised to the caller if it can't be opened.
+
+        Keyword arguments:
+        file_name -- Full name of the file to read from
+        """
+
+        # The text mode translates the \r\n and \r line endings to \n, as set_source does
+        f = open(file_name, "r", encoding="utf-8")
+
+        def scan_file() -> Iterator[Finding]:
             with f:
-                # Update the instance file_name attribute
-                self.file_name = file_name
+                yield from self.scanner.scan(f, file_name)
+
+        self.file_name = file_name
+        return scan_file()
 
-                # Update the code_text attribute with the list of lines of the file
-                self.code_text = f.readlines()
+    def find_issues(self, file_name: str) -> List[Finding]:
+        """Return the findings of a given file sorted by line and code.
 
-    def check_line_length(self, line: Tuple):
-        """Check if the line length is according to PEP8 (max 79 characters).
+        The files over the stream size are not loaded and are not cached, only their line rules are checked.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        file_name -- Full name of the file to read from
         """
 
-        try:
-            if len(line[1]) > self.MAX_LINE_LENGTH:
-                raise MaxLineLengthError
-        except MaxLineLengthError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+        if self.is_large_file(file_name):
+            return list(self.stream_issues(file_name))
 
-    def check_indentation(self, line: Tuple):
-        """Check if the number of indentation spaces is according to PEP8 (multiple of 4).
+        # Read the file content once, an OSError is raised to the caller if it can't be opened
+        with open(file_name, "rb") as f:
+            data = f.read()
+
+        return self.find_content_issues(file_name, data)
+
+    def find_content_issues(self, file_name: str, data: bytes) -> List[Finding]:
+        """Return the findings of the content of a file sorted by line and code.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        file_name -- Name of the file, used as the path of the findings
+        data -- Content of the file, it may differ from the file on disk (e.g. an unsaved editor buffer)
         """
 
-        try:
-            # Detect if there is one or more spaces in the beginning of the line
-            pattern = r"^ +"
-            match = re.match(pattern, line[1])
+        # Replay the findings of the cache when the content of the file didn't change
+        if self.cache:
+            key = self.cache.key(data)
+            findings = self.cache.get(key, file_name)
+            if findings is not None:
+                return findings
+
+        # Build the lines and the AST from the same decoded text
+        self.issues = []
+        self.set_source(file_name, data)
+
+        # Walk through the python file to check functions args and variables
+        self.check_function_definition()
+
+        # Check every line of the file in a single pass
+        self.issues.extend(self.scanner.scan(self.code_text, file_name, tokens=self.index_tokens()))
 
-            # Check if the number of spaces is a multiple of 4
-            if match and (len(match.group()) % self.INDENTATION_SIZE) != 0:
-                raise InvalidIndentationError
-        except InvalidIndentationError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+        # Sort the findings by line number and code, keeping the detection order of equal keys
+        self.issues.sort(key=attrgetter("line", "code"))
 
-    def check_semicolons(self, line: Tuple):
-        """Check if the number of indentation spaces is according to PEP8 (multiple of 4).
+        if self.cache:
+            self.cache.put(key, self.issues)
+        return self.issues
+
+    def find_statement_starts(self) -> Optional[List[int]]:
+        """Return the sorted lines where a logical line starts, or None if they can't be determined.
+
+        The lines inside strings, between brackets or after a line continuation don't start a logical line. The
+        same lines as the tokenize module are found, without tokenizing every name and operator of the file.
+        """
+
+        lines = self.code_text
+        starts = [1]
+        line = 1
+        depth = 0
+        for match in self.LEXICAL_PATTERN.finditer(self.source_text):
+            text = match.group()
+            char = text[0]
+            if char == "\n":
+                line += 1
+                if depth == 0:
+                    starts.append(line)
+            elif char in "([{":
+                depth += 1
+            elif char in ")]}":
+                depth -= 1
+                if depth < 0:
+                    return None
+            elif char in "'\"":
+                if len(text) == 1:
+                    # The string is not closed
+                    return None
+                line += text.count("\n")
+            elif char == "\\":
+                line += 1
+
+        if depth != 0:
+            return None
+
+        # Keep the lines with code, like the tokens of the file
+        return [line for line in starts if line <= len(lines) and lines[line - 1].strip() != "" and
+                not lines[line - 1].lstrip().startswith("#")]
+
+    def find_block(self, start: int, end: int, statement_starts: List[int]) -> Tuple[int, int]:
+        """Return the (first, last) lines of the top-level statements that enclose a range of lines.
+
+        A top-level statement is a logical line that starts at column 0 with a name, a keyword or a decorator. The
+        else, elif, except and finally clauses and the definitions right after a decorator belong to the statement
+        above them.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        start -- First line of the range
+        end -- Last line of the range
+        statement_starts -- Sorted lines where a logical line starts
         """
 
-        try:
-            # Detect a semicolon in the end of the line, followed or not by an inline comment
-            pattern = r";\s*$|;(\s*#.*)?$"
-            if re.search(pattern, line[1]):
-                # Detect if the semicolon is inside an inline comment
-                pattern = r"#.*;\s*$"
-                if not re.search(pattern, line[1]):
-                    raise UnnecessarySemicolonError
-        except UnnecessarySemicolonError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+        lines = self.code_text
+
+        def starts_block(index: int) -> bool:
+            return (self.BLOCK_START_PATTERN.match(lines[statement_starts[index] - 1]) is not None and
+                    (index == 0 or not lines[statement_starts[index - 1] - 1].startswith("@")))
+
+        # Go back to the beginning of the statement of the first line
+        index = bisect_right(statement_starts, start) - 1
+        while index > 0 and not starts_block(index):
+            index -= 1
+        block_start = statement_starts[index] if index >= 0 else 1
+
+        # Go forward to the line before the next statement
+        index = bisect_right(statement_starts, end)
+        while index < len(statement_starts) and not starts_block(index):
+            index += 1
+        block_end = statement_starts[index] - 1 if index < len(statement_starts) else len(lines)
 
-    def check_comment_spaces(self, line: Tuple):
-        """Check if the number of spaces before inline comments is according to PEP8 (min 2).
+        return block_start, block_end
+
+    def find_changed_issues(self, file_name: str, ranges: List[Tuple[int, int]]) -> List[Finding]:
+        """Return the findings of the changed lines of a file, sorted by line and code.
+
+        The line rules only check the changed lines, plus the blank lines that follow them and the next code
+        line, whose blank lines count may have changed. The AST rules only check the functions that overlap a
+        change, parsing only the top-level statements around the changes when they can be parsed alone.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        file_name -- Full name of the file to read from
+        ranges -- Changed (first, last) line ranges, the line numbers start at 1
         """
 
+        self.issues = []
+        self.read_file(file_name)
+        lines = self.code_text
+        ranges = merge_ranges([(max(start, 1), min(end, len(lines))) for start, end in ranges])
+
+        # Extend each range to the next code line when it ends with blank lines
+        windows = []
+        for start, end in ranges:
+            while end < len(lines) and lines[end - 1].strip() == "":
+                end += 1
+            windows.append((start, end))
+
+        tokens = self.index_tokens()
+        for start, end in merge_ranges(windows):
+            # Count the blank lines right before the window, they are the initial state of the blank lines rule
+            blank_count = 0
+            while start - blank_count > 1 and lines[start - blank_count - 2].strip() == "":
+                blank_count += 1
+
+            self.issues.extend(self.scanner.scan(lines[start - 1:end], file_name, start, blank_count, tokens))
+
+        # Parse the statements around the changes, or the whole file if their boundaries can't be determined or
+        # one of them can't be parsed alone
+        statement_starts = tokens.statement_starts if tokens is not None else self.find_statement_starts()
+        trees = []
         try:
-            pattern_1 = r"^.+\S ?#"  # Detect an inline comment with less than 2 spaces to the code
-            pattern_2 = r" {2}#.*#"  # Detect if the # is inside an inline comment
-            if re.search(pattern_1, line[1]) and not re.search(pattern_2, line[1]):
-                raise InlineCommentSpaceError
-        except InlineCommentSpaceError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+            if statement_starts is None:
+                raise ValueError("statement boundaries not found")
+            for start, end in merge_ranges([self.find_block(start, end, statement_starts) for start, end in ranges]):
+                tree = ast.parse("".join(lines[start - 1:end]))
+                trees.append(ast.increment_lineno(tree, start - 1))
+        except (SyntaxError, ValueError):
+            try:
+                trees = [ast.parse(self.source_text)]
+            except (SyntaxError, ValueError):
+                # If any syntax or semantic error occur while parsing, ignore
+                trees = []
+
+        for tree in trees:
+            visitor = DefinitionVisitor(self, ranges)
+            visitor.visit(tree)
+            self.issues.extend(visitor.findings)
 
-    def check_todo_comments(self, line: Tuple):
-        """Check if there are TODOs inside comments.
+        # Sort the findings by line number and code, keeping the detection order of equal keys
+        self.issues.sort(key=attrgetter("line", "code"))
+        return self.issues
+
+    def analyze_changes(self, file_name: str, ranges: List[Tuple[int, int]]):
+        """Analyze only the changed lines of a given file according to PEP8.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        file_name -- Full name of the file to read from
+        ranges -- Changed (first, last) line ranges, the line numbers start at 1
         """
+
         try:
-            # Detect a TO DO inside an inline comment
-            pattern = r"#.* (todo)( .*)?$"
-            if re.search(pattern, line[1], flags=re.IGNORECASE):
-                raise TodoInCommentError
-        except TodoInCommentError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+            findings = self.find_changed_issues(file_name, ranges)
+        except OSError:
+            # If an error occur, report it
+            self.emitter.error(file_name)
+        else:
+            self.emitter.emit(file_name, findings)
 
-    def check_blank_lines(self, line: Tuple, blank_count: int):
-        """Check if more than 2 blank lines were found before a code line.
+    def analyze_file(self, file_name: str):
+        """Analyze the code of a given file according to PEP8.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
-        blank_count -- Number of consecutive blank lines detected
+        file_name -- Full name of the file to read from
         """
 
         try:
-            if blank_count > self.MAX_BLANK_LINES and len(line[1].strip()) > 0:
-                raise MaxBlankLinesError
-        except MaxBlankLinesError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+            # The findings of a large file are written while it is read
+            findings = self.stream_issues(file_name) if self.is_large_file(file_name) else self.find_issues(file_name)
+        except OSError:
+            # If an error occur, report it
+            self.emitter.error(file_name)
+        else:
+            self.emitter.emit(file_name, findings)
 
-    def check_construction_spaces(self, line: Tuple):
-        """Check if the number of spaces after a construction name is according to PEP8 (max 1).
+    def analyze_source(self, file_name: str, data: bytes):
+        """Analyze a given content of a file according to PEP8, instead of the content on disk.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        file_name -- Name of the file, only used in the report
+        data -- Content of the file
         """
 
-        try:
-            # Detect more than 1 space after a construction_name
-            pattern = r"^ *(def|class) {2,}"
-            match = re.search(pattern, line[1])
-            if match:
-                raise ConstructionSpacesError(match.group().strip())
-        except ConstructionSpacesError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+        self.emitter.emit(file_name, self.find_content_issues(file_name, data))
 
-    def check_class_name(self, line: Tuple):
-        """Check if a given class name is in CamelCase.
+    def analyze_path(self, path_name: str, jobs: int = 1, recursive: bool = False, exclude: Iterable[str] = ()):
+        """Analyze the code of the Python files in a given directory according to PEP8.
+
+        The files are analyzed in name order while the directory tree is walked. With more than one job, they are
+        spread across a pool of processes and the results are reported in the same order, so the output is
+        identical to the one of a serial run.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
+        path_name -- Full name of the directory where the Python files should be
+        jobs -- Number of processes used to analyze the files
+        recursive -- Flag that indicates if the subdirectories should also be analyzed
+        exclude -- Extra .gitignore-style patterns of files and directories to skip
         """
 
-        try:
-            # Detect if a class_name is not in CamelCase
-            pattern = r"\b(?<=class) +([a-z_]\w*|\w*_\w*)"
-            match = re.search(pattern, line[1])
+        file_names = FileFinder(exclude, recursive).find(path_name)
 
-            if match:
-                raise ClassNameError(match.group().strip())
-        except ClassNameError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+        if jobs <= 1:
+            # Analyze each Python file in the given directory
+            for file_name in file_names:
+                self.analyze_file(file_name)
+            return
+
+        # The workers open their own connection to the result cache and use the same rules
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(type(self), self.worker_arguments())) as executor:
+            # Keep a bounded number of chunks in flight, so the results are reported while the tree is walked
+            pending = deque()
+            for chunk in iter_chunks(file_names, self.CHUNK_SIZE):
+                pending.append(executor.submit(find_files_issues, chunk))
+                if len(pending) > jobs * 2:
+                    self.report_results(*pending.popleft().result())
+
+            while pending:
+                self.report_results(*pending.popleft().result())
+
+    def report_results(self, results: List[Tuple[str, Optional[List[Finding]]]], stats: Optional[Dict]):
+        """Report the findings returned by a worker process for a chunk of files.
+
+        Keyword arguments:
+        results -- List of (file_name, findings) tuples, findings is None if the file couldn't be opened
+        stats -- Rule statistics of the chunk when profiling, None otherwise
+        """
+
+        if stats:
+            self.profile.merge(stats)
+
+        for file_name, findings in results:
+            if findings is None:
+                self.emitter.error(file_name)
+            else:
+                self.emitter.emit(file_name, findings)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Serve the requests of one client connection of the daemon.
+
+    Each request is a JSON object on one line:
+    {"cwd": ..., "path": ..., "recursive": ..., "exclude": [...], "ranges": [[first, last], ...], "source": ...,
+    "select": [...], "ignore": [...], "use_tokenizer": ...}, only "path" is required. The daemon answers one JSON
+    line per file, {"path": ..., "findings": [[line, column, code, message], ...]} with null findings if the file
+    couldn't be opened, and a last {"end": true} line, with an "error" message if the request failed.
+    """
+
+    def handle(self):
+        """Answer the requests of the client until it closes the connection."""
+
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                # The analyzers keep the state of the current file, so the requests are served one at a time
+                with self.server.lock:
+                    responses = list(self.server.process(request))
+                responses.append({"end": True})
+            except Exception as error:
+                # A bad request or an unexpected error must not stop the daemon
+                responses = [{"end": True, "error": f"{type(error).__name__}: {error}"}]
 
-    def check_function_name(self, line: Tuple):
-        """Check if a given function name is in snake_case.
+            self.wfile.write("".join(json.dumps(response, separators=(",", ":")) + "\n"
+                                     for response in responses).encode())
+            self.wfile.flush()
+
+
+class AnalyzerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Resident analyzer that serves the requests of the clients over a Unix domain socket.
+
+    The analyzers of each rule selection are created once and keep their findings in memory by content hash, so
+    a request only pays the analysis of the files that changed since the last time they were seen.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_name: str, cache_size: int = ResultCache.MAX_ENTRIES):
+        """The initializer for the class, listen on the socket.
 
         Keyword arguments:
-        line -- Tuple that represents one line of the file (line_number, text)
-        function_name -- The name of the function to analyse
+        socket_name -- Full name of the Unix domain socket
+        cache_size -- Maximum number of files kept in the result cache of each analyzer
         """
 
+        # Only the owner of the daemon can connect to the socket
+        umask = os.umask(0o177)
         try:
-            # Detect if a function_name is not in snake_case
-            pattern = r"\b(?<=def) +([A-Z]*\w*[A-Z]\w*)"
-            match = re.search(pattern, line[1])
-            if match:
-                raise FunctionNameError(match.group().strip())
-        except FunctionNameError as err:
-            print(f"{self.file_name}: Line {line[0]}: {err}")
+            super().__init__(socket_name, DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+
+        self.cache_size = cache_size
+        self.analyzers = {}
+        self.lock = threading.Lock()
+
+        # Warm up the analyzer of the default rules
+        self.get_analyzer(None, [])
+
+    def get_analyzer(self, select: Optional[List[str]], ignore: List[str],
+                     use_tokenizer: bool = False) -> StaticCodeAnalyzer:
+        """Return the analyzer of a rule selection, creating it the first time it is requested.
+
+        Keyword arguments:
+        select -- Codes or code prefixes of the enabled rules, every rule is enabled if it is None
+        ignore -- Codes or code prefixes of the disabled rules
+        use_tokenizer -- Flag that indicates if the comment and semicolon rules should use the tokens of the file
+        """
+
+        key = (tuple(select) if select is not None else None, tuple(ignore), use_tokenizer)
+        analyzer = self.analyzers.get(key)
+        if analyzer is None:
+            analyzer = StaticCodeAnalyzer(select=select, ignore=ignore, use_tokenizer=use_tokenizer)
+            analyzer.cache = MemoryCache(analyzer.settings_key(), self.cache_size)
+            self.analyzers[key] = analyzer
+        return analyzer
+
+    def process(self, request: Dict) -> Iterator[Dict]:
+        """Analyze the files of a request and yield the response of each file.
+
+        Keyword arguments:
+        request -- Decoded request of a client
+        """
+
+        analyzer = self.get_analyzer(request.get("select"), request.get("ignore", []),
+                                     request.get("use_tokenizer", False))
+
+        # The paths are reported as the client wrote them, but resolved from the directory of the client
+        path = request["path"]
+        real_path = os.path.join(request.get("cwd", ""), path)
+
+        if request.get("source") is not None:
+            yield self.file_response(path, analyzer.find_content_issues, real_path, request["source"].encode())
+        elif request.get("ranges") is not None:
+            ranges = [(start, end) for start, end in request["ranges"]]
+            yield self.file_response(path, analyzer.find_changed_issues, real_path, ranges)
+        elif os.path.isdir(real_path):
+            finder = FileFinder(request.get("exclude", ()), request.get("recursive", False))
+            for file_name in finder.find(real_path):
+                yield self.file_response(path + file_name[len(real_path):], analyzer.find_issues, file_name)
+        else:
+            yield self.file_response(path, analyzer.find_issues, real_path)
 
-    def check_function_args_names(self, node):
-        """Check if a given function name is in snake_case.
+    @staticmethod
+    def file_response(path: str, find: Callable, *args) -> Dict:
+        """Return the response of one file, with null findings if the file couldn't be opened.
 
         Keyword arguments:
-        line_number -- Number of the line in the code
-        node -- AST tree object of the function
+        path -- Name of the file reported to the client
+        find -- Analyzer method that returns the findings of the file
+        args -- Arguments of the method
         """
 
         try:
-            args = [a.arg for a in node.args.args]
-            for arg in args:
-                # Detect if arg_name is not in snake_case
-                pattern = r"[A-Z]*\w*[A-Z]\w*"
-                match = re.search(pattern, arg)
-                if match:
-                    raise FunctionArgNameError(arg)
-        except FunctionArgNameError as err:
-            print(f"{self.file_name}: Line {node.lineno}: {err}")
+            findings = find(*args)
+        except OSError:
+            return {"path": path, "findings": None}
+        return {"path": path, "findings": [[finding.line, finding.column, finding.code, finding.message]
+                                           for finding in findings]}
+
+
+class RemoteAnalyzer:
+    """Client of the analyzer daemon, with the analyze_* methods of StaticCodeAnalyzer.
+
+    The files are analyzed by the daemon and the findings are reported by the local emitter, so the output is the
+    same as the one of a local analysis.
+    """
 
-    def check_function_args_mutable(self, node):
-        """Check if a given function name is in snake_case.
+    def __init__(self, socket_name: str, emitter: Optional[Emitter] = None, select: Optional[Iterable[str]] = None,
+                 ignore: Iterable[str] = (), use_tokenizer: bool = False):
+        """The initializer for the class, connect to the daemon.
+
+        An OSError is raised if the daemon is not running.
 
         Keyword arguments:
-        line_number -- Number of the line in the code
-        node -- AST tree object of the function
+        socket_name -- Full name of the Unix domain socket of the daemon
+        emitter -- Writer of the findings, text on the standard output if it is None
+        select -- Codes or code prefixes of the enabled rules, every rule is enabled if it is None
+        ignore -- Codes or code prefixes of the disabled rules
+        use_tokenizer -- Flag that indicates if the comment and semicolon rules should use the tokens of the file
         """
 
+        self.emitter = emitter if emitter is not None else TextEmitter()
+        self.select = list(select) if select is not None else None
+        self.ignore = list(ignore)
+        self.use_tokenizer = use_tokenizer
+        self.profile = None
+
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         try:
-            for arg in node.args.defaults:
-                # Detect if arg_name is not in snake_case
-                if isinstance(arg, (ast.List, ast.Dict, ast.Set)):
-                    raise FunctionArgMutableError()
-        except FunctionArgMutableError as err:
-            print(f"{self.file_name}: Line {node.lineno}: {err}")
+            self.connection.connect(socket_name)
+        except OSError:
+            self.connection.close()
+            raise
+        self.reader = self.connection.makefile("rb")
+
+    def close(self):
+        """Close the connection to the daemon."""
 
-    def check_function_var_names(self, node):
-        """Check if variables names inside functions are in snake_case.
+        self.reader.close()
+        self.connection.close()
+
+    def request(self, path: str, **options):
+        """Send a request to the daemon and report the findings of each file of the response.
 
         Keyword arguments:
-        line_number -- Number of the line in the code
-        node -- AST tree object of the function
+        path -- File or directory to analyze
+        options -- Other fields of the request (recursive, exclude, ranges, source)
         """
 
-        # Create a list of tuples with all names and line numbers of variables in the function
-        # var_names = [(a.targets[0].id, a.lineno) for a in node.body if isinstance(a, ast.Assign)]
-        var_names = []
-        for a in node.body:
-            if isinstance(a, ast.Assign):
-                if isinstance(a.targets[0], ast.Name):
-                    var_names.append((a.targets[0].id, a.lineno))
-                elif isinstance(a.targets[0], ast.Attribute):
-                    var_names.append((a.targets[0].attr, a.lineno))
+        request = {"cwd": os.getcwd(), "path": path, "select": self.select, "ignore": self.ignore,
+                   "use_tokenizer": self.use_tokenizer, **options}
+        self.connection.sendall(json.dumps(request, separators=(",", ":")).encode() + b"\n")
 
-        # Set used to avoid analyzing the same variable in different assignment statements
-        var_checked = set()
+        for line in self.reader:
+            response = json.loads(line)
+            if response.get("end"):
+                if "error" in response:
+                    raise SystemExit(f"Error: The analyzer daemon failed: {response['error']}")
+                return
 
-        # Iterate over each (variable name, line number) tuple
-        for var_name in var_names:
-            try:
-                # If the variable wasn't analyzed yet...
-                if var_name[0] not in var_checked:
-                    # Detect if var_name is not in snake_case
-                    pattern = r"[A-Z]*\w*[A-Z]\w*"
-                    match = re.search(pattern, var_name[0])
-                    if match:
-                        # Update the checked variables set
-                        var_checked.add(var_name[0])
-                        raise FunctionVarNameError(var_name[0])
-            except FunctionVarNameError as err:
-                print(f"{self.file_name}: Line {var_name[1]}: {err}")
+            if response["findings"] is None:
+                self.emitter.error(response["path"])
+            else:
+                self.emitter.emit(response["path"], [Finding(response["path"], *issue)
+                                                     for issue in response["findings"]])
 
-    def check_function_definition(self):
-        """Check if functions arguments are mutable and if functions args and variables names are in snake_case"""
-        try:
-            with open(self.file_name, "r") as source:
-                tree = ast.parse(source.read())
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    self.check_function_args_names(node)
-                    self.check_function_args_mutable(node)
-                    self.check_function_var_names(node)
-        finally:
-            # If any syntax or semantic error occur while parsing, ignore
-            pass
+        raise SystemExit("Error: The analyzer daemon closed the connection.")
 
     def analyze_file(self, file_name: str):
         """Analyze the code of a given file according to PEP8.
 
         Keyword arguments:
         file_name -- Full name of the file to read from
-        test_mode -- Flag that indicates if the program is executing on test mode
         """
 
-        # Load the file content
-        self.load_file(file_name)
+        self.request(file_name)
 
-        # Initialize the blank line count
-        blank_count = 0
+    def analyze_source(self, file_name: str, data: bytes):
+        """Analyze a given content of a file according to PEP8, instead of the content on disk.
 
-        # Walk through the python file to check functions args and variables
-        self.check_function_definition()
+        Keyword arguments:
+        file_name -- Name of the file, only used in the report
+        data -- Content of the file
+        """
 
-        # Iterate over each line of the file
-        for line in enumerate(self.code_text, 1):
-            # Execute the analyzing methods over the current line
-            self.check_line_length(line)
-            self.check_indentation(line)
-            self.check_semicolons(line)
-            self.check_comment_spaces(line)
-            self.check_todo_comments(line)
-            self.check_blank_lines(line, blank_count)
-            self.check_construction_spaces(line)
-            self.check_class_name(line)
-            self.check_function_name(line)
-
-            # If a blank line was found, update the blank line count
-            if line[1].strip() == '':
-                blank_count += 1
-            # Otherwise, reset it to zero
-            else:
-                blank_count = 0
+        self.request(file_name, source=data.decode("utf-8"))
+
+    def analyze_changes(self, file_name: str, ranges: List[Tuple[int, int]]):
+        """Analyze only the changed lines of a given file according to PEP8.
+
+        Keyword arguments:
+        file_name -- Full name of the file to read from
+        ranges -- Changed (first, last) line ranges, the line numbers start at 1
+        """
+
+        self.request(file_name, ranges=ranges)
 
-    def analyze_path(self, path_name: str):
+    def analyze_path(self, path_name: str, jobs: int = 1, recursive: bool = False, exclude: Iterable[str] = ()):
         """Analyze the code of the Python files in a given directory according to PEP8.
 
+        The daemon analyzes the files serially, its cache already skips the files that didn't change.
+
         Keyword arguments:
         path_name -- Full name of the directory where the Python files should be
-        test_mode -- Flag that indicates if the program is executing on test mode
+        jobs -- Ignored, kept for compatibility with StaticCodeAnalyzer
+        recursive -- Flag that indicates if the subdirectories should also be analyzed
+        exclude -- Extra .gitignore-style patterns of files and directories to skip
         """
 
-        # Analyze each Python file in the given directory
-        for file_name in glob.glob(path_name + "/*.py"):
-            self.analyze_file(file_name)
+        self.request(path_name, recursive=recursive, exclude=list(exclude))
+
+
+def serve(socket_name: str, cache_size: int = ResultCache.MAX_ENTRIES):
+    """Run the analyzer daemon on a Unix domain socket until it is interrupted or terminated.
+
+    Keyword arguments:
+    socket_name -- Full name of the Unix domain socket
+    cache_size -- Maximum number of files kept in the result cache of each analyzer
+    """
+
+    # Remove the socket left by a daemon that is not running anymore
+    if os.path.exists(socket_name):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_name)
+        except OSError:
+            os.unlink(socket_name)
+        else:
+            raise SystemExit(f"Error: A daemon is already listening on {socket_name}")
+        finally:
+            probe.close()
+
+    server = AnalyzerDaemon(socket_name, cache_size)
+
+    # Stop cleanly on SIGTERM, as on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_name)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Return the sorted union of (first, last) line ranges, dropping the empty ones.
+
+    Keyword arguments:
+    ranges -- Line ranges, the last line is included
+    """
+
+    merged = []
+    for start, end in sorted(r for r in ranges if r[0] <= r[1]):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse_line_ranges(text: str) -> List[Tuple[int, int]]:
+    """Return the line ranges of a text like "10-20,35".
+
+    Keyword arguments:
+    text -- Comma separated line numbers or first-last ranges
+    """
+
+    ranges = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        ranges.append((int(first), int(last or first)))
+    return ranges
+
+
+def parse_diff(diff_text: str) -> Dict[str, List[Tuple[int, int]]]:
+    """Return the changed line ranges of each file of a unified diff (e.g. git diff -U0), in the new version.
+
+    Keyword arguments:
+    diff_text -- Text of the diff
+    """
+
+    changes = {}
+    ranges = None
+    for line in diff_text.splitlines():
+        if line.startswith("+++ "):
+            # Name of the new file, without the b/ prefix of git; deleted files have no ranges
+            name = line[4:].split("\t")[0].strip()
+            if name == "/dev/null":
+                ranges = None
+            else:
+                ranges = changes.setdefault(name[2:] if name.startswith("b/") else name, [])
+        elif line.startswith("@@") and ranges is not None:
+            match = DIFF_HUNK_PATTERN.match(line)
+            if match:
+                start = int(match.group(1))
+                count = int(match.group(2)) if match.group(2) is not None else 1
+
+                # A hunk that only deletes lines changes the line after the deleted ones
+                ranges.append((start, start + count - 1) if count else (start, start + 1))
+    return changes
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Yield lists with up to size consecutive items of an iterable.
+
+    Keyword arguments:
+    items -- Iterable to split
+    size -- Maximum number of items of each chunk
+    """
+
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+# Analyzer used by each worker process of the pool
+worker_analyzer = None
+
+
+def init_worker(analyzer_class: type, arguments: Dict):
+    """Create the analyzer of a worker process.
+
+    Keyword arguments:
+    analyzer_class -- Class of the analyzer of the parent process
+    arguments -- Initializer arguments of the analyzer (result cache, rules, profiling)
+    """
+
+    global worker_analyzer
+    worker_analyzer = analyzer_class(**arguments)
+
+
+def find_files_issues(file_names: List[str]) -> Tuple[List[Tuple[str, Optional[List[Finding]]]], Optional[Dict]]:
+    """Return the findings of a chunk of files and the rule statistics of the chunk when profiling.
+
+    The findings are (file_name, findings) tuples, findings is None if the file couldn't be opened.
+
+    Keyword arguments:
+    file_names -- Full names of the files to analyze
+    """
+
+    results = []
+    for file_name in file_names:
+        try:
+            results.append((file_name, worker_analyzer.find_issues(file_name)))
+        except OSError:
+            results.append((file_name, None))
+
+    # Share the new cache entries with the other processes before returning
+    if worker_analyzer.cache:
+        worker_analyzer.cache.flush()
+    return results, worker_analyzer.profile.take() if worker_analyzer.profile else None
+
+
+def analyze_diff(static_code_analyzer: StaticCodeAnalyzer, path: str, diff_file: str):
+    """Analyze the changed lines of the Python files of a unified diff.
+
+    Keyword arguments:
+    static_code_analyzer -- Analyzer that reports the findings
+    path -- Directory the paths of the diff are relative to, or one file of the diff
+    diff_file -- Full name of the diff file, '-' for the standard input
+    """
+
+    if diff_file == "-":
+        diff_text = sys.stdin.read()
+    else:
+        with open(diff_file, "r", encoding="utf-8") as f:
+            diff_text = f.read()
+
+    for name, ranges in sorted(parse_diff(diff_text).items()):
+        if not name.endswith(".py"):
+            continue
+
+        if os.path.isdir(path):
+            static_code_analyzer.analyze_changes(os.path.join(path, name), ranges)
+        elif os.path.abspath(name) == os.path.abspath(path):
+            static_code_analyzer.analyze_changes(path, ranges)
+
+
+def read_config(file_name: str) -> Dict[str, List[str]]:
+    """Return the select and ignore lists of the [code_analyzer] section of an INI configuration file.
+
+    Keyword arguments:
+    file_name -- Full name of the configuration file
+    """
+
+    parser = configparser.ConfigParser()
+    if not parser.read(file_name, encoding="utf-8"):
+        raise SystemExit(f"Error: Could not read the configuration file: {file_name}")
+
+    config = {}
+    if parser.has_section("code_analyzer"):
+        for option in ("select", "ignore"):
+            if parser.has_option("code_analyzer", option):
+                config[option] = split_codes(parser.get("code_analyzer", option))
+    return config
+
+
+def split_codes(text: str) -> List[str]:
+    """Return the rule codes of a comma separated text.
+
+    Keyword arguments:
+    text -- Comma separated codes or code prefixes (e.g. "S001,S01")
+    """
+
+    return [code.strip() for code in text.split(",") if code.strip()]
 
 
 def main():
@@ -483,19 +2160,95 @@ def main():
         static_code_analyzer.analyze_file('test_file.py')
     else:
         # Get the command line arguments
-        args = sys.argv
-
-        # Check if exactly one argument was informed
-        if len(args) == 2:
-            static_code_analyzer = StaticCodeAnalyzer()
-
-            # Call the appropriate analysis method according to the argument type: file or directory
-            if os.path.isdir(args[1]):
-                static_code_analyzer.analyze_path(args[1])
-            elif args[1].endswith(".py"):
-                static_code_analyzer.analyze_file(args[1])
-
-        elif len(args) > 2:
+        parser = argparse.ArgumentParser(description="Static code analyzer for Python files.")
+        parser.add_argument("paths", nargs="*", help="Python file or directory to analyze.")
+        parser.add_argument("-j", "--jobs", type=int, default=1,
+                            help="Number of processes used to analyze a directory (0 uses every CPU).")
+        parser.add_argument("-r", "--recursive", action="store_true",
+                            help="Also analyze the Python files of the subdirectories.")
+        parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                            help=".gitignore-style pattern of files or directories to skip (can be repeated).")
+        parser.add_argument("--cache", metavar="FILE",
+                            help="Result cache database, the unchanged files are not analyzed again.")
+        parser.add_argument("--cache-size", type=int, default=ResultCache.MAX_ENTRIES,
+                            help="Maximum number of files kept in the result cache.")
+        parser.add_argument("--lines", metavar="RANGES",
+                            help="Only analyze the changed lines of the file (e.g. 10-20,35).")
+        parser.add_argument("--diff", metavar="FILE",
+                            help="Only analyze the lines changed by a unified diff ('-' reads it from the standard "
+                                 "input), the paths of the diff are relative to the analyzed path.")
+        parser.add_argument("--config", metavar="FILE",
+                            help="INI file with the select and ignore options in a [code_analyzer] section.")
+        parser.add_argument("--select", type=split_codes, metavar="CODES",
+                            help="Comma separated codes or code prefixes of the enabled rules (default: all).")
+        parser.add_argument("--ignore", type=split_codes, metavar="CODES",
+                            help="Comma separated codes or code prefixes of the disabled rules.")
+        parser.add_argument("--profile", action="store_true",
+                            help="Report the time, calls and hits of each rule on the standard error.")
+        parser.add_argument("--stream-size", type=int, default=StaticCodeAnalyzer.STREAM_SIZE, metavar="BYTES",
+                            help="Size above which a file is read line by line and its AST rules (S010-S012) are "
+                                 "skipped, 0 always loads the whole file (default: 64 MiB).")
+        parser.add_argument("--tokenize", action="store_true",
+                            help="Find the comments and semicolons (S003, S004, S005) with the tokenize module, "
+                                 "ignoring the # and ; inside strings.")
+        parser.add_argument("--stdin", action="store_true",
+                            help="Read the content of the file from the standard input (e.g. an unsaved editor "
+                                 "buffer), the path is only used in the report.")
+        parser.add_argument("--daemon", metavar="SOCKET",
+                            help="Run as a daemon that serves the analysis requests on a Unix domain socket.")
+        parser.add_argument("--connect", metavar="SOCKET", default=os.environ.get("CODE_ANALYZER_SOCKET"),
+                            help="Send the analysis to the daemon of a Unix domain socket (default: "
+                                 "$CODE_ANALYZER_SOCKET), the files are analyzed locally if it is not running.")
+        parser.add_argument("--format", choices=sorted(EMITTERS), default="text", help="Format of the report.")
+        parser.add_argument("-o", "--output", metavar="FILE", help="File where the report is written.")
+        args = parser.parse_args()
+
+        # Run the daemon, or check if exactly one argument was informed
+        if args.daemon:
+            serve(args.daemon, args.cache_size)
+
+        elif len(args.paths) == 1:
+            stream = open_output(args.output)
+            emitter = EMITTERS[args.format](stream)
+            # The command line options win over the configuration file
+            config = read_config(args.config) if args.config else {}
+            select = args.select if args.select is not None else config.get("select")
+            ignore = args.ignore if args.ignore is not None else config.get("ignore", [])
+
+            # Use the daemon when it is running, the rule statistics are only collected locally
+            static_code_analyzer = None
+            if args.connect and not args.profile:
+                try:
+                    static_code_analyzer = RemoteAnalyzer(args.connect, emitter, select, ignore, args.tokenize)
+                except OSError:
+                    pass
+            if static_code_analyzer is None:
+                static_code_analyzer = StaticCodeAnalyzer(args.cache, args.cache_size, emitter, select, ignore,
+                                                          args.profile, args.stream_size, args.tokenize)
+            path = args.paths[0]
+            jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+
+            # Call the appropriate analysis method according to the arguments: changes, content, file or directory
+            emitter.start()
+            if args.diff:
+                analyze_diff(static_code_analyzer, path, args.diff)
+            elif args.stdin:
+                static_code_analyzer.analyze_source(path, sys.stdin.buffer.read())
+            elif args.lines:
+                static_code_analyzer.analyze_changes(path, parse_line_ranges(args.lines))
+            elif os.path.isdir(path):
+                static_code_analyzer.analyze_path(path, jobs, args.recursive, args.exclude)
+            elif path.endswith(".py"):
+                static_code_analyzer.analyze_file(path)
+            emitter.finish()
+
+            if static_code_analyzer.profile:
+                static_code_analyzer.profile.report(sys.stderr)
+            static_code_analyzer.close()
+            if stream is not sys.stdout:
+                stream.close()
+
+        elif len(args.paths) > 1:
             print("Too many arguments.")
         else:
             print("No argument was informed.")
@@ -0,0 +1,432 @@
+# import the necessary packages
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from code_analyzer import StaticCodeAnalyzer, TextEmitter
+
+
+# Lines used to build the synthetic corpus, a mix of clean lines and lines that trigger each rule
+LINE_TEMPLATES = [
+    "import os\n",
+    "\n",
+    "class BusLine:\n",
+    "    def __init__(self, bus_id, stops):\n",
+    "        self.bus_id = bus_id  # identifier of the line\n",
+    "        self.stops = stops\n",
+    "    def total(self):\n",
+    "        return sum(stop.time for stop in self.stops)\n",
+    "print('hello');\n",
+    "value = compute(1, 2) # comment too close\n",
+    "   misaligned = True\n",
+    "result = []  # TODO: fill the results\n",
+    "class  my_class:\n",
+    "def CamelCaseFunction(argument):\n",
+    "text = 'a string with a # sign and a ; semicolon'\n",
+    "message = 'this line is definitely longer than the limit of seventy nine characters'\n",
+]
+
+# Words used to build the long lines
+WORDS = ["bus_id", "stop_name", "next_stop", "a_time", "value", "result", "compute", "Route", "# note", ";"]
+
+
+def generate_lines(num_lines: int, seed: int = 0) -> List[str]:
+    """Return a reproducible list of synthetic code lines.
+
+    Keyword arguments:
+    num_lines -- Number of lines to generate
+    seed -- Seed of the random generator
+    """
+
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < num_lines:
+        # Sometimes add a run of blank lines, so the blank lines rule is also exercised
+        if rng.random() < 0.01:
+            lines.extend(["\n"] * rng.randint(1, 4))
+        else:
+            lines.append(rng.choice(LINE_TEMPLATES))
+    return lines[:num_lines]
+
+
+def load_legacy_analyzer(revision: str):
+    """Return the code_analyzer module of a git revision, the baseline of the comparison, imported from a temp copy.
+
+    The checks of that module search their pattern strings on every call and raise and catch an exception for every
+    issue, which is printed.
+
+    Keyword arguments:
+    revision -- Git revision of the baseline, the first commit of the repository when empty
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        if not revision:
+            revision = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=directory, check=True,
+                                      capture_output=True, text=True).stdout.split()[-1]
+        source = subprocess.run(["git", "show", f"{revision}:code_analyzer.py"], cwd=directory, check=True,
+                                capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError, IndexError) as err:
+        raise SystemExit(f"Error: could not read code_analyzer.py of the baseline revision from git: {err}")
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        file_name = os.path.join(temp_directory, "legacy_code_analyzer.py")
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write(source)
+        spec = importlib.util.spec_from_file_location("legacy_code_analyzer", file_name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def run_per_check(analyzer: StaticCodeAnalyzer, legacy_module):
+    """Check the loaded file calling each legacy check_* method for every line (the original analyze_file loop).
+
+    Keyword arguments:
+    analyzer -- Analyzer with the file already loaded
+    legacy_module -- code_analyzer module of the baseline revision
+    """
+
+    legacy = legacy_module.StaticCodeAnalyzer()
+    legacy.file_name = analyzer.file_name
+    blank_count = 0
+    for line in enumerate(analyzer.code_text, 1):
+        legacy.check_line_length(line)
+        legacy.check_indentation(line)
+        legacy.check_semicolons(line)
+        legacy.check_comment_spaces(line)
+        legacy.check_todo_comments(line)
+        legacy.check_blank_lines(line, blank_count)
+        legacy.check_construction_spaces(line)
+        legacy.check_class_name(line)
+        legacy.check_function_name(line)
+
+        if line[1].strip() == '':
+            blank_count += 1
+        else:
+            blank_count = 0
+
+
+def run_scanner(analyzer: StaticCodeAnalyzer):
+    """Check the loaded file with the single-pass line scanner.
+
+    Keyword arguments:
+    analyzer -- Analyzer with the file already loaded
+    """
+
+    analyzer.emitter.emit(analyzer.file_name, list(analyzer.scanner.scan(analyzer.code_text, analyzer.file_name)))
+
+
+def time_run(function, analyzer: StaticCodeAnalyzer, repeat: int):
+    """Return the best time of the given runs and the output of the last one.
+
+    Keyword arguments:
+    function -- Function that checks the lines of the analyzer
+    analyzer -- Analyzer with the file already loaded
+    repeat -- Number of runs
+    """
+
+    best = float("inf")
+    output = ""
+    for _ in range(repeat):
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            start = time.perf_counter()
+            function(analyzer)
+            best = min(best, time.perf_counter() - start)
+        output = buffer.getvalue()
+    return best, output
+
+
+def generate_long_lines(num_lines: int, seed: int = 0) -> List[str]:
+    """Return a reproducible list of long code lines (100 to 2000 characters), with comments and semicolons.
+
+    Keyword arguments:
+    num_lines -- Number of lines to generate
+    seed -- Seed of the random generator
+    """
+
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_lines):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(10, 200))]
+        lines.append("x = " + " + ".join(words) + "\n")
+    return lines
+
+
+def generate_nested_source(num_blocks: int, depth: int) -> List[str]:
+    """Return the lines of a module of deeply nested functions and classes, with arguments and variables.
+
+    Keyword arguments:
+    num_blocks -- Number of top-level nested blocks
+    depth -- Nesting depth of each block
+    """
+
+    lines = []
+    for block in range(num_blocks):
+        for level in range(depth):
+            indent = "    " * level
+            if level % 2:
+                lines.append(f"{indent}class Level{block}_{level}:\n")
+            else:
+                lines.append(f"{indent}def level_{block}_{level}(ArgValue, items=[]):\n")
+                lines.append(f"{indent}    LocalValue = ArgValue\n")
+        lines.append("    " * depth + "pass\n")
+        lines.append("\n")
+    return lines
+
+
+def write_corpus(directory: str, scale: float, seed: int) -> Dict[str, Dict]:
+    """Write the synthetic corpora of the suite and return the scenarios that analyze them.
+
+    Each scenario analyzes a directory with analyze_path ("path") or each file of it with analyze_file ("file").
+
+    Keyword arguments:
+    directory -- Directory where the corpora are written
+    scale -- Factor applied to the size of every corpus
+    seed -- Seed of the random generators
+    """
+
+    def write(name: str, file_name: str, lines: List[str]):
+        os.makedirs(os.path.join(directory, name), exist_ok=True)
+        with open(os.path.join(directory, name, file_name), "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    # Many small files, in a few packages
+    for index in range(max(1, int(2000 * scale))):
+        write(os.path.join("small_files", f"package_{index % 20}"), f"module_{index}.py",
+              generate_lines(50, seed + index))
+
+    # A few huge files, under the stream size so every rule runs
+    for index in range(3):
+        write("huge_files", f"huge_{index}.py", generate_lines(max(1, int(300_000 * scale)), seed + index))
+
+    # Files of long lines
+    for index in range(4):
+        write("long_lines", f"long_{index}.py", generate_long_lines(max(1, int(5_000 * scale)), seed + index))
+
+    # Files of deeply nested definitions, the AST rules dominate
+    for index in range(4):
+        write("nested_ast", f"nested_{index}.py", generate_nested_source(max(1, int(2_000 * scale)), 40))
+
+    return {
+        "small_files": {"entry": "path"},
+        "huge_files": {"entry": "file"},
+        "long_lines": {"entry": "file"},
+        "nested_ast": {"entry": "file"},
+    }
+
+
+def measure(directory: str, entry: str, repeat: int) -> Dict:
+    """Analyze a corpus and return its throughput, peak memory and per-rule time.
+
+    It runs in its own process, so the peak RSS only belongs to the scenario.
+
+    Keyword arguments:
+    directory -- Directory of the corpus
+    entry -- "path" to analyze the directory with analyze_path, "file" to call analyze_file for each file
+    repeat -- Number of timed runs, the best one is kept
+    """
+
+    file_names = sorted(os.path.join(root, name) for root, _, names in os.walk(directory) for name in names)
+    lines = 0
+    size = 0
+    for file_name in file_names:
+        with open(file_name, "rb") as f:
+            data = f.read()
+        lines += data.count(b"\n")
+        size += len(data)
+
+    def run(analyzer: StaticCodeAnalyzer):
+        if entry == "path":
+            analyzer.analyze_path(directory, recursive=True)
+        else:
+            for file_name in file_names:
+                analyzer.analyze_file(file_name)
+
+    with open(os.devnull, "w") as devnull:
+        # Timed runs, without the profiling overhead
+        best = float("inf")
+        analyzer = StaticCodeAnalyzer(emitter=TextEmitter(devnull))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(analyzer)
+            best = min(best, time.perf_counter() - start)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # One profiled run for the time of each rule
+        analyzer = StaticCodeAnalyzer(emitter=TextEmitter(devnull), profile=True)
+        run(analyzer)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak_rss_mb = peak_rss / (1 << 20) if sys.platform == "darwin" else peak_rss / 1024
+    return {
+        "entry": entry,
+        "files": len(file_names),
+        "lines": lines,
+        "bytes": size,
+        "seconds": round(best, 6),
+        "files_per_sec": round(len(file_names) / best, 1),
+        "lines_per_sec": round(lines / best, 1),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "rules": {code: {"calls": calls, "hits": hits, "seconds": round(seconds, 6)}
+                  for code, (calls, hits, seconds) in sorted(analyzer.profile.stats.items())},
+    }
+
+
+def run_suite(args: argparse.Namespace):
+    """Generate the corpora, measure every scenario in a fresh process and write the results as JSON.
+
+    Keyword arguments:
+    args -- Command line arguments of the run command
+    """
+
+    results = {
+        "analyzer_version": StaticCodeAnalyzer.VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        scenarios = write_corpus(directory, args.scale, args.seed)
+        for name, scenario in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+
+            command = [sys.executable, os.path.abspath(__file__), "measure", os.path.join(directory, name),
+                       scenario["entry"], "--repeat", str(args.repeat)]
+            output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+            results["scenarios"][name] = json.loads(output)
+
+            result = results["scenarios"][name]
+            print(f"{name:<12} {result['files']:>6} files {result['lines']:>9} lines {result['seconds']:>8.3f}s "
+                  f"{result['lines_per_sec']:>12,.0f} lines/s {result['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+def compare_results(args: argparse.Namespace):
+    """Compare the results of a run against a baseline, exit with status 1 if the throughput regressed.
+
+    Keyword arguments:
+    args -- Command line arguments of the compare command
+    """
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = []
+    print(f"{'Scenario':<12}{'Baseline lines/s':>18}{'Current lines/s':>18}{'Change':>9}{'RSS MB':>16}")
+    for name, base in baseline["scenarios"].items():
+        if name not in current["scenarios"]:
+            continue
+
+        result = current["scenarios"][name]
+        change = result["lines_per_sec"] / base["lines_per_sec"] - 1
+        print(f"{name:<12}{base['lines_per_sec']:>18,.0f}{result['lines_per_sec']:>18,.0f}{change:>+9.1%}"
+              f"{base['peak_rss_mb']:>8.1f}{result['peak_rss_mb']:>8.1f}")
+        if change < -args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"Throughput regression above {args.threshold:.0%}: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+def compare_scanner(args: argparse.Namespace):
+    """Compare the per-check path against the single-pass scanner on a synthetic corpus.
+
+    Keyword arguments:
+    args -- Command line arguments of the scanner command
+    """
+
+    # Write the synthetic corpus to a temporary file and load it once
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "corpus.py")
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.writelines(generate_lines(args.lines, args.seed))
+
+        analyzer = StaticCodeAnalyzer()
+        analyzer.load_file(file_name)
+
+        legacy_module = load_legacy_analyzer(args.baseline)
+        per_check_time, per_check_output = time_run(lambda loaded: run_per_check(loaded, legacy_module), analyzer,
+                                                     args.repeat)
+        scanner_time, scanner_output = time_run(run_scanner, analyzer, args.repeat)
+
+    # Both paths must report exactly the same issues
+    if per_check_output != scanner_output:
+        raise SystemExit("Error: the scanner output differs from the per-check output.")
+
+    issues = per_check_output.count("\n")
+    print(f"Corpus: {args.lines} lines, {issues} issues")
+    print(f"Per-check: {per_check_time:.3f}s ({args.lines / per_check_time:,.0f} lines/s)")
+    print(f"Scanner:   {scanner_time:.3f}s ({args.lines / scanner_time:,.0f} lines/s)")
+    print(f"Speedup:   {per_check_time / scanner_time:.2f}x")
+
+
+def main():
+    """Run the benchmark command given in the arguments."""
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the static code analyzer.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scanner = commands.add_parser("scanner", help="Compare the per-check path against the single-pass scanner.")
+    scanner.add_argument("--lines", type=int, default=1_000_000, help="Number of lines of the synthetic corpus.")
+    scanner.add_argument("--repeat", type=int, default=3, help="Number of runs of each path, the best one is kept.")
+    scanner.add_argument("--seed", type=int, default=0, help="Seed used to generate the corpus.")
+    scanner.add_argument("--baseline", default="", metavar="REVISION",
+                         help="Git revision whose code_analyzer.py is the per-check path (default: the first commit).")
+    scanner.set_defaults(function=compare_scanner)
+
+    run = commands.add_parser("run", help="Measure every scenario of the suite and write the results as JSON.")
+    run.add_argument("-o", "--output", metavar="FILE", help="File where the results are written (default: stdout).")
+    run.add_argument("--scale", type=float, default=1.0, help="Factor applied to the size of every corpus.")
+    run.add_argument("--repeat", type=int, default=3, help="Number of runs of each scenario, the best one is kept.")
+    run.add_argument("--seed", type=int, default=0, help="Seed used to generate the corpora.")
+    run.add_argument("--scenario", action="append", help="Only measure this scenario (can be repeated).")
+    run.set_defaults(function=run_suite)
+
+    compare = commands.add_parser("compare", help="Fail if the throughput regressed against a baseline.")
+    compare.add_argument("baseline", help="JSON results of the baseline run.")
+    compare.add_argument("current", help="JSON results of the current run.")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="Maximum accepted throughput loss, as a fraction (default: 0.10).")
+    compare.set_defaults(function=compare_results)
+
+    # Internal command, each scenario is measured in its own process
+    measure_command = commands.add_parser("measure")
+    measure_command.add_argument("directory")
+    measure_command.add_argument("entry", choices=("file", "path"))
+    measure_command.add_argument("--repeat", type=int, default=3)
+    measure_command.set_defaults(function=lambda args: print(json.dumps(measure(args.directory, args.entry,
+                                                                               args.repeat))))
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
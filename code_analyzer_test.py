@@ -0,0 +1,338 @@
+# imports the necessary packages
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import code_analyzer
+
+
+# module whose strings hold column-0 code: lines 7 to 10 are a string, the function of line 13 has a wrong argument and
+# the string of lines 17 to 19 holds the quotes of another string
+STRING_WITH_CODE = """import os
+
+
+def fine(x):
+    pass
+
+s = '''
+def NotReal(xX):
+    pass
+'''
+
+
+def Deco(qQ):
+    pass
+
+
+u = '''
+y = \"\"\"
+'''
+"""
+
+
+# .gitignore-style patterns
+class IgnoreRuleTest(unittest.TestCase):
+    @staticmethod
+    def ignored(patterns, relative_path, is_dir=False, base=""):
+        rules = [code_analyzer.IgnoreRule(pattern, base) for pattern in patterns]
+        return code_analyzer.FileFinder.is_ignored(rules, relative_path, is_dir)
+
+    def test_negation(self):
+        self.assertTrue(self.ignored(["*.py"], "src/main.py"))
+        self.assertFalse(self.ignored(["*.py", "!main.py"], "src/main.py"))
+        self.assertTrue(self.ignored(["*.py", "!main.py"], "src/other.py"))
+
+        # the last matching rule decides
+        self.assertTrue(self.ignored(["!main.py", "*.py"], "main.py"))
+
+    def test_anchoring(self):
+        # a leading or a middle slash anchors the pattern to its directory
+        self.assertTrue(self.ignored(["/docs"], "docs", True))
+        self.assertFalse(self.ignored(["/docs"], "src/docs", True))
+        self.assertTrue(self.ignored(["docs"], "src/docs", True))
+        self.assertTrue(self.ignored(["src/gen"], "src/gen", True))
+        self.assertFalse(self.ignored(["src/gen"], "lib/src/gen", True))
+
+        # the patterns of a nested ignore file are relative to its directory
+        self.assertTrue(self.ignored(["gen"], "src/a/gen", True, "src"))
+        self.assertFalse(self.ignored(["gen"], "gen", True, "src"))
+        self.assertTrue(self.ignored(["/gen"], "src/gen", True, "src"))
+        self.assertFalse(self.ignored(["/gen"], "src/a/gen", True, "src"))
+
+    def test_directory_only(self):
+        self.assertTrue(self.ignored(["build/"], "build", True))
+        self.assertTrue(self.ignored(["build/"], "src/build", True))
+        self.assertFalse(self.ignored(["build/"], "build", False))
+        self.assertTrue(self.ignored(["build"], "build", False))
+
+    def test_wildcards(self):
+        self.assertTrue(self.ignored(["doc/*.txt"], "doc/a.txt"))
+        self.assertFalse(self.ignored(["doc/*.txt"], "doc/a/b.txt"))
+        self.assertTrue(self.ignored(["doc/**/*.txt"], "doc/a/b.txt"))
+        self.assertTrue(self.ignored(["doc/**/*.txt"], "doc/b.txt"))
+        self.assertTrue(self.ignored(["test_?.py"], "test_a.py"))
+        self.assertTrue(self.ignored(["[!a]*.py"], "b.py"))
+        self.assertFalse(self.ignored(["[!a]*.py"], "a.py"))
+
+
+# recursive discovery of the Python files of a tree
+class FileFinderTest(unittest.TestCase):
+    FILES = {
+        ".gitignore": "# generated files\n*_pb2.py\n!keep_pb2.py\n/scripts\ncache/\n",
+        "main.py": "",
+        "api_pb2.py": "",
+        "keep_pb2.py": "",
+        "notes.txt": "",
+        "scripts/run.py": "",
+        "src/scripts/run.py": "",
+        "src/.gitignore": "local.py\n",
+        "src/local.py": "",
+        "src/pkg/local.py": "",
+        "src/pkg/module.py": "",
+        "cache/module.py": "",
+        "build/module.py": "",
+        "tools/env/bin/tool.py": "",
+        "tools/env/pyvenv.cfg": "",
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for name, text in self.FILES.items():
+            file_name = os.path.join(self.directory.name, *name.split("/"))
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(file_name, "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def found(self, finder):
+        return [os.path.relpath(file_name, self.directory.name).replace(os.sep, "/")
+                for file_name in finder.find(self.directory.name)]
+
+    def test_find(self):
+        self.assertEqual(self.found(code_analyzer.FileFinder()),
+                         ["keep_pb2.py", "main.py", "src/pkg/module.py", "src/scripts/run.py"])
+
+    def test_exclude(self):
+        self.assertEqual(self.found(code_analyzer.FileFinder(["src/pkg/", "!build/"])),
+                         ["build/module.py", "keep_pb2.py", "main.py", "src/scripts/run.py"])
+
+    def test_not_recursive(self):
+        self.assertEqual(self.found(code_analyzer.FileFinder(recursive=False)), ["keep_pb2.py", "main.py"])
+
+
+# persistent result cache, keyed by the content of the files and the settings of the analyzer
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.directory.name, "cache.db")
+        self.file_name = os.path.join(self.directory.name, "module.py")
+        self.write("def Bad(aA):\n    pass\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, text):
+        with open(self.file_name, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    # returns the (line, code) of the findings of the file and if they were analyzed instead of read from the cache
+    def analyze(self, analyzer_class=code_analyzer.StaticCodeAnalyzer, **options):
+        analyzer = analyzer_class(cache_file=self.cache_file, **options)
+        try:
+            with mock.patch.object(analyzer, "check_function_definition",
+                                   wraps=analyzer.check_function_definition) as check:
+                findings = [(finding.line, finding.code) for finding in analyzer.find_issues(self.file_name)]
+        finally:
+            analyzer.close()
+        return findings, check.called
+
+    def test_hit(self):
+        findings, analyzed = self.analyze()
+        self.assertTrue(analyzed)
+        self.assertEqual(self.analyze(), (findings, False))
+
+    def test_content_change(self):
+        self.analyze()
+        stat = os.stat(self.file_name)
+
+        # the same size and modification time, another content
+        self.write("def Bad(bB):\n    pass\n")
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.path.getsize(self.file_name), stat.st_size)
+
+        findings, analyzed = self.analyze()
+        self.assertTrue(analyzed)
+        self.assertEqual(findings, [(1, "S009"), (1, "S010")])
+
+    def test_modification_time_change(self):
+        findings, _ = self.analyze()
+        stat = os.stat(self.file_name)
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.analyze(), (findings, False))
+
+    def test_rule_set_change(self):
+        self.analyze()
+        self.assertEqual(self.analyze(ignore=["S010"]), ([(1, "S009")], True))
+        self.assertEqual(self.analyze(select=["S010"]), ([(1, "S010")], True))
+        self.assertEqual(self.analyze(use_tokenizer=True)[1], True)
+
+        # the limits of the rules are settings too
+        class LongLines(code_analyzer.StaticCodeAnalyzer):
+            MAX_LINE_LENGTH = 120
+
+        self.assertEqual(self.analyze(LongLines)[1], True)
+
+        # the entries of each rule set are kept
+        self.assertEqual(self.analyze(ignore=["S010"]), ([(1, "S009")], False))
+
+    def test_eviction(self):
+        self.analyze(cache_size=1)
+        self.analyze(ignore=["S010"], cache_size=1)
+        self.assertEqual(self.analyze(ignore=["S010"], cache_size=1)[1], False)
+        self.assertEqual(self.analyze(cache_size=1)[1], True)
+
+
+# analyses of the daemon against the analyses of the same files in process
+class DaemonTest(unittest.TestCase):
+    FILES = {
+        "module.py": STRING_WITH_CODE,
+        "pkg/style.py": "import os;\nx = 1 # comment\n\n\n\ny = '" + "c" * 90 + "'\n",
+        "pkg/sub/classes.py": "class bad_name:\n    def Method(self, aA=[]):\n        Var = 1\n",
+        "pkg/sub/ignored.py": "x = 1;\n",
+        "pkg/broken.py": "def f(:\n  pass\n",
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        for name, text in cls.FILES.items():
+            file_name = os.path.join(cls.directory.name, *name.split("/"))
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(file_name, "w", encoding="utf-8") as f:
+                f.write(text)
+
+        # the code analyzer itself is a larger module
+        with open(code_analyzer.__file__, encoding="utf-8") as f:
+            cls.large_text = f.read()
+        with open(os.path.join(cls.directory.name, "pkg", "large.py"), "w", encoding="utf-8") as f:
+            f.write(cls.large_text)
+
+        cls.socket_name = os.path.join(cls.directory.name, "daemon.sock")
+        cls.server = code_analyzer.AnalyzerDaemon(cls.socket_name)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.directory.cleanup()
+
+    # returns the reports of an analysis in process and by the daemon, as text and as JSON lines
+    def reports(self, analyze, *args, **options):
+        reports = []
+        for emitter_class in (code_analyzer.TextEmitter, code_analyzer.JsonLinesEmitter):
+            local_output, remote_output = io.StringIO(), io.StringIO()
+            local = code_analyzer.StaticCodeAnalyzer(emitter=emitter_class(local_output), **options)
+            remote = code_analyzer.RemoteAnalyzer(self.socket_name, emitter=emitter_class(remote_output), **options)
+            try:
+                getattr(local, analyze)(*args)
+                getattr(remote, analyze)(*args)
+            finally:
+                local.close()
+                remote.close()
+            reports.append((local_output.getvalue(), remote_output.getvalue()))
+        return reports
+
+    def assertSameReports(self, analyze, *args, **options):
+        for local_report, remote_report in self.reports(analyze, *args, **options):
+            self.assertTrue(local_report)
+            self.assertEqual(remote_report, local_report)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, *name.split("/"))
+
+    def test_file(self):
+        for name in list(self.FILES) + ["pkg/large.py"]:
+            self.assertSameReports("analyze_file", self.path(name))
+
+        # the second request is answered from the cache of the daemon
+        self.assertSameReports("analyze_file", self.path("pkg/style.py"))
+
+    def test_missing_file(self):
+        self.assertSameReports("analyze_file", self.path("missing.py"))
+
+    def test_path(self):
+        self.assertSameReports("analyze_path", self.directory.name, 1, True, ["ignored.py"])
+        self.assertSameReports("analyze_path", self.path("pkg"), 1, False)
+
+    def test_source(self):
+        self.assertSameReports("analyze_source", self.path("module.py"), self.FILES["pkg/style.py"].encode())
+
+    def test_changes(self):
+        self.assertSameReports("analyze_changes", self.path("module.py"), [(10, 17)])
+        self.assertSameReports("analyze_changes", self.path("pkg/large.py"), [(1, 5), (400, 420)])
+
+    def test_rule_selection(self):
+        self.assertSameReports("analyze_file", self.path("pkg/style.py"), select=["S00"], ignore=["S001"])
+        self.assertSameReports("analyze_file", self.path("pkg/style.py"), use_tokenizer=True)
+
+
+# incremental analysis of the changed lines of a file against the analysis of the whole file
+class ChangedIssuesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # returns the name of a new file of the temporary directory with the given text
+    def write(self, text, name="module.py"):
+        file_name = os.path.join(self.directory.name, name)
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write(text)
+        return file_name
+
+    # returns the (line, code) of the findings of the whole file within the lines
+    @staticmethod
+    def full_findings(file_name, first, last):
+        return [(finding.line, finding.code) for finding in code_analyzer.StaticCodeAnalyzer().find_issues(file_name)
+                if first <= finding.line <= last]
+
+    @staticmethod
+    def changed_findings(file_name, first, last, **options):
+        analyzer = code_analyzer.StaticCodeAnalyzer(**options)
+        return [(finding.line, finding.code) for finding in analyzer.find_changed_issues(file_name, [(first, last)])]
+
+    def test_code_inside_a_string(self):
+        file_name = self.write(STRING_WITH_CODE)
+        self.assertIn((13, "S010"), self.changed_findings(file_name, 10, 17))
+        self.assertEqual(self.changed_findings(file_name, 10, 17), self.full_findings(file_name, 10, 17))
+        self.assertEqual(self.changed_findings(file_name, 10, 17, use_tokenizer=True),
+                         self.full_findings(file_name, 10, 17))
+
+        # the definition inside the string is not a function
+        self.assertNotIn((8, "S010"), self.changed_findings(file_name, 8, 17))
+
+    def test_statement_starts(self):
+        analyzer = code_analyzer.StaticCodeAnalyzer()
+        for text in (STRING_WITH_CODE, 'x = (1,\n2)\ny = """a\nb"""  # c\n\n# d\nz = 1 + \\\n2\n'):
+            analyzer.set_source("module.py", text.encode())
+            self.assertEqual(analyzer.find_statement_starts(), code_analyzer.TokenIndex(text).statement_starts)
+
+    def test_unclosed_string(self):
+        file_name = self.write("def Deco(qQ):\n    pass\n\n\ns = '''\n")
+        analyzer = code_analyzer.StaticCodeAnalyzer()
+        analyzer.read_file(file_name)
+        self.assertIsNone(analyzer.find_statement_starts())
+
+        # the whole file can't be parsed either
+        self.assertEqual(self.changed_findings(file_name, 1, 2), self.full_findings(file_name, 1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,284 +1,2067 @@
-# imports the necessary packages
-import json
-import re
-from datetime import datetime
-
-
-# function that validates the date
-def is_valid_date(date_str):
-    # checks if it was given in the correct data type
-    if type(date_str) != str:
-        return False
-    # as it is a required field, checks if it was informed
-    elif len(date_str) < 5:
-        return False
-    # checks if it was informed in the correct format
-    elif (not date_str[:2].isdigit()) or \
-         (date_str[2] != ':') or \
-         (not date_str[3:].isdigit()):
-        return False
-    # checks if it is a valid time
-    elif (date_str[0] not in ['0', '1', '2']) or \
-         (date_str[3] not in ['0', '1', '2', '3', '4', '5']):
-        print(date_str[0])
-        print(date_str[3])
-        return False
-    else:
-        return True
-
-
-# function that validates field types and required fields
-def validate_fields(data):
-    # error variables
-    total_err, bus_id_err, stop_id_err, stop_name_err, next_stop_err, stop_type_err, a_time_err = 0, 0, 0, 0, 0, 0, 0
-
-    # iterates over each json sub-element
-    for bus_line in data:
-        # checks data types and required fields
-        if type(bus_line["bus_id"]) != int:
-            bus_id_err += 1
-            total_err += 1
-        if type(bus_line["stop_id"]) != int:
-            stop_id_err += 1
-            total_err += 1
-        if (type(bus_line["stop_name"]) != str) or (bus_line["stop_name"].strip() == ''):
-            stop_name_err += 1
-            total_err += 1
-        if type(bus_line["next_stop"]) != int:
-            next_stop_err += 1
-            total_err += 1
-        if (type(bus_line["stop_type"]) != str) or (bus_line["stop_type"] not in ['', 'S', 'O', 'F']):
-            stop_type_err += 1
-            total_err += 1
-        if not is_valid_date(bus_line["a_time"]):
-            a_time_err += 1
-            total_err += 1
-
-    # prints the errors found
-    print(f"Type and required field validation: {total_err} errors")
-    print(f"bus_id: {bus_id_err}")
-    print(f"stop_id: {stop_id_err}")
-    print(f"stop_name: {stop_name_err}")
-    print(f"next_stop: {next_stop_err}")
-    print(f"stop_type: {stop_type_err}")
-    print(f"a_time: {a_time_err}")
-
-
-# function that validates stop name, stop type and time formats
-def validate_fields_regex(data):
-    # error variables
-    total_err, stop_name_err, stop_type_err, a_time_err = 0, 0, 0, 0
-
-    # iterates over each json sub-element
-    for bus_line in data:
-        # checks data types and required fields
-        template = r"^([A-Z]\w+\s)+(Road|Avenue|Boulevard|Street)$"
-        if not re.match(template, bus_line["stop_name"]):
-            stop_name_err += 1
-            total_err += 1
-        if bus_line["stop_type"] not in ['', 'S', 'O', 'F']:
-            stop_type_err += 1
-            total_err += 1
-        template = "^([0-1][0-9]|2[0-3]):([0-5][0-9])$"
-        if not re.match(template, bus_line["a_time"]):
-            a_time_err += 1
-            total_err += 1
-
-    # prints the missing and type errors found
-    print(f"Format validation: {total_err} errors")
-    print(f"stop_name: {stop_name_err}")
-    print(f"stop_type: {stop_type_err}")
-    print(f"a_time: {a_time_err}")
-
-
-# function that retrieve bus lines name and number of stops
-def get_bus_line_info(data):
-    # dictionary to store bus lines and number of stops
-    bus_line_dict = {}
-
-    # iterates over each json sub-element
-    for bus_line in data:
-        # creates or updates the bus_id and the number of stops in the dictionary
-        bus_line_dict[bus_line["bus_id"]] = bus_line_dict.get(bus_line["bus_id"], 0) + 1
-
-    # prints the lines and the number of stops
-    print("Line names and number of stops:")
-    for bus_line, stops in bus_line_dict.items():
-        print(f"bus_id: {bus_line}, stops: {stops}")
-
-
-# function that validate if every bus line has one start stop and one finish stop
-def validate_start_stop(data):
-    flag_ok = True
-
-    # dictionary to store bus lines and number of starting point, final stops and transfer stops
-    starting_point_dict, final_stop_dict, transfer_stop_dict = dict(), dict(), dict()
-
-    # sets of starting point, final stops and transfer stops
-    starting_point_set, final_stop_set, transfer_stop_set = set(), set(), set()
-
-    # iterate over each json sub-element
-    for bus_line in data:
-        # gets the actual bus_id
-        actual_bus_id = str(bus_line["bus_id"])
-
-        # updates the dictionaries with this bus line information
-        starting_point_dict[actual_bus_id] = starting_point_dict.get(actual_bus_id, 0)
-        final_stop_dict[actual_bus_id] = final_stop_dict.get(actual_bus_id, 0)
-        transfer_stop_dict[bus_line["stop_name"]] = transfer_stop_dict.get(bus_line["stop_name"], 0) + 1
-
-        # if this stop_name has more than 1 occurrence, it means that it is shared by 2 or more bus lines
-        # so, we add it to the transfer_set
-        if transfer_stop_dict.get(bus_line["stop_name"], 0) > 1:
-            transfer_stop_set.add(bus_line["stop_name"])
-
-        # if it is a starting point...
-        if bus_line["stop_type"] == "S":
-            # check if another starting point has already been detected for this line
-            if starting_point_dict.get(actual_bus_id, 0) > 0:
-                print(f'There is more than one starting point for the line: {actual_bus_id}.')
-                flag_ok = False
-                break
-            else:
-                # if not, indicate that one starting point was detected for this line
-                starting_point_dict[actual_bus_id] = 1
-
-                # add this starting point to the starting_point_set
-                starting_point_set.add(bus_line["stop_name"])
-
-        # if it is a final stop...
-        elif bus_line["stop_type"] == "F":
-            # check if another final stop has already been detected for this line
-            if final_stop_dict.get(actual_bus_id, 0) > 0:
-                print(f'There is more than one final stop for the line: {actual_bus_id}.')
-                flag_ok = False
-                break
-            else:
-                # if not, indicate that one starting point was detected for this line
-                final_stop_dict[actual_bus_id] = 1
-
-                # add this final stop to the final_stop_set
-                final_stop_set.add(bus_line["stop_name"])
-
-    # if everything is ok until this point...
-    if flag_ok:
-        # check if every bus line has a starting point and a final stop
-        for key in sorted(starting_point_dict):
-            if starting_point_dict[key] + final_stop_dict[key] < 2:
-                print(f'There is no start or end stop for the line: {key}.')
-                flag_ok = False
-
-    # if everything is still ok...
-    if flag_ok:
-        # print the stop types info
-        print(f"Start stops: {len(starting_point_set)} {sorted(starting_point_set)}")
-        print(f"Transfer stops: {len(transfer_stop_set)} {sorted(transfer_stop_set)}")
-        print(f"Finish stops: {len(final_stop_set)} {sorted(final_stop_set)}")
-
-
-# function tha validate the arrival times
-def validate_arrival_time(data):
-    print("Arrival time test:")
-
-    previous_bus_id = -1
-    previous_a_time = ""
-    result = True
-
-    # this flag indicates that the current bus_id shall not be tested anymore
-    flag_skip_bus_id = False
-
-    # iterate over each json sub-element
-    for bus_line in data:
-        if flag_skip_bus_id and (previous_bus_id == bus_line["bus_id"]):
-            continue
-
-        # if it is the first stop of the bus line, there is no previous a_time to compare with
-        if bus_line["stop_type"] == "S":
-            # so, just store the bus_id and a_time to compare with the next stop
-            previous_bus_id = bus_line["bus_id"]
-            previous_a_time = datetime.strptime(bus_line["a_time"], "%H:%M")
-
-            # set the flags to False, so this if clause will not be executed again for this bus line
-            flag_skip_bus_id = False
-        else:
-            # get the a_time for the current stop_id
-            current_a_time = datetime.strptime(bus_line["a_time"], "%H:%M")
-
-            # if the current stop is inconsistent with the previous one, print a message
-            if current_a_time <= previous_a_time:
-                print(f"bus_id line {str(bus_line['bus_id'])}: wrong time on station {bus_line['stop_name']}")
-
-                # indicate that the validation of this bus_id is over and an error occurred
-                result = False
-                flag_skip_bus_id = True
-            else:
-                # the actual bus_line becomes the previous
-                previous_bus_id = bus_line['bus_id']
-                previous_a_time = current_a_time
-
-    if result:
-        print("OK")
-
-
-# function that gets all the special stops: start, transfer, finish or on-demand
-def get_special_stops(data):
-    # dictionary to identify transfer stops
-    transfer_stop_dict = dict()
-
-    # sets of starting point, final stops and transfer stops
-    starting_point_set, final_stop_set, transfer_stop_set, ondemand_stop_set = set(), set(), set(), set()
-
-    # iterate over each json sub-element
-    for bus_line in data:
-        # update the transfer stop dictionary with this bus line information
-        transfer_stop_dict[bus_line["stop_name"]] = transfer_stop_dict.get(bus_line["stop_name"], 0) + 1
-
-        # if this stop_name has more than 1 occurrence, it means that it is shared by 2 or more bus lines
-        # so, we add it to the transfer_set
-        if transfer_stop_dict.get(bus_line["stop_name"], 0) > 1:
-            transfer_stop_set.add(bus_line["stop_name"])
-
-        # check if it is a special stop and update the appropriate set
-        if bus_line["stop_type"] == "S":
-            # add this starting point to the starting_point_set
-            starting_point_set.add(bus_line["stop_name"])
-        elif bus_line["stop_type"] == "F":
-            # add this final stop to the final_stop_set
-            final_stop_set.add(bus_line["stop_name"])
-        elif bus_line["stop_type"] == "O":
-            # add this on-demand stop to the on_demand_set
-            ondemand_stop_set.add(bus_line["stop_name"])
-
-    return starting_point_set, final_stop_set, transfer_stop_set, ondemand_stop_set
-
-
-def on_demand_stop_test(data):
-    print("On demand stops test:")
-
-    # get all the special stops
-    starting_set, final_set, transfer_set, ondemand_set = get_special_stops(data)
-
-    # make the union of all special stops sets
-    special_stops = starting_set.union(final_set, transfer_set)
-
-    # intersect the special stops sets with the on-demand set
-    ondemand_special = sorted(ondemand_set.intersection(special_stops))
-
-    # print the appropriate message
-    print(f"Wrong stop type: {ondemand_special}" if len(ondemand_special) > 0 else print("OK"))
-
-
-def main():
-    # converts the input json string
-    data_example_json = json.loads(input())
-
-    validate_fields(data_example_json)
-    validate_fields_regex(data_example_json)
-    get_bus_line_info(data_example_json)
-    validate_start_stop(data_example_json)
-    validate_arrival_time(data_example_json)
-    on_demand_stop_test(data_example_json)
-
-
-if __name__ == "__main__":
-    main()
+# imports the necessary packages
+import argparse
+import builtins
+import contextlib
+import gc
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import sqlite3
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, compress, groupby, islice
+from operator import countOf, itemgetter
+
+
+# valid stop types
+STOP_TYPES = ['', 'S', 'O', 'F']
+
+# pattern of the whitespace between the JSON tokens
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# characters that can follow an element of a JSON array
+JSON_DELIMITERS = frozenset(" \t\n\r,]")
+
+# fields of a stop record, in the order of the columns of a chunk of records
+FIELD_GETTER = itemgetter("bus_id", "stop_id", "stop_name", "next_stop", "stop_type", "a_time")
+
+# number of records fed to the checks at a time
+CHUNK_SIZE = 512
+
+# limits of the integers stored in the typed columns
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# pattern of a valid stop name
+STOP_NAME_PATTERN = re.compile(r"^([A-Z]\w+\s)+(Road|Avenue|Boulevard|Street)$")
+
+# pattern of a time in the HH:MM format
+TIME_FORMAT_PATTERN = re.compile("^([0-1][0-9]|2[0-3]):([0-5][0-9])$")
+
+# pattern of the times accepted by datetime.strptime with the "%H:%M" format (one or two digits for each part)
+STRPTIME_PATTERN = re.compile(r"(2[0-3]|[0-1]\d|\d):([0-5]\d|\d)")
+
+# number of distinct time strings whose facts are memoized
+TIME_CACHE_SIZE = 4096
+
+
+# function that validates the date
+def is_valid_date(date_str):
+    # checks if it was given in the correct data type
+    if type(date_str) != str:
+        return False
+    # as it is a required field, checks if it was informed
+    elif len(date_str) < 5:
+        return False
+    # checks if it was informed in the correct format
+    elif (not date_str[:2].isdigit()) or \
+         (date_str[2] != ':') or \
+         (not date_str[3:].isdigit()):
+        return False
+    # checks if it is a valid time
+    elif (date_str[0] not in ['0', '1', '2']) or \
+         (date_str[3] not in ['0', '1', '2', '3', '4', '5']):
+        return False
+    else:
+        return True
+
+
+# function that converts a time to minutes since midnight, None if datetime.strptime(..., "%H:%M") rejects it
+def time_to_minutes(a_time):
+    match = STRPTIME_PATTERN.fullmatch(a_time) if type(a_time) == str else None
+    if match is None:
+        return None
+    return int(match[1]) * 60 + int(match[2])
+
+
+# function that converts minutes since midnight to a time in the HH:MM format
+def minutes_to_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# function that returns the facts of a time string: whether is_valid_date accepts it, whether it has the HH:MM format
+# and its minutes since midnight, the repeated times are read from the cache
+@lru_cache(maxsize=TIME_CACHE_SIZE, typed=True)
+def time_facts(a_time):
+    return is_valid_date(a_time), TIME_FORMAT_PATTERN.match(a_time) is not None, time_to_minutes(a_time)
+
+
+# function that returns the minutes since midnight of an arrival time, None if it isn't a valid time
+def arrival_minutes(a_time):
+    return time_facts(a_time)[2] if type(a_time) == str else None
+
+
+# function that returns the error of an arrival time that can't be compared with the previous one of its bus line:
+# a time that isn't valid, or the time of a stop that comes before the starting point of the bus line
+def arrival_time_error(bus_id, stop_name, a_time):
+    if arrival_minutes(a_time) is None:
+        return ValueError(f"bus_id line {bus_id}: wrong arrival time {a_time!r} on station {stop_name}.")
+    return ValueError(f"bus_id line {bus_id}: station {stop_name} at {a_time} comes before the starting point.")
+
+
+# function that yields the elements of a top-level JSON array read incrementally from a text stream
+def iter_json_array(stream, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+
+    # state: "start" before the "[", "first" before the first element or "]", "value" before an element
+    # and "separator" before a "," or the "]"
+    state = "start"
+
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()
+
+        # reads the next chunk when the buffer is exhausted, dropping the text already parsed
+        if position == len(buffer):
+            if eof:
+                raise json.JSONDecodeError("Unexpected end of the array", buffer, position)
+            chunk = stream.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise json.JSONDecodeError("Expecting '['", buffer, position)
+            position += 1
+            state = "first"
+        elif state == "separator" or (state == "first" and char == "]"):
+            if char == "]":
+                return
+            if char != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+            position += 1
+            state = "value"
+        else:
+            # an element that isn't followed by a delimiter may continue in the next chunk (e.g. a number)
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = len(buffer)
+            if not eof and (end == len(buffer) or buffer[end] not in JSON_DELIMITERS):
+                chunk = stream.read(chunk_size)
+                buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+                continue
+
+            yield element
+            position = end
+            state = "separator"
+
+
+# column of integer fields (bus_id, stop_id, next_stop) stored in a typed array
+class IntColumn:
+    def __init__(self, values):
+        # the values that are not integers (or don't fit in 64 bits) are kept apart, by record index
+        self.others = {}
+
+        # every value is an integer, the whole column is converted at once
+        if countOf(map(type, values), int) == len(values):
+            try:
+                self.values = array("q", values)
+                return
+            except OverflowError:
+                pass
+
+        self.values = array("q")
+        for index, value in enumerate(values):
+            if type(value) == int and INT64_MIN <= value <= INT64_MAX:
+                self.values.append(value)
+            else:
+                self.others[index] = value
+                self.values.append(0)
+
+    def __len__(self):
+        return len(self.values)
+
+    # returns the original values of the column as a list
+    def to_list(self):
+        values = self.values.tolist()
+        for index, value in self.others.items():
+            values[index] = value
+        return values
+
+    # returns the indexes of the records whose value is not an integer
+    def not_int_rows(self):
+        return [index for index, value in self.others.items() if type(value) != int]
+
+
+# column of categorical fields (stop_name, stop_type, a_time): the distinct values of the records with their number of
+# records, and the code of the distinct value of each record
+class CategoryColumn:
+    def __init__(self, values):
+        self.values = values
+
+        # the values are told apart by type too, so 1, 1.0 and True are different categories, unless all are strings
+        self.typed = not set(map(type, values)) <= {str}
+        self.keys = list(zip(map(type, values), values)) if self.typed else values
+        try:
+            # records of each category, in the order of their first record
+            self.key_counts = Counter(self.keys)
+            self.categories = [key[1] for key in self.key_counts] if self.typed else list(self.key_counts)
+        except TypeError:
+            # lists and dicts can't be hashed, they are identified by their JSON text
+            self.keys = [(type(value), json.dumps(value, sort_keys=True)) for value in values]
+            self.key_counts = Counter(self.keys)
+            self.categories = list(dict(zip(self.keys, values)).values())
+        self.counts = list(self.key_counts.values())
+
+        # code of each category and of each record, assigned the first time a check needs them
+        self.index = None
+        self.record_codes = None
+
+    def __len__(self):
+        return len(self.values)
+
+    # returns the value of a record
+    def __getitem__(self, row):
+        return self.values[row]
+
+    # returns the original values of the column as a list
+    def to_list(self):
+        return list(self.values)
+
+    # returns the code of each category
+    def category_codes(self):
+        if self.index is None:
+            self.index = dict(zip(self.key_counts, range(len(self.key_counts))))
+        return self.index
+
+    # returns the code of a string value, or -1 if no record has it
+    def code_of(self, value):
+        return self.category_codes().get((str, value) if self.typed else value, -1)
+
+    # returns the code of the category of each record
+    def codes(self):
+        if self.record_codes is None:
+            self.record_codes = array("l", map(self.category_codes().__getitem__, self.keys))
+        return self.record_codes
+
+    # returns the indexes of the records of a category
+    def rows(self, code):
+        return list(compress(range(len(self.values)), map(code.__eq__, self.codes())))
+
+    # returns the indexes of the records of the categories whose flag is true
+    def flagged_rows(self, flags):
+        return list(compress(range(len(self.values)), map(flags.__getitem__, self.codes())))
+
+    # returns the number of records of the categories whose flag is true
+    def count(self, flags):
+        return sum(compress(self.counts, flags))
+
+    # returns the number of records of each value, in the order of their first record, equal values of different
+    # categories are added up
+    def value_counts(self):
+        if not self.typed:
+            return Counter(self.key_counts)
+
+        totals = Counter()
+        for value, count in zip(self.categories, self.counts):
+            totals[value] += count
+        return totals
+
+
+# column of arrival times, each category also has its minutes since midnight
+class TimeColumn(CategoryColumn):
+    def __init__(self, values):
+        super().__init__(values)
+
+        # minutes since midnight of each category, None if it isn't a valid time
+        self.minutes = list(map(arrival_minutes, self.categories)) if self.typed else \
+            list(map(itemgetter(2), map(time_facts, self.categories)))
+
+
+# columnar table of bus stops, built once from the columns of their records: typed arrays for the integer fields and
+# categorical text fields
+class StopTable:
+    def __init__(self, columns):
+        bus_id, stop_id, stop_name, next_stop, stop_type, a_time = columns
+        self.bus_id = IntColumn(bus_id)
+        self.stop_id = IntColumn(stop_id)
+        self.stop_name = CategoryColumn(stop_name)
+        self.next_stop = IntColumn(next_stop)
+        self.stop_type = CategoryColumn(stop_type)
+        self.a_time = TimeColumn(a_time)
+
+    def __len__(self):
+        return len(self.bus_id)
+
+
+# chunk of records whose fields have the expected types, as a stop table shared by the checks
+class RecordChunk(StopTable):
+    def __init__(self, records, start=0):
+        super().__init__(list(zip(*map(FIELD_GETTER, records))))
+        self.records = records
+        self.start = start
+
+        # occurrences of each bus line and stop name, in the order of their first record
+        self.bus_id_count = Counter(self.bus_id.values)
+        self.stop_name_count = self.stop_name.value_counts()
+
+    # returns the chunk of the records from the given row, or None if a record misses a field or has a field that
+    # could make a check fail
+    @classmethod
+    def of(cls, records, start=0):
+        try:
+            chunk = cls(records, start)
+
+            # the stop_id and next_stop are keys of the route index
+            hash((tuple(chunk.stop_id.others.values()), tuple(chunk.next_stop.others.values())))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        # the bus_id must be integers of the typed array, not bool, and the text fields strings
+        if chunk.bus_id.others or chunk.stop_name.typed or chunk.stop_type.typed or chunk.a_time.typed:
+            return None
+        return chunk
+
+
+# function that returns the key that sorts the bus_id and stop_id: the integers first, in numeric order, then the
+# other values by their text
+def id_sort_key(value):
+    return (0, value, "") if type(value) == int else (1, 0, str(value))
+
+
+# route of a bus line rebuilt from the next_stop links, with the problems found while following them
+class Route:
+    def __init__(self, bus_id, stops, problems):
+        self.bus_id = bus_id
+
+        # (stop_id, next_stop, a_time, stop_name, stop_type) of each stop, in route order
+        self.stops = stops
+        self.problems = problems
+
+
+# index of the bus lines: the stops of each line by stop_id, linked by their next_stop, a next_stop of 0 ends the line
+class RouteIndex:
+    def __init__(self):
+        # stop_id -> (stop_id, next_stop, a_time, stop_name, stop_type) of each bus line, in the order of their first
+        # record
+        self.lines = {}
+
+        # next_stop of each bus line and stop_id that appear more than once in a bus line
+        self.linked = {}
+        self.repeated = {}
+
+        # routes rebuilt since the last stop was added
+        self.built_routes = None
+
+    # adds stops, as (stop_id, next_stop, a_time, stop_name, stop_type), to a bus line
+    def add_stops(self, bus_id, new_stops):
+        self.built_routes = None
+        stops = self.lines.get(bus_id)
+        if stops is None:
+            stops = self.lines[bus_id] = {}
+            self.linked[bus_id] = set()
+        linked = self.linked[bus_id]
+
+        for stop in new_stops:
+            if stop[0] in stops:
+                self.repeated.setdefault(bus_id, []).append(stop[0])
+            else:
+                stops[stop[0]] = stop
+                linked.add(stop[1])
+
+    # adds the stop of a record
+    def add_record(self, bus_line):
+        self.add_stops(bus_line["bus_id"], [(bus_line["stop_id"], bus_line["next_stop"], bus_line["a_time"],
+                                             bus_line["stop_name"], bus_line["stop_type"])])
+
+    # adds the stops of a chunk of records, the consecutive records of a bus line are added together
+    def add_chunk(self, chunk):
+        stops = zip(chunk.stop_id.to_list(), chunk.next_stop.to_list(), chunk.a_time.to_list(),
+                    chunk.stop_name.to_list(), chunk.stop_type.to_list())
+        for bus_id, line_stops in groupby(zip(chunk.bus_id.values, stops), itemgetter(0)):
+            self.add_stops(bus_id, map(itemgetter(1), line_stops))
+
+    # returns the route of a bus line, each stop is visited once
+    def route(self, bus_id):
+        stops = self.lines[bus_id]
+        problems = [f"bus_id line {bus_id}: stop {stop_id} is repeated." for stop_id in self.repeated.get(bus_id, ())]
+
+        # the route starts at a stop no other stop links to, the starting point if there are many, or at the starting
+        # point of a line that is a cycle
+        linked = self.linked[bus_id]
+        heads = [stop_id for stop_id in stops if stop_id not in linked] or list(stops)
+        start = next((stop_id for stop_id in heads if stops[stop_id][4] == "S"), heads[0])
+
+        stop = stops[start]
+        route, visited = [stop], {start}
+        while stop[1] != 0:
+            if stop[1] in visited:
+                problems.append(f"bus_id line {bus_id}: stop {stop[0]} links back to stop {stop[1]}, a cycle.")
+                break
+            if stop[1] not in stops:
+                problems.append(f"bus_id line {bus_id}: stop {stop[0]} links to the missing stop {stop[1]}.")
+                break
+            visited.add(stop[1])
+            stop = stops[stop[1]]
+            route.append(stop)
+
+        if len(visited) < len(stops):
+            unreachable = sorted((stop_id for stop_id in stops if stop_id not in visited), key=id_sort_key)
+            problems.append(f"bus_id line {bus_id}: unreachable stops {unreachable}.")
+        return Route(bus_id, route, problems)
+
+    # returns the routes of every bus line, sorted by bus_id so the order of the records doesn't matter
+    def routes(self):
+        if self.built_routes is None:
+            self.built_routes = [self.route(bus_id) for bus_id in sorted(self.lines, key=id_sort_key)]
+        return self.built_routes
+
+
+# aggregates shared by the checks, each one is updated once per record by the pipeline
+class StopAggregates:
+    def __init__(self):
+        # stops of each bus line, in the order of their first stop
+        self.line_stops = Counter()
+
+        # occurrences of each stop name, a stop_name with more than 1 occurrence is shared by 2 or more bus lines
+        self.stop_name_count = Counter()
+        self.transfer_stop_set = set()
+
+        # sets of starting point, final stops and on-demand stops
+        self.starting_point_set, self.final_stop_set, self.ondemand_stop_set = set(), set(), set()
+
+        # stops of each bus line, linked by their next_stop
+        self.route_index = RouteIndex()
+
+        # row of the record being checked
+        self.row = 0
+
+    # returns the updates of the aggregates with the given names
+    def updates(self, used):
+        return [(name, update) for name, update in (("lines", self.update_lines),
+                                                    ("stop_names", self.update_stop_names),
+                                                    ("routes", self.route_index.add_record)) if name in used]
+
+    # counts the stops of the bus line of a record
+    def update_lines(self, bus_line):
+        self.line_stops[bus_line["bus_id"]] = self.line_stops.get(bus_line["bus_id"], 0) + 1
+
+    # counts the stop name of a record and adds it to the set of its stop type
+    def update_stop_names(self, bus_line):
+        stop_name = bus_line["stop_name"]
+        count = self.stop_name_count.get(stop_name, 0) + 1
+        self.stop_name_count[stop_name] = count
+        if count == 2:
+            self.transfer_stop_set.add(stop_name)
+
+        stop_type = bus_line["stop_type"]
+        if stop_type == "S":
+            self.starting_point_set.add(stop_name)
+        elif stop_type == "F":
+            self.final_stop_set.add(stop_name)
+        elif stop_type == "O":
+            self.ondemand_stop_set.add(stop_name)
+
+    # updates the aggregates with the given names with a chunk of records, none of them can fail on it
+    def update_chunk(self, chunk, used):
+        if "lines" in used:
+            self.line_stops.update(chunk.bus_id_count)
+
+        if "stop_names" in used:
+            self.stop_name_count.update(chunk.stop_name_count)
+            self.transfer_stop_set.update(stop_name for stop_name in chunk.stop_name_count
+                                          if self.stop_name_count[stop_name] > 1)
+            for stop_type, stop_names in (("S", self.starting_point_set), ("F", self.final_stop_set),
+                                          ("O", self.ondemand_stop_set)):
+                code = chunk.stop_type.code_of(stop_type)
+                if code >= 0:
+                    stop_names.update(map(chunk.stop_name.__getitem__, chunk.stop_type.rows(code)))
+
+        if "routes" in used:
+            self.route_index.add_chunk(chunk)
+
+    # adds the aggregates of the records of other bus lines, the route index isn't merged
+    def merge(self, other):
+        self.line_stops.update(other.line_stops)
+        self.stop_name_count.update(other.stop_name_count)
+        self.transfer_stop_set.update(stop_name for stop_name in other.stop_name_count
+                                      if self.stop_name_count[stop_name] > 1)
+        self.starting_point_set |= other.starting_point_set
+        self.final_stop_set |= other.final_stop_set
+        self.ondemand_stop_set |= other.ondemand_stop_set
+
+
+# function that merges two lists sorted by the row of their items, the rows of the items are given by key and the items
+# of the other list after the last row are left out
+def merge_by_row(items, other_items, last_row=None, key=itemgetter(0)):
+    if last_row is not None:
+        other_items = [item for item in other_items if key(item) <= last_row]
+
+    # the items of the bus lines merged in order come after the ones of the list
+    if items and other_items and key(other_items[0]) < key(items[-1]):
+        return sorted(items + other_items, key=key)
+    items.extend(other_items)
+    return items
+
+
+# function that returns the json values of an error raised by a record: the name of its type and its arguments
+def error_state(error):
+    return [type(error).__name__, list(error.args)]
+
+
+# function that returns the error of its json values, as the built-in exception it was, or a RuntimeError with its
+# message for the other ones
+def error_of_state(state):
+    name, args = state
+    error_type = getattr(builtins, name, None)
+    if isinstance(error_type, type) and issubclass(error_type, Exception):
+        try:
+            return error_type(*args)
+        except TypeError:
+            pass
+    return RuntimeError(f"{name}: {', '.join(map(str, args))}")
+
+
+# function that returns the row of its json value, the rows made of several numbers are tuples
+def row_of_state(row):
+    return tuple(row) if type(row) == list else row
+
+
+# result of a check: whether the records passed it, its counts, the rows of the offending records, its messages and
+# the errors raised by the records, with their row
+class CheckResult:
+    def __init__(self, name, ok, counts, rows, messages, errors):
+        self.name = name
+        self.ok = ok
+        self.counts = counts
+        self.rows = rows
+        self.messages = messages
+        self.errors = errors
+
+    # returns the result as a dictionary of json values, an error becomes its type and message
+    def as_dict(self):
+        return {"check": self.name, "ok": self.ok, "counts": self.counts, "rows": self.rows,
+                "messages": self.messages,
+                "errors": [{"row": row, "error": f"{type(error).__name__}: {error}"} for row, error in self.errors]}
+
+
+# function that writes the results of the checks as a json document, or as json lines with one result per line
+def write_results(results, output_format, output=None):
+    output = sys.stdout if output is None else output
+    if output_format == "jsonl":
+        for result in results:
+            output.write(json.dumps(result.as_dict()) + "\n")
+    else:
+        output.write(json.dumps({"checks": [result.as_dict() for result in results]}) + "\n")
+
+
+# base class of the checks that validate the records one at a time, in a single pass over the data
+class RecordCheck:
+    # name of the check in its result and names of the shared aggregates used by the check
+    name = None
+    uses = ()
+
+    # whether the check goes on after the errors of the records, instead of stopping at the first one
+    collect_all = False
+
+    # whether the check only compares the records of a bus line with each other, so the records of each bus line can be
+    # checked apart from the others
+    line_local = True
+
+    def __init__(self):
+        # messages printed while the records are checked, errors raised by the records and rows of the records with
+        # a wrong field, each one with the row of its record
+        self.messages = []
+        self.errors = []
+        self.offending_rows = []
+
+        # row of the record at which the check stopped, after its first error or when it needed no more records
+        self.stop_row = None
+
+    # updates the check with one record, returns True when the check needs no more records
+    def update(self, bus_line, shared):
+        pass
+
+    # updates the check with a chunk of records, returns True when the check needs no more records
+    def update_chunk(self, chunk, shared):
+        for row, bus_line in enumerate(chunk.records, chunk.start):
+            shared.row = row
+            try:
+                if self.update(bus_line, shared):
+                    return True
+            except Exception as error:
+                if not self.collect_all:
+                    raise
+                self.errors.append((row, error))
+
+    # keeps what the report needs from the aggregates that aren't merged, once every record is checked
+    def finish(self, shared):
+        pass
+
+    # replaces the rows of the check with the rows returned by row_of
+    def map_rows(self, row_of):
+        self.messages = [(row_of(row), message) for row, message in self.messages]
+        self.errors = [(row_of(row), error) for row, error in self.errors]
+        self.offending_rows = list(map(row_of, self.offending_rows))
+        if self.stop_row is not None:
+            self.stop_row = row_of(self.stop_row)
+
+    # adds the state of the same check run over the records of other bus lines, the check ends as it would have
+    # at the first row where one of them stopped
+    def merge(self, other):
+        if other.stop_row is not None and (self.stop_row is None or other.stop_row < self.stop_row):
+            self.stop_row = other.stop_row
+            self.messages = merge_by_row([], self.messages, self.stop_row)
+            self.errors = merge_by_row([], self.errors, self.stop_row)
+            self.offending_rows = merge_by_row([], self.offending_rows, self.stop_row, lambda row: row)
+        self.messages = merge_by_row(self.messages, other.messages, self.stop_row)
+        self.errors = merge_by_row(self.errors, other.errors, self.stop_row)
+        self.offending_rows = merge_by_row(self.offending_rows, other.offending_rows, self.stop_row, lambda row: row)
+
+    # returns what a merge reads from the check as json values, load_state restores it into a new check
+    def state(self):
+        return {"messages": self.messages, "errors": [(row, error_state(error)) for row, error in self.errors],
+                "offending_rows": self.offending_rows, "stop_row": self.stop_row}
+
+    def load_state(self, state):
+        self.messages = [(row_of_state(row), message) for row, message in state["messages"]]
+        self.errors = [(row_of_state(row), error_of_state(error)) for row, error in state["errors"]]
+        self.offending_rows = list(map(row_of_state, state["offending_rows"]))
+        self.stop_row = row_of_state(state["stop_row"])
+
+    # returns the counts of the result of the check
+    def counts(self, shared):
+        return {}
+
+    # returns the messages of the result of the check
+    def result_messages(self, shared):
+        return [message for row, message in self.messages]
+
+    # returns the rows of the records with a wrong field or a message
+    def record_rows(self):
+        return sorted(set(self.offending_rows).union(row for row, message in self.messages))
+
+    # returns the rows of the offending records of the result of the check
+    def result_rows(self, shared):
+        return self.record_rows()
+
+    # returns the result of the check, once every record is checked, a check stopped by an error has no counts and
+    # only the messages and rows of the records before the error
+    def result(self, shared):
+        if self.errors and not self.collect_all:
+            return CheckResult(self.name, False, {}, self.record_rows(), [message for row, message in self.messages],
+                               self.errors)
+
+        messages, rows = self.result_messages(shared), self.result_rows(shared)
+        return CheckResult(self.name, not rows and not messages and not self.errors, self.counts(shared), rows,
+                           messages, self.errors)
+
+    # prints the report lines that come before the records are checked
+    def report_start(self):
+        pass
+
+    # prints the report lines that come after the records are checked
+    def report_end(self, shared):
+        pass
+
+
+# check of the field types and required fields (validate_fields)
+class FieldTypeCheck(RecordCheck):
+    name = "fields"
+
+    def __init__(self):
+        super().__init__()
+        self.bus_id_err, self.stop_id_err, self.stop_name_err = 0, 0, 0
+        self.next_stop_err, self.stop_type_err, self.a_time_err = 0, 0, 0
+
+    def update(self, bus_line, shared):
+        errors = sum(self.counts(shared).values())
+
+        # checks data types and required fields
+        if type(bus_line["bus_id"]) != int:
+            self.bus_id_err += 1
+        if type(bus_line["stop_id"]) != int:
+            self.stop_id_err += 1
+        if (type(bus_line["stop_name"]) != str) or (bus_line["stop_name"].strip() == ''):
+            self.stop_name_err += 1
+        if type(bus_line["next_stop"]) != int:
+            self.next_stop_err += 1
+        if (type(bus_line["stop_type"]) != str) or (bus_line["stop_type"] not in STOP_TYPES):
+            self.stop_type_err += 1
+
+        if not (type(bus_line["a_time"]) == str and time_facts(bus_line["a_time"])[0]):
+            self.a_time_err += 1
+
+        if sum(self.counts(shared).values()) > errors:
+            self.offending_rows.append(shared.row)
+
+    def update_chunk(self, chunk, shared):
+        errors = sum(self.counts(shared).values())
+
+        # the bus_id of a chunk are integers and its text fields are strings, each distinct value is checked once
+        stop_id_rows, next_stop_rows = chunk.stop_id.not_int_rows(), chunk.next_stop.not_int_rows()
+        blank_names = [stop_name.strip() == '' for stop_name in chunk.stop_name.categories]
+        wrong_types = [stop_type not in STOP_TYPES for stop_type in chunk.stop_type.categories]
+        wrong_times = [not time_facts(a_time)[0] for a_time in chunk.a_time.categories]
+        self.stop_id_err += len(stop_id_rows)
+        self.stop_name_err += chunk.stop_name.count(blank_names)
+        self.next_stop_err += len(next_stop_rows)
+        self.stop_type_err += chunk.stop_type.count(wrong_types)
+        self.a_time_err += chunk.a_time.count(wrong_times)
+
+        # the rows of the records with a wrong field are only looked for in the chunks that have some
+        if sum(self.counts(shared).values()) > errors:
+            rows = set(stop_id_rows).union(next_stop_rows, chunk.stop_name.flagged_rows(blank_names),
+                                           chunk.stop_type.flagged_rows(wrong_types),
+                                           chunk.a_time.flagged_rows(wrong_times))
+            self.offending_rows.extend(chunk.start + row for row in sorted(rows))
+
+    def merge(self, other):
+        super().merge(other)
+        self.bus_id_err, self.stop_id_err, self.stop_name_err = \
+            self.bus_id_err + other.bus_id_err, self.stop_id_err + other.stop_id_err, \
+            self.stop_name_err + other.stop_name_err
+        self.next_stop_err, self.stop_type_err, self.a_time_err = \
+            self.next_stop_err + other.next_stop_err, self.stop_type_err + other.stop_type_err, \
+            self.a_time_err + other.a_time_err
+
+    def state(self):
+        return {**super().state(), "counts": self.counts(None)}
+
+    def load_state(self, state):
+        super().load_state(state)
+        counts = state["counts"]
+        self.bus_id_err, self.stop_id_err, self.stop_name_err = counts["bus_id"], counts["stop_id"], counts["stop_name"]
+        self.next_stop_err, self.stop_type_err, self.a_time_err = \
+            counts["next_stop"], counts["stop_type"], counts["a_time"]
+
+    def counts(self, shared):
+        return {"bus_id": self.bus_id_err, "stop_id": self.stop_id_err, "stop_name": self.stop_name_err,
+                "next_stop": self.next_stop_err, "stop_type": self.stop_type_err, "a_time": self.a_time_err}
+
+    def report_end(self, shared):
+        counts = self.counts(shared)
+        print(f"Type and required field validation: {sum(counts.values())} errors")
+        for field, count in counts.items():
+            print(f"{field}: {count}")
+
+
+# check of the stop name, stop type and time formats (validate_fields_regex)
+class FieldFormatCheck(RecordCheck):
+    name = "formats"
+
+    def __init__(self):
+        super().__init__()
+        self.stop_name_err, self.stop_type_err, self.a_time_err = 0, 0, 0
+
+        # result of the stop name format of each distinct stop name
+        self.stop_name_match = {}
+
+    # returns whether a stop name has the correct format, the pattern raises the error of a value that isn't a string
+    def stop_name_matches(self, stop_name):
+        matched = self.stop_name_match.get(stop_name) if type(stop_name) == str else None
+        if matched is None:
+            matched = STOP_NAME_PATTERN.match(stop_name) is not None
+            self.stop_name_match[stop_name] = matched
+        return matched
+
+    def update(self, bus_line, shared):
+        errors = sum(self.counts(shared).values())
+        if not self.stop_name_matches(bus_line["stop_name"]):
+            self.stop_name_err += 1
+        if bus_line["stop_type"] not in STOP_TYPES:
+            self.stop_type_err += 1
+
+        # the pattern raises the error of a time that isn't a string
+        a_time = bus_line["a_time"]
+        if not (time_facts(a_time)[1] if type(a_time) == str else TIME_FORMAT_PATTERN.match(a_time)):
+            self.a_time_err += 1
+
+        if sum(self.counts(shared).values()) > errors:
+            self.offending_rows.append(shared.row)
+
+    def update_chunk(self, chunk, shared):
+        errors = sum(self.counts(shared).values())
+
+        # each distinct value is checked once
+        wrong_names = [not self.stop_name_matches(stop_name) for stop_name in chunk.stop_name.categories]
+        wrong_types = [stop_type not in STOP_TYPES for stop_type in chunk.stop_type.categories]
+        wrong_times = [not time_facts(a_time)[1] for a_time in chunk.a_time.categories]
+        self.stop_name_err += chunk.stop_name.count(wrong_names)
+        self.stop_type_err += chunk.stop_type.count(wrong_types)
+        self.a_time_err += chunk.a_time.count(wrong_times)
+
+        # the rows of the records with a wrong format are only looked for in the chunks that have some
+        if sum(self.counts(shared).values()) > errors:
+            rows = set(chunk.stop_name.flagged_rows(wrong_names)).union(chunk.stop_type.flagged_rows(wrong_types),
+                                                                        chunk.a_time.flagged_rows(wrong_times))
+            self.offending_rows.extend(chunk.start + row for row in sorted(rows))
+
+    def merge(self, other):
+        super().merge(other)
+        self.stop_name_err += other.stop_name_err
+        self.stop_type_err += other.stop_type_err
+        self.a_time_err += other.a_time_err
+
+    def state(self):
+        return {**super().state(), "counts": self.counts(None)}
+
+    def load_state(self, state):
+        super().load_state(state)
+        counts = state["counts"]
+        self.stop_name_err, self.stop_type_err, self.a_time_err = \
+            counts["stop_name"], counts["stop_type"], counts["a_time"]
+
+    def counts(self, shared):
+        return {"stop_name": self.stop_name_err, "stop_type": self.stop_type_err, "a_time": self.a_time_err}
+
+    def report_end(self, shared):
+        counts = self.counts(shared)
+        print(f"Format validation: {sum(counts.values())} errors")
+        for field, count in counts.items():
+            print(f"{field}: {count}")
+
+
+# check of the bus lines and their number of stops (get_bus_line_info)
+class LineInfoCheck(RecordCheck):
+    name = "lines"
+    uses = ("lines",)
+
+    # the shared aggregates are all the check needs
+    def update_chunk(self, chunk, shared):
+        pass
+
+    # the counts are the stops of each bus line
+    def counts(self, shared):
+        return dict(shared.line_stops)
+
+    def report_end(self, shared):
+        print("Line names and number of stops:")
+        for bus_line, stops in shared.line_stops.items():
+            print(f"bus_id: {bus_line}, stops: {stops}")
+
+
+# check of the start and finish stops of each bus line (validate_start_stop)
+class StartStopCheck(RecordCheck):
+    name = "start_stops"
+    uses = ("stop_names",)
+
+    def __init__(self):
+        super().__init__()
+        self.flag_ok = True
+
+        # bus lines, as strings, and the ones whose starting point and final stop were found
+        self.bus_keys, self.start_keys, self.final_keys = set(), set(), set()
+
+    def update(self, bus_line, shared):
+        actual_bus_id = str(bus_line["bus_id"])
+        self.bus_keys.add(actual_bus_id)
+
+        # the validation stops at the first repeated starting point or final stop, unless every error is collected
+        if bus_line["stop_type"] == "S":
+            if actual_bus_id in self.start_keys:
+                self.messages.append((shared.row, f'There is more than one starting point for the line: '
+                                                  f'{actual_bus_id}.'))
+                self.flag_ok = False
+                return not self.collect_all
+            self.start_keys.add(actual_bus_id)
+        elif bus_line["stop_type"] == "F":
+            if actual_bus_id in self.final_keys:
+                self.messages.append((shared.row, f'There is more than one final stop for the line: {actual_bus_id}.'))
+                self.flag_ok = False
+                return not self.collect_all
+            self.final_keys.add(actual_bus_id)
+
+    def update_chunk(self, chunk, shared):
+        bus_ids, stop_type = chunk.bus_id.values, chunk.stop_type
+        starts = [str(bus_ids[row]) for row in stop_type.rows(stop_type.code_of("S"))]
+        finals = [str(bus_ids[row]) for row in stop_type.rows(stop_type.code_of("F"))]
+        start_keys, final_keys = set(starts), set(finals)
+
+        # a repeated starting point or final stop is found record by record, to report the first one
+        if len(start_keys) < len(starts) or len(final_keys) < len(finals) or \
+                not start_keys.isdisjoint(self.start_keys) or not final_keys.isdisjoint(self.final_keys):
+            return super().update_chunk(chunk, shared)
+
+        self.bus_keys.update(map(str, chunk.bus_id_count))
+        self.start_keys |= start_keys
+        self.final_keys |= final_keys
+
+    # the bus lines of the other records are different, the merge keeps the repeated stops up to the first one where
+    # a check stopped
+    def merge(self, other):
+        super().merge(other)
+        self.flag_ok = not self.messages
+        self.bus_keys |= other.bus_keys
+        self.start_keys |= other.start_keys
+        self.final_keys |= other.final_keys
+
+    def state(self):
+        return {**super().state(), "bus_keys": sorted(self.bus_keys), "start_keys": sorted(self.start_keys),
+                "final_keys": sorted(self.final_keys)}
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.bus_keys, self.start_keys, self.final_keys = \
+            set(state["bus_keys"]), set(state["start_keys"]), set(state["final_keys"])
+
+    # returns the messages of the bus lines without a starting point or a final stop, which are only looked for
+    # after a repeated one when every error is collected
+    def missing_messages(self):
+        if not self.flag_ok and not self.collect_all:
+            return []
+        return [f'There is no start or end stop for the line: {key}.' for key in sorted(self.bus_keys)
+                if key not in self.start_keys or key not in self.final_keys]
+
+    def counts(self, shared):
+        return {"start_stops": len(shared.starting_point_set), "transfer_stops": len(shared.transfer_stop_set),
+                "finish_stops": len(shared.final_stop_set)}
+
+    def result_messages(self, shared):
+        return super().result_messages(shared) + self.missing_messages()
+
+    def report_end(self, shared):
+        # check if every bus line has a starting point and a final stop
+        missing_messages = self.missing_messages()
+        for message in missing_messages:
+            print(message)
+
+        if self.flag_ok and not missing_messages:
+            print(f"Start stops: {len(shared.starting_point_set)} {sorted(shared.starting_point_set)}")
+            print(f"Transfer stops: {len(shared.transfer_stop_set)} {sorted(shared.transfer_stop_set)}")
+            print(f"Finish stops: {len(shared.final_stop_set)} {sorted(shared.final_stop_set)}")
+
+
+# check of the arrival times of each bus line (validate_arrival_time): each time is compared with the previous one in
+# the order of the records, with by_line the records of each bus line are compared on their own, whatever the records of
+# the other bus lines between them
+class ArrivalTimeCheck(RecordCheck):
+    name = "arrival_times"
+
+    # previous bus_id and a_time before the first starting point, and the flag that indicates that the bus_id shall not
+    # be tested anymore
+    initial_state = (-1, None, False)
+
+    def __init__(self, by_line=False):
+        super().__init__()
+        self.by_line = self.line_local = by_line
+        self.times_ok = True
+
+        # previous bus_id, previous a_time and skip flag of the records, under the key None, or of each bus line with
+        # by_line: the next times of a bus line are still compared with the last right one when every error is
+        # collected
+        self.states = {}
+
+    def update(self, bus_line, shared):
+        bus_id = bus_line["bus_id"]
+        key = bus_id if self.by_line else None
+        previous_bus_id, previous_a_time, flag_skip_bus_id = self.states.get(key, self.initial_state)
+        if flag_skip_bus_id and (previous_bus_id == bus_id):
+            return
+
+        # the times are compared in minutes since midnight, an invalid time, or a time before the first starting point,
+        # can't be compared
+        is_start = bus_line["stop_type"] == "S"
+        a_time = bus_line["a_time"]
+        current_a_time = arrival_minutes(a_time)
+        if current_a_time is None or (not is_start and previous_a_time is None):
+            raise arrival_time_error(bus_id, bus_line["stop_name"], a_time)
+
+        # the first stop of the bus line has no previous a_time to compare with
+        if is_start:
+            self.states[key] = (bus_id, current_a_time, False)
+        elif current_a_time <= previous_a_time:
+            self.messages.append((shared.row, f"bus_id line {str(bus_id)}: wrong time on station "
+                                              f"{bus_line['stop_name']}"))
+            self.times_ok = False
+            self.states[key] = (previous_bus_id, previous_a_time, not self.collect_all)
+        else:
+            self.states[key] = (bus_id, current_a_time, flag_skip_bus_id)
+
+    def update_chunk(self, chunk, shared):
+        # an invalid time raises its error record by record
+        minutes = chunk.a_time.minutes
+        if None in minutes:
+            return super().update_chunk(chunk, shared)
+
+        # same validation as update, over the codes of the chunk, whose times are compared in minutes
+        states, by_line = self.states, self.by_line
+        start_code = chunk.stop_type.code_of("S")
+        for index, (bus_id, stop_type, a_time) in enumerate(zip(chunk.bus_id.values, chunk.stop_type.codes(),
+                                                                chunk.a_time.codes())):
+            key = bus_id if by_line else None
+            previous_bus_id, previous_a_time, flag_skip_bus_id = states.get(key, self.initial_state)
+            if flag_skip_bus_id and (previous_bus_id == bus_id):
+                continue
+
+            current_a_time = minutes[a_time]
+            if stop_type == start_code:
+                states[key] = (bus_id, current_a_time, False)
+            elif previous_a_time is None:
+                row = chunk.start + index
+                error = arrival_time_error(bus_id, chunk.stop_name[index], chunk.a_time.categories[a_time])
+                if not self.collect_all:
+                    shared.row = row
+                    raise error
+                self.errors.append((row, error))
+            elif current_a_time <= previous_a_time:
+                self.messages.append((chunk.start + index, f"bus_id line {str(bus_id)}: wrong time on station "
+                                                           f"{chunk.stop_name[index]}"))
+                self.times_ok = False
+                states[key] = (previous_bus_id, previous_a_time, not self.collect_all)
+            else:
+                states[key] = (bus_id, current_a_time, flag_skip_bus_id)
+
+    def merge(self, other):
+        super().merge(other)
+        self.times_ok = not self.messages
+
+    def counts(self, shared):
+        return {"wrong_times": len(self.messages)}
+
+    def report_start(self):
+        print("Arrival time test:")
+
+    def report_end(self, shared):
+        if self.times_ok:
+            print("OK")
+
+
+# check of the routes rebuilt from the next_stop links: cycles, links to missing stops and unreachable stops
+class RouteCheck(RecordCheck):
+    name = "routes"
+    uses = ("routes",)
+
+    def __init__(self):
+        super().__init__()
+
+        # problems of each bus line, once its route is rebuilt
+        self.line_problems = None
+
+    # the shared route index is all the check needs
+    def update_chunk(self, chunk, shared):
+        pass
+
+    def finish(self, shared):
+        if self.line_problems is None:
+            self.line_problems = {route.bus_id: route.problems for route in shared.route_index.routes()}
+
+    def merge(self, other):
+        super().merge(other)
+        self.line_problems = self.line_problems or {}
+        self.line_problems.update(other.line_problems or {})
+
+    # the problems are kept as (bus_id, problems) pairs, as the bus_id can be any hashable json value
+    def state(self):
+        line_problems = None if self.line_problems is None else list(self.line_problems.items())
+        return {**super().state(), "line_problems": line_problems}
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.line_problems = None if state["line_problems"] is None else dict(state["line_problems"])
+
+    # returns the problems of the bus lines, in the order of their bus_id
+    def problems(self, shared):
+        self.finish(shared)
+        return [problem for bus_id in sorted(self.line_problems, key=id_sort_key)
+                for problem in self.line_problems[bus_id]]
+
+    def counts(self, shared):
+        return {"problems": len(self.problems(shared))}
+
+    def result_messages(self, shared):
+        return self.problems(shared)
+
+    def report_start(self):
+        print("Route test:")
+
+    def report_end(self, shared):
+        problems = self.problems(shared)
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print("OK")
+
+
+# check of the arrival times along the routes rebuilt from the next_stop links, whatever the order of the records
+class RouteArrivalTimeCheck(RecordCheck):
+    name = "arrival_times"
+    uses = ("routes",)
+
+    def __init__(self):
+        super().__init__()
+
+        # stops with a wrong time of each bus line whose times aren't right
+        self.wrong_stops = None
+
+    # the shared route index is all the check needs
+    def update_chunk(self, chunk, shared):
+        pass
+
+    def finish(self, shared):
+        if self.wrong_stops is not None:
+            return
+
+        self.wrong_stops = {}
+        for route in shared.route_index.routes():
+            # the validation of a bus line stops at its first invalid time or time not after the previous one, unless
+            # every error is collected: the next times are then compared with the last right one
+            previous_a_time = None
+            for stop_id, next_stop, a_time, stop_name, stop_type in route.stops:
+                current_a_time = arrival_minutes(a_time)
+                if current_a_time is None or (previous_a_time is not None and current_a_time <= previous_a_time):
+                    self.wrong_stops.setdefault(route.bus_id, []).append(stop_name)
+                    if not self.collect_all:
+                        break
+                else:
+                    previous_a_time = current_a_time
+
+    def merge(self, other):
+        super().merge(other)
+        self.wrong_stops = self.wrong_stops or {}
+        self.wrong_stops.update(other.wrong_stops or {})
+
+    # the stops are kept as (bus_id, stop names) pairs, as the bus_id can be any hashable json value
+    def state(self):
+        wrong_stops = None if self.wrong_stops is None else list(self.wrong_stops.items())
+        return {**super().state(), "wrong_stops": wrong_stops}
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.wrong_stops = None if state["wrong_stops"] is None else dict(state["wrong_stops"])
+
+    # returns the messages of the stops with a wrong time, in the order of their bus_id
+    def wrong_time_messages(self, shared):
+        self.finish(shared)
+        return [f"bus_id line {bus_id}: wrong time on station {stop_name}"
+                for bus_id in sorted(self.wrong_stops, key=id_sort_key) for stop_name in self.wrong_stops[bus_id]]
+
+    def counts(self, shared):
+        return {"wrong_times": len(self.wrong_time_messages(shared))}
+
+    def result_messages(self, shared):
+        return self.wrong_time_messages(shared)
+
+    def report_start(self):
+        print("Arrival time test:")
+
+    def report_end(self, shared):
+        messages = self.wrong_time_messages(shared)
+        for message in messages:
+            print(message)
+
+        if not messages:
+            print("OK")
+
+
+# check of the stops wrongly marked as on-demand (on_demand_stop_test)
+class OnDemandCheck(RecordCheck):
+    name = "on_demand"
+    uses = ("stop_names",)
+
+    def __init__(self):
+        super().__init__()
+
+        # rows of the on-demand stops of each stop name
+        self.ondemand_rows = {}
+
+    def update(self, bus_line, shared):
+        if bus_line["stop_type"] == "O":
+            self.ondemand_rows.setdefault(bus_line["stop_name"], []).append(shared.row)
+
+    # the shared aggregates have the rest of what the check needs
+    def update_chunk(self, chunk, shared):
+        for index in chunk.stop_type.rows(chunk.stop_type.code_of("O")):
+            self.ondemand_rows.setdefault(chunk.stop_name[index], []).append(chunk.start + index)
+
+    def map_rows(self, row_of):
+        super().map_rows(row_of)
+        self.ondemand_rows = {stop_name: list(map(row_of, rows)) for stop_name, rows in self.ondemand_rows.items()}
+
+    def merge(self, other):
+        super().merge(other)
+        for stop_name, rows in other.ondemand_rows.items():
+            self.ondemand_rows.setdefault(stop_name, []).extend(rows)
+
+    # the rows are kept as (stop_name, rows) pairs, as the stop name can be any hashable json value
+    def state(self):
+        return {**super().state(), "ondemand_rows": list(self.ondemand_rows.items())}
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.ondemand_rows = {stop_name: list(map(row_of_state, rows)) for stop_name, rows in state["ondemand_rows"]}
+
+    # returns the on-demand stops that are also starting points, final stops or transfer stops
+    def ondemand_special(self, shared):
+        special_stops = shared.starting_point_set.union(shared.final_stop_set, shared.transfer_stop_set)
+        return sorted(shared.ondemand_stop_set.intersection(special_stops))
+
+    def counts(self, shared):
+        return {"wrong_stop_types": len(self.ondemand_special(shared))}
+
+    def result_messages(self, shared):
+        ondemand_special = self.ondemand_special(shared)
+        return [f"Wrong stop type: {ondemand_special}"] if ondemand_special else []
+
+    def result_rows(self, shared):
+        return sorted(row for stop_name in self.ondemand_special(shared)
+                      for row in self.ondemand_rows.get(stop_name, ()))
+
+    def report_start(self):
+        print("On demand stops test:")
+
+    def report_end(self, shared):
+        ondemand_special = self.ondemand_special(shared)
+
+        # as in the original report, "OK" is followed by the None its print returns
+        print(f"Wrong stop type: {ondemand_special}" if len(ondemand_special) > 0 else print("OK"))
+
+
+# single pass over the records that feeds the shared aggregates and every check, one chunk of records at a time
+class CheckPipeline:
+    def __init__(self, checks, chunk_size=CHUNK_SIZE, shared=None):
+        self.checks = list(checks)
+        self.chunk_size = chunk_size
+        self.shared = StopAggregates() if shared is None else shared
+
+        # checks that still need records, names and updates of the aggregates used by the checks, which go on after
+        # the checks stop so their results don't depend on where the records are split
+        self.active = self.checks
+        self.used = {name for check in self.active for name in check.uses}
+        self.updates = self.shared.updates(self.used)
+
+        # number of records fed
+        self.rows = 0
+
+    # stops feeding a check, after its first error or when it needs no more records
+    def stop(self, check):
+        check.stop_row = self.shared.row
+        self.active = [other for other in self.active if other is not check]
+
+    # keeps the error of a check with the row of the record being checked, the check stops at its first error, which
+    # is raised when its report is reached, unless it collects every error
+    def fail(self, check, error):
+        check.errors.append((self.shared.row, error))
+        if not check.collect_all:
+            self.stop(check)
+
+    # feeds a chunk, or a record, to a check
+    def feed(self, check, update, data):
+        try:
+            if update(data, self.shared):
+                self.stop(check)
+        except Exception as error:
+            self.fail(check, error)
+
+    # feeds the records to the aggregates and to the checks
+    def update(self, records):
+        records = iter(records)
+        while True:
+            chunk_records = list(islice(records, self.chunk_size))
+            if not chunk_records:
+                break
+
+            # a chunk with unexpected fields is checked record by record, so the errors happen at the same record
+            chunk = RecordChunk.of(chunk_records, self.rows)
+            if chunk is not None:
+                self.shared.update_chunk(chunk, self.used)
+                for check in self.active:
+                    self.shared.row = chunk.start
+                    self.feed(check, check.update_chunk, chunk)
+                self.rows += len(chunk)
+            else:
+                for bus_line in chunk_records:
+                    self.update_record(bus_line)
+
+    # feeds one record to the aggregates and to the checks
+    def update_record(self, bus_line):
+        self.shared.row = self.rows
+        self.rows += 1
+        failed = set()
+        for name, update in self.updates:
+            try:
+                update(bus_line)
+            except Exception as error:
+                # a failed aggregate fails the checks that use it, at the same record
+                for check in self.active:
+                    if name in check.uses and check not in failed:
+                        failed.add(check)
+                        self.fail(check, error)
+
+        for check in self.active:
+            if check not in failed:
+                self.feed(check, check.update, bus_line)
+
+    # lets the checks keep what their reports need, once every record is fed
+    def finish(self):
+        self.shared.row = self.rows
+        for check in self.checks:
+            if not check.errors or check.collect_all:
+                try:
+                    check.finish(self.shared)
+                except Exception as error:
+                    self.fail(check, error)
+
+    # returns the results of the checks in order
+    def results(self):
+        self.finish()
+        return [check.result(self.shared) for check in self.checks]
+
+    # prints the reports of the checks in order, as text or as the json, or json lines, of their results
+    def report(self, output_format="text"):
+        if output_format != "text":
+            write_results(self.results(), output_format)
+            return
+
+        self.finish()
+        for check in self.checks:
+            check.report_start()
+            for row, message in check.messages:
+                print(message)
+            for row, error in check.errors:
+                if not check.collect_all:
+                    raise error
+                print(f"record {row}: {type(error).__name__}: {error}")
+            check.report_end(self.shared)
+
+
+# function that feeds every record to every check in a single pass, prints their reports in order and returns their
+# results
+def run_checks(records, checks, output_format="text"):
+    pipeline = CheckPipeline(checks)
+    pipeline.update(records)
+    pipeline.report(output_format)
+    return pipeline.results()
+
+
+# function that feeds every record to every check in a single pass and returns their results, the errors of the
+# records are in the results instead of being raised
+def check_records(records, checks):
+    pipeline = CheckPipeline(checks)
+    pipeline.update(records)
+    return pipeline.results()
+
+
+# function that returns the six checks of the stop data, in the order of their reports, with routes the arrival times
+# are checked along the routes rebuilt from the next_stop links, after the test of the routes, with by_line they are
+# checked along the records of each bus line on its own, and with collect_all the checks go on after the errors of the
+# records
+def default_checks(routes=False, by_line=False, collect_all=False):
+    if routes:
+        arrival_checks = [RouteCheck(), RouteArrivalTimeCheck()]
+    else:
+        arrival_checks = [ArrivalTimeCheck(by_line)]
+    checks = [FieldTypeCheck(), FieldFormatCheck(), LineInfoCheck(), StartStopCheck()] + arrival_checks + \
+        [OnDemandCheck()]
+    for check in checks:
+        check.collect_all = collect_all
+    return checks
+
+
+# function that validates field types and required fields, returns the result of the check
+def validate_fields(data):
+    return run_checks(data, [FieldTypeCheck()])[0]
+
+
+# function that validates stop name, stop type and time formats, returns the result of the check
+def validate_fields_regex(data):
+    return run_checks(data, [FieldFormatCheck()])[0]
+
+
+# function that retrieve bus lines name and number of stops, returns the result of the check
+def get_bus_line_info(data):
+    return run_checks(data, [LineInfoCheck()])[0]
+
+
+# function that validate if every bus line has one start stop and one finish stop, returns the result of the check
+def validate_start_stop(data):
+    return run_checks(data, [StartStopCheck()])[0]
+
+
+# function tha validate the arrival times, returns the result of the check
+def validate_arrival_time(data):
+    return run_checks(data, [ArrivalTimeCheck()])[0]
+
+
+# function that gets all the special stops: start, transfer, finish or on-demand
+def get_special_stops(data):
+    shared = StopAggregates()
+    for bus_line in data:
+        shared.update_stop_names(bus_line)
+    return shared.starting_point_set, shared.final_stop_set, shared.transfer_stop_set, shared.ondemand_stop_set
+
+
+# function that tests the stops wrongly marked as on-demand, returns the result of the check
+def on_demand_stop_test(data):
+    return run_checks(data, [OnDemandCheck()])[0]
+
+
+# partitions of the records, inherited by the worker processes when they are forked
+forked_partitions = None
+
+
+# function that splits the records by bus line into at most jobs partitions, the bus lines are dealt in the order of
+# their first stop, returns the bus lines in that order and the (rows, records) of each partition, the rows of a
+# partition end with the number of records, which stands for the end of the feed
+def partition_records(records, jobs):
+    line_partitions = {}
+    partitions = []
+    for row, bus_line in enumerate(records):
+        index = line_partitions.get(bus_line["bus_id"])
+        if index is None:
+            index = line_partitions[bus_line["bus_id"]] = len(line_partitions) % jobs
+            if index == len(partitions):
+                partitions.append(([], []))
+        partitions[index][0].append(row)
+        partitions[index][1].append(bus_line)
+
+    for rows, partition in partitions:
+        rows.append(len(records))
+    return list(line_partitions), partitions
+
+
+# function that checks the records of a partition in a worker process with the checks that only compare the records
+# of a bus line with each other, returns the checks, with their rows in the whole feed, and the aggregates to merge
+def check_partition(rows, records, routes, by_line=False, collect_all=False):
+    pipeline = CheckPipeline(check for check in default_checks(routes, by_line, collect_all) if check.line_local)
+    pipeline.update(records)
+    pipeline.finish()
+
+    for check in pipeline.checks:
+        check.map_rows(rows.__getitem__)
+
+    # the checks kept what they need from the route index, which isn't sent back
+    pipeline.shared.route_index = RouteIndex()
+    return pipeline.checks, pipeline.shared
+
+
+# function that checks a partition inherited by a forked worker process
+def check_forked_partition(index, routes, by_line, collect_all):
+    return check_partition(*forked_partitions[index], routes, by_line, collect_all)
+
+
+# function that checks the records of each bus line in a pool of processes and prints the reports of the merged
+# checks, which are the reports of run_checks whatever the number of jobs: the checks that compare the records of
+# different bus lines, the arrival times along the feed unless by_line, check the whole feed in this process while the
+# workers run, the bus lines of the records must be hashable or the records are checked in a single process
+def run_checks_parallel(records, jobs, routes=False, by_line=False, collect_all=False, output_format="text"):
+    global forked_partitions
+
+    records = list(records)
+    try:
+        line_order, partitions = partition_records(records, jobs)
+    except (KeyError, TypeError):
+        partitions = []
+    if len(partitions) <= 1:
+        run_checks(records, default_checks(routes, by_line, collect_all), output_format)
+        return
+
+    # forked workers inherit the partitions, the other ones receive their partition
+    fork = "fork" in multiprocessing.get_all_start_methods()
+    forked_partitions = partitions if fork else None
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=len(partitions),
+                                 mp_context=multiprocessing.get_context("fork") if fork else None) as executor:
+            if fork:
+                futures = [executor.submit(check_forked_partition, index, routes, by_line, collect_all)
+                           for index in range(len(partitions))]
+            else:
+                futures = [executor.submit(check_partition, rows, partition, routes, by_line, collect_all)
+                           for rows, partition in partitions]
+
+            feed_checks = default_checks(routes, by_line, collect_all)
+            feed_pipeline = CheckPipeline(check for check in feed_checks if not check.line_local)
+            if feed_pipeline.checks:
+                feed_pipeline.update(records)
+                feed_pipeline.finish()
+            results = [future.result() for future in futures]
+    finally:
+        forked_partitions = None
+        gc.unfreeze()
+
+    # the cross-line parts, the bus lines and the stop names, are merged here
+    checks, shared = results[0]
+    for other_checks, other_shared in results[1:]:
+        for check, other in zip(checks, other_checks):
+            check.merge(other)
+        shared.merge(other_shared)
+    shared.line_stops = Counter({bus_id: shared.line_stops[bus_id] for bus_id in line_order})
+
+    # the checks of the whole feed take their place among the merged ones
+    checks = iter(checks)
+    checks = [next(checks) if check.line_local else check for check in feed_checks]
+    CheckPipeline(checks, shared=shared).report(output_format)
+
+
+# function that returns the occurrences of the stop names of records, keyed by the json of the stop name and the stop
+# type, S, F, O or "" for the other types, the stop names that can't be keys are left out as the checks fail on them
+def stop_name_counts(records):
+    counts = Counter()
+    for bus_line in records:
+        try:
+            hash(bus_line["stop_name"])
+            stop_type = bus_line["stop_type"] if bus_line["stop_type"] in ("S", "F", "O") else ""
+        except (KeyError, TypeError):
+            continue
+        counts[json.dumps(bus_line["stop_name"]), stop_type] += 1
+    return counts
+
+
+# version of the state of the incremental validation, kept as the user_version of its database, a database of another
+# version can't be read
+STATE_VERSION = 2
+
+
+# incremental validation of a feed, whose state is kept in a SQLite database: the records and the checks of each bus
+# line, in the order of their first stop, and the occurrences of each stop name by stop type, so a delta only
+# re-checks the bus lines it touches and the counts of their stop names. The checks of a bus line are kept as the json
+# of their states, keyed by their name, and rebuilt from them. The arrival times are checked along the routes rebuilt
+# from the next_stop links, so the order of the records of a bus line, which the deltas change, doesn't matter
+class IncrementalValidator:
+    def __init__(self, file_name):
+        self.connection = sqlite3.connect(file_name, timeout=60, isolation_level=None)
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        (tables,) = self.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()
+        if tables and version != STATE_VERSION:
+            self.connection.close()
+            raise ValueError(f"{file_name} holds the state of another version of the validation, load the feed into a "
+                             f"new database.")
+
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(f"PRAGMA user_version = {STATE_VERSION}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS lines (position INTEGER PRIMARY KEY, bus_id TEXT NOT NULL UNIQUE, "
+            "stops INTEGER NOT NULL, records TEXT NOT NULL, checks TEXT NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS stop_names (stop_name TEXT PRIMARY KEY, stops INTEGER NOT NULL, "
+            "starts INTEGER NOT NULL, finals INTEGER NOT NULL, ondemands INTEGER NOT NULL)"
+        )
+
+    # returns the json of the states of the checks of the records of the bus line at a position, the rows of their
+    # messages are the position and the index of the record in the bus line
+    @staticmethod
+    def check_line(position, records):
+        checks, shared = check_partition([(position, index) for index in range(len(records) + 1)], records, True)
+        return json.dumps({check.name: check.state() for check in checks})
+
+    # writes a bus line and its checks, a new bus line comes after the other ones and a bus line without records
+    # is removed
+    def write_line(self, bus_id, position, records):
+        if not records:
+            self.connection.execute("DELETE FROM lines WHERE bus_id = ?", (json.dumps(bus_id),))
+            return
+
+        if position is None:
+            (position,) = self.connection.execute("SELECT COALESCE(MAX(position), 0) + 1 FROM lines").fetchone()
+        self.connection.execute("INSERT OR REPLACE INTO lines VALUES (?, ?, ?, ?, ?)",
+                                (position, json.dumps(bus_id), len(records), json.dumps(records),
+                                 self.check_line(position, records)))
+
+    # adds the differences between the occurrences of the stop names of the old and new records of bus lines, the stop
+    # names left without records are removed
+    def update_stop_names(self, old_counts, new_counts):
+        changes = {}
+        for stop_name, stop_type in old_counts.keys() | new_counts.keys():
+            difference = new_counts[stop_name, stop_type] - old_counts[stop_name, stop_type]
+            if difference:
+                change = changes.setdefault(stop_name, [0, 0, 0, 0])
+                change[0] += difference
+                if stop_type:
+                    change["SFO".index(stop_type) + 1] += difference
+
+        self.connection.executemany(
+            "INSERT INTO stop_names VALUES (?, ?, ?, ?, ?) ON CONFLICT (stop_name) DO UPDATE SET "
+            "stops = stops + excluded.stops, starts = starts + excluded.starts, finals = finals + excluded.finals, "
+            "ondemands = ondemands + excluded.ondemands",
+            [(stop_name, *change) for stop_name, change in changes.items()]
+        )
+        self.connection.executemany("DELETE FROM stop_names WHERE stop_name = ? AND stops = 0",
+                                    [(stop_name,) for stop_name in changes])
+
+    # replaces the state with the records of a feed, the bus_id of the records must be hashable
+    def load(self, records):
+        lines = {}
+        for bus_line in records:
+            lines.setdefault(bus_line["bus_id"], []).append(bus_line)
+
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute("DELETE FROM lines")
+            self.connection.execute("DELETE FROM stop_names")
+            for position, (bus_id, line_records) in enumerate(lines.items(), 1):
+                self.write_line(bus_id, position, line_records)
+            self.update_stop_names(Counter(), stop_name_counts(chain.from_iterable(lines.values())))
+
+    # applies insert, update and delete deltas keyed by the bus_id and stop_id of a record and returns the bus lines
+    # they touch, which are re-checked: an insert adds its record at the end of its bus line, an update replaces the
+    # given fields of the first record with the key and a delete removes it
+    def apply(self, deltas):
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+
+            # position, old records and new records of each bus line touched
+            lines = {}
+            for delta in deltas:
+                operation = delta["op"]
+                if operation not in ("insert", "update", "delete"):
+                    raise ValueError(f"Unknown delta operation: {operation}.")
+                fields = {name: value for name, value in delta.items() if name != "op"}
+                bus_id, stop_id = fields["bus_id"], fields["stop_id"]
+
+                if bus_id not in lines:
+                    row = self.connection.execute("SELECT position, records FROM lines WHERE bus_id = ?",
+                                                  (json.dumps(bus_id),)).fetchone()
+                    old_records = json.loads(row[1]) if row else []
+                    lines[bus_id] = (row[0] if row else None, old_records, list(old_records))
+                records = lines[bus_id][2]
+
+                index = next((index for index, bus_line in enumerate(records) if bus_line.get("stop_id") == stop_id),
+                             None)
+                if operation == "insert":
+                    if index is not None:
+                        raise ValueError(f"The stop {stop_id} of the bus_id line {bus_id} already exists.")
+                    records.append(fields)
+                elif index is None:
+                    raise KeyError((bus_id, stop_id))
+                elif operation == "update":
+                    records[index] = {**records[index], **fields}
+                else:
+                    del records[index]
+
+            for bus_id, (position, old_records, records) in lines.items():
+                self.write_line(bus_id, position, records)
+                self.update_stop_names(stop_name_counts(old_records), stop_name_counts(records))
+        return list(lines)
+
+    # prints the report of the bus lines, all of them by default, as the checks of their records, one bus line after
+    # the other in the order of their first stop, would print it
+    def report(self, bus_ids=None, output_format="text"):
+        if bus_ids is None:
+            lines = self.connection.execute("SELECT position, bus_id, stops, checks FROM lines ORDER BY position")
+        else:
+            lines = sorted(line for bus_id in bus_ids
+                           for line in self.connection.execute("SELECT position, bus_id, stops, checks FROM lines "
+                                                               "WHERE bus_id = ?", (json.dumps(bus_id),)))
+
+        # the checks of the bus lines are rebuilt from their states and merged, the stop names come from their
+        # occurrences in the whole feed
+        checks, shared = default_checks(routes=True), StopAggregates()
+        for position, bus_id, stops, line_checks in lines:
+            shared.line_stops[json.loads(bus_id)] = stops
+            states = json.loads(line_checks)
+            for check, other in zip(checks, default_checks(routes=True)):
+                other.load_state(states[other.name])
+                check.merge(other)
+
+        for stop_name, stops, starts, finals, ondemands in self.connection.execute("SELECT * FROM stop_names"):
+            stop_name = json.loads(stop_name)
+            shared.stop_name_count[stop_name] = stops
+            for count, stop_names in ((stops - 1, shared.transfer_stop_set), (starts, shared.starting_point_set),
+                                      (finals, shared.final_stop_set), (ondemands, shared.ondemand_stop_set)):
+                if count > 0:
+                    stop_names.add(stop_name)
+
+        CheckPipeline(checks, shared=shared).report(output_format)
+
+    def close(self):
+        self.connection.close()
+
+
+# typed arrays of a snapshot, in the order of the file: the columns of the records, the bus lines with the rows of their
+# records in route order, the stop names and the special stops, each kind of them is a range of special_names
+SNAPSHOT_SECTIONS = [("bus_id", "q"), ("stop_id", "q"), ("next_stop", "q"), ("line_ids", "q"), ("route_offsets", "Q"),
+                     ("string_offsets", "Q"), ("special_offsets", "Q"), ("route_rows", "I"), ("stop_name", "I"),
+                     ("special_names", "I"), ("a_time", "h"), ("stop_type", "B"), ("strings", "B")]
+
+# kinds of special stops of a snapshot, in the order of their ranges
+SPECIAL_STOP_KINDS = ("start", "transfer", "finish", "on_demand")
+
+# first bytes of a snapshot and number written in the byte order of the machine, which the loader must share
+SNAPSHOT_MAGIC = b"ERSNAP01"
+SNAPSHOT_BYTE_ORDER = 0x01020304
+
+# header of a snapshot: the magic, the byte order and the offset and length of each section
+SNAPSHOT_HEADER = struct.Struct(f"=8sI4x{2 * len(SNAPSHOT_SECTIONS)}Q")
+
+
+# function that checks the records of a network, with the routes rebuilt from the next_stop links, and returns the
+# aggregates of the checks, raises a ValueError naming the checks that failed
+def check_network(records):
+    pipeline = CheckPipeline(default_checks(routes=True))
+    pipeline.update(records)
+    failed = [result.name for result in pipeline.results() if not result.ok]
+    if failed:
+        raise ValueError(f"The feed isn't a valid network, it fails the checks: {', '.join(failed)}.")
+    return pipeline.shared
+
+
+# function that checks the records of a feed and writes them into a snapshot, raises a ValueError naming the checks
+# that failed, the feed isn't written then
+def export_snapshot(records, file_name):
+    records = list(records)
+    shared = check_network(records)
+
+    # each stop name is stored once, in the order of its first record
+    names = {stop_name: code for code, stop_name in enumerate(dict.fromkeys(record["stop_name"] for record in records))}
+    encoded = [stop_name.encode("utf-8") for stop_name in names]
+    string_offsets = array("Q", [0])
+    for name in encoded:
+        string_offsets.append(string_offsets[-1] + len(name))
+
+    # the rows of the records of each bus line, in the order of its route, the bus lines are sorted by bus_id
+    rows = {(record["bus_id"], record["stop_id"]): row for row, record in enumerate(records)}
+    line_ids, route_offsets, route_rows = array("q"), array("Q", [0]), array("I")
+    for route in shared.route_index.routes():
+        line_ids.append(route.bus_id)
+        route_rows.extend(rows[route.bus_id, stop[0]] for stop in route.stops)
+        route_offsets.append(len(route_rows))
+
+    special_offsets, special_names = array("Q", [0]), array("I")
+    for stop_names in (shared.starting_point_set, shared.transfer_stop_set, shared.final_stop_set,
+                       shared.ondemand_stop_set):
+        special_names.extend(sorted(map(names.__getitem__, stop_names)))
+        special_offsets.append(len(special_names))
+
+    sections = {
+        "bus_id": array("q", [record["bus_id"] for record in records]),
+        "stop_id": array("q", [record["stop_id"] for record in records]),
+        "next_stop": array("q", [record["next_stop"] for record in records]),
+        "line_ids": line_ids, "route_offsets": route_offsets, "string_offsets": string_offsets,
+        "special_offsets": special_offsets, "route_rows": route_rows,
+        "stop_name": array("I", [names[record["stop_name"]] for record in records]),
+        "special_names": special_names,
+        "a_time": array("h", [time_to_minutes(record["a_time"]) for record in records]),
+        "stop_type": array("B", [STOP_TYPES.index(record["stop_type"]) for record in records]),
+        "strings": array("B", b"".join(encoded)),
+    }
+    write_snapshot(sections, file_name)
+
+
+# function that writes the sections of a snapshot, each one starts at a multiple of 8 bytes, the file is replaced at
+# once so the processes that mapped the old one keep reading it
+def write_snapshot(sections, file_name):
+    layout, offset = [], SNAPSHOT_HEADER.size
+    for name, typecode in SNAPSHOT_SECTIONS:
+        layout += [offset, len(sections[name])]
+        offset += -(-len(sections[name]) * sections[name].itemsize // 8) * 8
+
+    with open(file_name + ".tmp", "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_BYTE_ORDER, *layout))
+        for name, typecode in SNAPSHOT_SECTIONS:
+            data = sections[name].tobytes()
+            f.write(data + bytes(-len(data) % 8))
+    os.replace(file_name + ".tmp", file_name)
+
+
+# validated network read from a snapshot: the sections are views of the memory-mapped file, nothing is parsed or
+# copied when it's opened, the stop names are decoded when they're read
+class Snapshot:
+    def __init__(self, file_name):
+        with open(file_name, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = [memoryview(self.mmap)]
+
+        magic, byte_order, *layout = SNAPSHOT_HEADER.unpack_from(self.mmap)
+        if magic != SNAPSHOT_MAGIC or byte_order != SNAPSHOT_BYTE_ORDER:
+            self.close()
+            raise ValueError(f"{file_name} isn't a snapshot of this machine's byte order.")
+
+        for (name, typecode), offset, length in zip(SNAPSHOT_SECTIONS, layout[::2], layout[1::2]):
+            view = self.views[0][offset:offset + length * array(typecode).itemsize].cast(typecode)
+            self.views.append(view)
+            setattr(self, name, view)
+
+        # code of each stop name, built when a stop name is first looked up
+        self.name_codes = None
+
+    def __len__(self):
+        return len(self.bus_id)
+
+    # returns the stop name of a code
+    def stop_name_of(self, code):
+        return str(self.strings[self.string_offsets[code]:self.string_offsets[code + 1]], "utf-8")
+
+    # returns the code of a stop name, or -1 if no record has it
+    def code_of(self, stop_name):
+        if self.name_codes is None:
+            self.name_codes = {self.stop_name_of(code): code for code in range(len(self.string_offsets) - 1)}
+        return self.name_codes.get(stop_name, -1)
+
+    # returns the record of a row, as it was in the feed
+    def record(self, row):
+        return {"bus_id": self.bus_id[row], "stop_id": self.stop_id[row],
+                "stop_name": self.stop_name_of(self.stop_name[row]), "next_stop": self.next_stop[row],
+                "stop_type": STOP_TYPES[self.stop_type[row]], "a_time": minutes_to_time(self.a_time[row])}
+
+    # yields the records in the order of the feed
+    def records(self):
+        return map(self.record, range(len(self)))
+
+    # returns the rows of the records of a bus line in the order of its route
+    def route(self, bus_id):
+        line = bisect_left(self.line_ids, bus_id)
+        if line == len(self.line_ids) or self.line_ids[line] != bus_id:
+            raise KeyError(bus_id)
+        return self.route_rows[self.route_offsets[line]:self.route_offsets[line + 1]].tolist()
+
+    # returns the stop names of a kind of special stops: start, transfer, finish or on_demand
+    def special_stops(self, kind):
+        line = SPECIAL_STOP_KINDS.index(kind)
+        codes = self.special_names[self.special_offsets[line]:self.special_offsets[line + 1]]
+        return {self.stop_name_of(code) for code in codes}
+
+    # releases the views before the file is unmapped
+    def close(self):
+        for view in reversed(self.views):
+            view.release()
+        self.mmap.close()
+
+
+# leg of a journey: the bus line taken, the stops and minutes since midnight of the departure and of the arrival
+class Leg:
+    def __init__(self, bus_id, from_stop, departure, to_stop, arrival):
+        self.bus_id = bus_id
+        self.from_stop, self.departure = from_stop, departure
+        self.to_stop, self.arrival = to_stop, arrival
+
+    # returns the leg as a dict, with the times in the HH:MM format
+    def as_dict(self):
+        return {"bus_id": self.bus_id, "from": self.from_stop, "departure": minutes_to_time(self.departure),
+                "to": self.to_stop, "arrival": minutes_to_time(self.arrival)}
+
+
+# journey found by the planner, from the minutes the rider is at the first stop to the arrival, the journey from a stop
+# to itself has no legs
+class Journey:
+    def __init__(self, departure, arrival, legs):
+        self.departure, self.arrival = departure, arrival
+        self.legs = legs
+
+    # returns the journey as a dict, with the times in the HH:MM format
+    def as_dict(self):
+        return {"departure": minutes_to_time(self.departure), "arrival": minutes_to_time(self.arrival),
+                "legs": [leg.as_dict() for leg in self.legs]}
+
+
+# earliest arrival queries on a validated network, answered by a scan of its connections, the rides between two
+# consecutive stops of a bus line, in the order of their departures. Each bus line runs once along its route, a rider
+# changes bus lines at the transfer stops only and the on-demand stops, served for the riders who start or end there,
+# are never transfer stops. The routes are the bus_id and the (stop_name, minutes) of the stops of each bus line
+class JourneyPlanner:
+    def __init__(self, routes, transfer_stops, transfer_minutes=0):
+        # code of each stop name, bus_id of each bus line and (departure, arrival, from stop, to stop, bus line) of
+        # each connection, sorted
+        self.stop_codes, self.bus_ids, self.connections = {}, [], []
+        for line, (bus_id, stops) in enumerate(routes):
+            self.bus_ids.append(bus_id)
+            codes = [self.stop_codes.setdefault(stop_name, len(self.stop_codes)) for stop_name, minutes in stops]
+            times = [minutes for stop_name, minutes in stops]
+            self.connections += zip(times, times[1:], codes, codes[1:], [line] * len(codes))
+        self.connections.sort()
+        self.departures = [connection[0] for connection in self.connections]
+        self.stop_names = list(self.stop_codes)
+
+        # whether each stop is a transfer stop
+        self.transfers = [stop_name in transfer_stops for stop_name in self.stop_names]
+        self.transfer_minutes = transfer_minutes
+
+        # departures of each stop with the index of their connection, in order, and the last minutes a bus line arrives
+        # at each stop, -1 if none does
+        self.stop_departures = [([], []) for stop_name in self.stop_names]
+        self.last_arrivals = [-1] * len(self.stop_names)
+        for index, (departure, arrival, from_stop, to_stop, line) in enumerate(self.connections):
+            self.stop_departures[from_stop][0].append(departure)
+            self.stop_departures[from_stop][1].append(index)
+            self.last_arrivals[to_stop] = max(self.last_arrivals[to_stop], arrival)
+
+        # last minutes each bus line that reaches each stop arrives at it, and the last minutes a rider can board a bus
+        # line at a transfer stop and ride it to each stop, -1 if none can
+        self.stop_lines = [{} for stop_name in self.stop_names]
+        self.last_boardings = [-1] * len(self.stop_names)
+        for line, (bus_id, stops) in enumerate(routes):
+            last_boarding = -1
+            for (stop_name, minutes), (next_name, next_minutes) in zip(stops, stops[1:]):
+                if self.transfers[self.stop_codes[stop_name]]:
+                    last_boarding = minutes
+                next_stop = self.stop_codes[next_name]
+                self.stop_lines[next_stop][line] = next_minutes
+                self.last_boardings[next_stop] = max(self.last_boardings[next_stop], last_boarding)
+
+    # returns the planner of the records of a network, which must pass the checks
+    @classmethod
+    def from_records(cls, records, transfer_minutes=0):
+        shared = check_network(records)
+        routes = [(route.bus_id, [(stop[3], time_to_minutes(stop[2])) for stop in route.stops])
+                  for route in shared.route_index.routes()]
+        return cls(routes, shared.transfer_stop_set - shared.ondemand_stop_set, transfer_minutes)
+
+    # returns the planner of the network of a snapshot
+    @classmethod
+    def from_snapshot(cls, snapshot, transfer_minutes=0):
+        names = [snapshot.stop_name_of(code) for code in range(len(snapshot.string_offsets) - 1)]
+        routes = []
+        for line, bus_id in enumerate(snapshot.line_ids):
+            rows = snapshot.route_rows[snapshot.route_offsets[line]:snapshot.route_offsets[line + 1]]
+            routes.append((bus_id, [(names[snapshot.stop_name[row]], snapshot.a_time[row]) for row in rows]))
+        return cls(routes, snapshot.special_stops("transfer") - snapshot.special_stops("on_demand"), transfer_minutes)
+
+    # returns the code of a stop name, raises a KeyError if no bus line serves it
+    def stop_code(self, stop_name):
+        if stop_name not in self.stop_codes:
+            raise KeyError(stop_name)
+        return self.stop_codes[stop_name]
+
+    # scans the connections from a stop at some minutes and returns the arrival at each stop, infinite for the stops
+    # not reached, the connection that reaches each stop and the connection each bus line is boarded at, until the
+    # arrivals at the targets can't improve
+    def scan(self, origin, departure, targets):
+        never = float("inf")
+        arrivals, reached_by, boarded = [never] * len(self.stop_names), {}, [None] * len(self.bus_ids)
+        arrivals[origin] = departure
+
+        # minutes from which each stop can be left on another bus line
+        ready = [never] * len(self.stop_names)
+        ready[origin] = departure
+        transfers, transfer_minutes = self.transfers, self.transfer_minutes
+
+        # the connections before the first departure from the origin can't be taken
+        times, indexes = self.stop_departures[origin]
+        position = bisect_left(times, departure)
+        start = indexes[position] if position < len(times) else len(self.connections)
+
+        # a bus line that reaches a target is boarded at the origin or at a transfer stop, so once the last of these
+        # boardings is gone the scan only waits for the bus lines boarded so far to arrive: the limits are the minutes
+        # from which no connection can improve the arrival at each target, and the scan ends after the first arrival
+        # at the targets or their limits
+        connections, stop_lines = self.connections, self.stop_lines
+        limits, reaching = {}, {}
+        for target in targets:
+            limits[target] = self.last_boardings[target] + 1
+            for line in stop_lines[target]:
+                reaching.setdefault(line, []).append(target)
+        for index in indexes[position:]:
+            connection_departure, line = connections[index][0], connections[index][4]
+            for target in reaching.get(line, ()):
+                limits[target] = max(limits[target], connection_departure + 1)
+        bound = max(min(arrivals[target], limits[target]) for target in targets)
+
+        # the limits never go past the last arrival at the targets
+        end = bisect_left(self.departures, max(min(arrivals[target], self.last_arrivals[target] + 1)
+                                               for target in targets), start)
+        for connection in connections[start:end]:
+            connection_departure, arrival, from_stop, to_stop, line = connection
+            if connection_departure >= bound:
+                break
+            if boarded[line] is None:
+                if ready[from_stop] > connection_departure:
+                    continue
+                boarded[line] = connection
+                if line in reaching:
+                    for target in reaching[line]:
+                        limits[target] = max(limits[target], stop_lines[target][line])
+                    bound = max(min(arrivals[target], limits[target]) for target in targets)
+            if arrival < arrivals[to_stop]:
+                arrivals[to_stop], reached_by[to_stop] = arrival, connection
+                if transfers[to_stop]:
+                    ready[to_stop] = arrival + transfer_minutes
+                if to_stop in targets:
+                    bound = max(min(arrivals[target], limits[target]) for target in targets)
+        return arrivals, reached_by, boarded
+
+    # returns the journey to a stop from the connections of a scan, or None if the scan didn't reach it
+    def journey(self, origin, departure, destination, arrivals, reached_by, boarded):
+        if destination != origin and destination not in reached_by:
+            return None
+
+        legs, stop = [], destination
+        while stop != origin:
+            arrival, line = reached_by[stop][1], reached_by[stop][4]
+            connection_departure, from_stop = boarded[line][0], boarded[line][2]
+            legs.append(Leg(self.bus_ids[line], self.stop_names[from_stop], connection_departure,
+                            self.stop_names[stop], arrival))
+            stop = from_stop
+        return Journey(departure, arrivals[destination], legs[::-1])
+
+    # returns the earliest journeys of (origin, destination, departure) queries, the departures in the HH:MM format,
+    # None for the destinations that can't be reached, the queries from a stop at the same time share their scan
+    def earliest_arrivals(self, queries):
+        queries = list(queries)
+        groups = {}
+        for query, (origin, destination, departure) in enumerate(queries):
+            minutes = time_to_minutes(departure)
+            if minutes is None:
+                raise ValueError(f"Wrong departure time: {departure}.")
+            groups.setdefault((self.stop_code(origin), minutes), []).append((query, self.stop_code(destination)))
+
+        journeys = [None] * len(queries)
+        for (origin, departure), destinations in groups.items():
+            scan = self.scan(origin, departure, {destination for query, destination in destinations})
+            for query, destination in destinations:
+                journeys[query] = self.journey(origin, departure, destination, *scan)
+        return journeys
+
+    # returns the earliest journey from a stop to another one, leaving at or after a time in the HH:MM format, or None
+    # if the destination can't be reached
+    def earliest_arrival(self, origin, destination, departure):
+        return self.earliest_arrivals([(origin, destination, departure)])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation of the Easy Rider bus stops.")
+    parser.add_argument("file", nargs="?", help="JSON file with the array of stops, read as a stream.")
+    parser.add_argument("--stream", action="store_true", help="Read the standard input as a stream.")
+    parser.add_argument("--routes", action="store_true",
+                        help="Follow the next_stop links of each bus line, so the records can come in any order.")
+    parser.add_argument("--by-line", action="store_true",
+                        help="Check the arrival times along the records of each bus line on its own, whatever the "
+                             "records of the other bus lines between them.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes that check the bus lines.")
+    parser.add_argument("--state", help="SQLite database of the incremental validation, the feed is loaded into it "
+                                        "unless deltas are given, the routes are checked as with --routes.")
+    parser.add_argument("--deltas", help="JSON lines file of insert, update and delete deltas applied to the state, "
+                                         "the report covers the bus lines they touch.")
+    parser.add_argument("--collect-all", action="store_true",
+                        help="Go on after the errors of the records instead of stopping each check at the first one.")
+    parser.add_argument("--format", choices=("text", "json", "jsonl"), default="text",
+                        help="Format of the report: text, the results of the checks as a JSON document or as JSON "
+                             "lines.")
+    parser.add_argument("--snapshot", help="Binary snapshot the feed is written into, once it passes the checks with "
+                                           "its routes rebuilt from the next_stop links.")
+    args = parser.parse_args()
+    if args.state and args.collect_all:
+        parser.error("--collect-all can't be used with --state")
+
+    # the state of another version of the validation can't be read
+    try:
+        validator = IncrementalValidator(args.state) if args.state else None
+    except ValueError as error:
+        sys.exit(str(error))
+
+    if args.state and args.deltas:
+        with contextlib.closing(validator), open(args.deltas, encoding="utf-8") as f:
+            validator.report(validator.apply(json.loads(line) for line in f if line.strip()), args.format)
+        return
+
+    # a file, or the standard input with --stream, is parsed incrementally, else the input json string is converted
+    with (open(args.file, encoding="utf-8") if args.file else contextlib.nullcontext(sys.stdin)) as f:
+        records = iter_json_array(f) if args.file or args.stream else json.loads(input())
+        if args.snapshot:
+            try:
+                export_snapshot(records, args.snapshot)
+            except ValueError as error:
+                sys.exit(str(error))
+        elif args.state:
+            with contextlib.closing(validator):
+                validator.load(records)
+                validator.report(output_format=args.format)
+        elif args.jobs > 1:
+            run_checks_parallel(records, args.jobs, args.routes, args.by_line, args.collect_all, args.format)
+        else:
+            run_checks(records, default_checks(args.routes, args.by_line, args.collect_all), args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+# imports the necessary packages
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from easy_rider import (default_checks, get_bus_line_info, is_valid_date, JourneyPlanner, main as easy_rider_main,
+                        on_demand_stop_test, run_checks, time_facts, time_to_minutes, TIME_FORMAT_PATTERN,
+                        validate_arrival_time, validate_fields, validate_fields_regex, validate_start_stop)
+
+
+# stop names and stop types used to build the synthetic records
+STOP_NAMES = ["Prospekt Avenue", "Sesame Street", "Elm Street", "Fifth Avenue", "Pilotow Street", "Bourbon Street",
+              "Sunset Boulevard", "Startowa Street", "Khrestyatik Avenue", "Lombard Street", "Bakery Road"]
+STOP_TYPES = ["S", "", "", "O", "", "F"]
+
+# malformed times mixed in the synthetic records
+BAD_TIMES = ["8:5", "29:00", "08:1x", "24:00", "", "09:70", "08:123"]
+
+# kinds of the street of the synthetic stop names, which have the format of a valid stop name
+STREET_TYPES = ["Street", "Avenue", "Road", "Boulevard"]
+
+# kinds of errors mixed in the records of a synthetic network, each one fails a different check
+ERROR_KINDS = ["type", "stop_name", "stop_type", "time_format", "time_order"]
+
+# validators of the stops, in the order of their reports, each one runs its check of the pipeline over the records
+VALIDATORS = [("validate_fields", validate_fields), ("validate_fields_regex", validate_fields_regex),
+              ("get_bus_line_info", get_bus_line_info), ("validate_start_stop", validate_start_stop),
+              ("validate_arrival_time", validate_arrival_time), ("on_demand_stop_test", on_demand_stop_test)]
+
+# scenarios measured for each size of network: each validator, the single-pass pipeline of the checks and the whole
+# main() flow, which reads the file as a stream
+SCENARIOS = [name for name, validator in VALIDATORS] + ["pipeline", "main"]
+
+# default numbers of records of the networks measured
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+# function that returns a reproducible list of bus stop records, each line runs from 05:00 with a few minutes between
+# its stops and some of its times are malformed
+def generate_records(num_records, seed=0):
+    rng = random.Random(seed)
+    records = []
+    bus_id = 0
+    while len(records) < num_records:
+        a_time = rng.randint(300, 600)
+        for stop_id, stop_type in enumerate(STOP_TYPES, start=1):
+            a_time += rng.randint(1, 15)
+            records.append({"bus_id": bus_id, "stop_id": stop_id, "stop_name": rng.choice(STOP_NAMES),
+                            "next_stop": stop_id + 1 if stop_type != "F" else 0, "stop_type": stop_type,
+                            "a_time": f"{a_time // 60 % 24:02d}:{a_time % 60:02d}" if rng.random() > 0.001
+                            else rng.choice(BAD_TIMES)})
+        bus_id += 1
+    return records[:num_records]
+
+
+# function that yields the records of a synthetic bus network, one bus line after the other: each bus line runs from
+# its starting point to its final stop along stop_ids linked by next_stop, a transfer_density fraction of its stops
+# are named after stops shared with other bus lines, an ondemand_rate fraction of its middle stops are on-demand stops,
+# which are never shared, and an error_rate fraction of the records get one of the ERROR_KINDS
+def generate_network(lines, stops_per_line=10, transfer_density=0.2, ondemand_rate=0.05, error_rate=0.0, seed=0):
+    rng = random.Random(seed)
+
+    # each shared stop name is used by about 4 stops, the times of a bus line fit in a day up to about 1100 stops
+    shared_names = max(1, int(lines * stops_per_line * transfer_density / 4))
+    max_hop = max(1, min(5, 1100 // max(1, stops_per_line)))
+    for bus_id in range(1, lines + 1):
+        a_time = rng.randint(300, max(300, 1439 - max_hop * stops_per_line))
+        for stop_id in range(1, stops_per_line + 1):
+            if stop_id == 1:
+                stop_type = "S"
+            elif stop_id == stops_per_line:
+                stop_type = "F"
+            else:
+                stop_type = "O" if rng.random() < ondemand_rate else ""
+
+            if stop_type != "O" and rng.random() < transfer_density:
+                stop_name = f"Hub{rng.randrange(shared_names)} {STREET_TYPES[0]}"
+            else:
+                stop_name = f"Line{bus_id} Stop{stop_id} {rng.choice(STREET_TYPES)}"
+            record = {"bus_id": bus_id, "stop_id": stop_id, "stop_name": stop_name,
+                      "next_stop": stop_id + 1 if stop_id < stops_per_line else 0, "stop_type": stop_type,
+                      "a_time": f"{a_time // 60:02d}:{a_time % 60:02d}"}
+            a_time += rng.randint(1, max_hop)
+
+            if error_rate and rng.random() < error_rate:
+                error = rng.choice(ERROR_KINDS)
+                if error == "type":
+                    record["stop_id"] = str(stop_id)
+                elif error == "stop_name":
+                    record["stop_name"] = stop_name.lower()
+                elif error == "stop_type":
+                    record["stop_type"] = "X"
+                elif error == "time_format":
+                    record["a_time"] = rng.choice(BAD_TIMES)
+                else:
+                    record["a_time"] = "00:00"
+            yield record
+
+
+# function that writes the records of a network into a json file one at a time, returns the number of records
+def write_network(file_name, records):
+    count = 0
+    with open(file_name, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            f.write(("," if count else "") + json.dumps(record))
+            count += 1
+        f.write("]")
+    return count
+
+
+# function that returns the peak resident memory of the process in MB, ru_maxrss is in bytes on macOS and in
+# kilobytes elsewhere
+def peak_rss_mb():
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak_rss / (1 << 20) if sys.platform == "darwin" else peak_rss / 1024, 1)
+
+
+# function that measures a scenario on a network file of some records and returns its records/sec, peak memory and the
+# error that stopped it, if any, it runs in its own process so the peak memory only belongs to the scenario
+def measure(file_name, records_count, scenario, repeat):
+    # the validators and the pipeline check the records already parsed
+    records = None
+    if scenario != "main":
+        with open(file_name, encoding="utf-8") as f:
+            records = json.load(f)
+    loaded_rss_mb = peak_rss_mb()
+
+    if scenario == "pipeline":
+        def run():
+            run_checks(records, default_checks())
+    elif scenario == "main":
+        def run():
+            sys.argv = ["easy_rider.py", file_name]
+            easy_rider_main()
+    else:
+        validator = dict(VALIDATORS)[scenario]
+
+        def run():
+            validator(records)
+
+    best, error = float("inf"), None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                run()
+            except Exception as exception:
+                # the error of a record stops the validation, as it does in easy_rider.py
+                error = f"{type(exception).__name__}: {exception}"
+            best = min(best, time.perf_counter() - start)
+
+    return {"records": records_count, "seconds": round(best, 6), "records_per_sec": round(records_count / best, 1),
+            "loaded_rss_mb": loaded_rss_mb, "peak_rss_mb": peak_rss_mb(), "error": error}
+
+
+# function that writes a synthetic network into a json file
+def generate_file(args):
+    count = write_network(args.output, generate_network(args.lines, args.stops_per_line, args.transfer_density,
+                                                        args.ondemand_rate, args.error_rate, args.seed))
+    print(f"{count} records written to {args.output}")
+
+
+# function that generates a network of each size, measures every scenario in a fresh process and writes the results as
+# json
+def run_suite(args):
+    sizes = args.records or DEFAULT_SIZES
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "network": {"stops_per_line": args.stops_per_line, "transfer_density": args.transfer_density,
+                    "ondemand_rate": args.ondemand_rate, "error_rate": args.error_rate},
+        "sizes": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            file_name = os.path.join(directory, f"network_{size}.json")
+            lines = max(1, size // args.stops_per_line)
+            records_count = write_network(file_name, generate_network(lines, args.stops_per_line,
+                                                                      args.transfer_density, args.ondemand_rate,
+                                                                      args.error_rate, args.seed))
+            size_results = results["sizes"][str(size)] = {"records": records_count,
+                                                          "bytes": os.path.getsize(file_name), "scenarios": {}}
+
+            for scenario in SCENARIOS:
+                if args.scenario and scenario not in args.scenario:
+                    continue
+
+                # a scenario that runs out of memory kills its process, which is reported instead of the results
+                command = [sys.executable, os.path.abspath(__file__), "measure", file_name, str(records_count),
+                           scenario, "--repeat", str(args.repeat)]
+                process = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+                if process.returncode:
+                    result = {"error": f"The measure exited with status {process.returncode}."}
+                    print(f"{size:>10} {scenario:<22} {result['error']}", file=sys.stderr)
+                else:
+                    result = json.loads(process.stdout)
+                    print(f"{size:>10} {scenario:<22} {result['seconds']:>9.3f}s {result['records_per_sec']:>12,.0f} "
+                          f"records/s {result['peak_rss_mb']:>9.1f} MB", file=sys.stderr)
+                size_results["scenarios"][scenario] = result
+            os.remove(file_name)
+
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+# function that compares the results of a run against a baseline, exits with status 1 if the throughput of a scenario
+# regressed
+def compare_results(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = []
+    print(f"{'Records':>10} {'Scenario':<22}{'Baseline records/s':>20}{'Current records/s':>19}{'Change':>9}"
+          f"{'RSS MB':>18}")
+    for size, base_size in baseline["sizes"].items():
+        for scenario, base in base_size["scenarios"].items():
+            result = current["sizes"].get(size, {}).get("scenarios", {}).get(scenario)
+            if result is None or "records_per_sec" not in base or "records_per_sec" not in result:
+                continue
+
+            change = result["records_per_sec"] / base["records_per_sec"] - 1
+            print(f"{size:>10} {scenario:<22}{base['records_per_sec']:>20,.0f}{result['records_per_sec']:>19,.0f}"
+                  f"{change:>+9.1%}{base['peak_rss_mb']:>9.1f}{result['peak_rss_mb']:>9.1f}")
+            if change < -args.threshold:
+                regressions.append(f"{scenario} ({size} records)")
+
+    if regressions:
+        print(f"Throughput regression above {args.threshold:.0%}: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+# function that adds the options of the synthetic network to a command
+def add_network_arguments(command):
+    command.add_argument("--stops-per-line", type=int, default=10, help="Number of stops of each bus line.")
+    command.add_argument("--transfer-density", type=float, default=0.2,
+                         help="Fraction of the stops named after stops shared with other bus lines.")
+    command.add_argument("--ondemand-rate", type=float, default=0.05,
+                         help="Fraction of the middle stops that are on-demand stops.")
+    command.add_argument("--error-rate", type=float, default=0.0, help="Fraction of the records with an error.")
+    command.add_argument("--seed", type=int, default=0, help="Seed used to generate the network.")
+
+
+# copy of is_valid_date before the parsing layer, with its debug prints, the baseline of the comparison
+def legacy_is_valid_date(date_str):
+    # checks if it was given in the correct data type
+    if type(date_str) != str:
+        return False
+    # as it is a required field, checks if it was informed
+    elif len(date_str) < 5:
+        return False
+    # checks if it was informed in the correct format
+    elif (not date_str[:2].isdigit()) or \
+         (date_str[2] != ':') or \
+         (not date_str[3:].isdigit()):
+        return False
+    # checks if it is a valid time
+    elif (date_str[0] not in ['0', '1', '2']) or \
+         (date_str[3] not in ['0', '1', '2', '3', '4', '5']):
+        print(date_str[0])
+        print(date_str[3])
+        return False
+    else:
+        return True
+
+
+# function that handles the times as the checks did before the parsing layer: the format template is matched and
+# strptime is called for every record
+def parse_times_legacy(a_times):
+    errors = 0
+    for a_time in a_times:
+        if not legacy_is_valid_date(a_time):
+            errors += 1
+        if not re.match("^([0-1][0-9]|2[0-3]):([0-5][0-9])$", a_time):
+            errors += 1
+        try:
+            datetime.strptime(a_time, "%H:%M")
+        except ValueError:
+            errors += 1
+    return errors
+
+
+# function that handles the times with the precompiled patterns, without the cache
+def parse_times_uncached(a_times):
+    errors = 0
+    for a_time in a_times:
+        if not is_valid_date(a_time):
+            errors += 1
+        if not TIME_FORMAT_PATTERN.match(a_time):
+            errors += 1
+        if time_to_minutes(a_time) is None:
+            errors += 1
+    return errors
+
+
+# function that handles the times with the memoized facts of each time string
+def parse_times_cached(a_times):
+    errors = 0
+    for a_time in a_times:
+        valid, matched, minutes = time_facts(a_time)
+        errors += (not valid) + (not matched) + (minutes is None)
+    return errors
+
+
+# function that prints the records/sec of each way of parsing the times, the best of the runs is kept
+def compare_times(args):
+    a_times = [record["a_time"] for record in generate_records(args.records, args.seed)]
+    print(f"{len(a_times)} records, {len(set(a_times))} distinct times")
+
+    results = {}
+    for name, function in (("legacy", parse_times_legacy), ("uncached", parse_times_uncached),
+                           ("cached", parse_times_cached)):
+        best, errors = None, None
+        for _ in range(args.repeat):
+            time_facts.cache_clear()
+
+            # the debug prints of the legacy checks are part of their cost, but not of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                errors = function(a_times)
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = errors
+        print(f"{name:>8}: {best:7.3f} s  {len(a_times) / best:>12,.0f} records/sec  ({errors} errors)")
+
+    # every way must find the same errors
+    if len(set(results.values())) > 1:
+        raise SystemExit(f"The parsers disagree: {results}")
+
+
+# function that prints the latency of the earliest arrival queries of the journey planner on a synthetic network, one
+# query at a time, and the time per query of the batch API, fails if the p99 latency is over --max-p99
+def measure_planner(args):
+    records = list(generate_network(args.lines, args.stops_per_line, args.transfer_density, args.ondemand_rate,
+                                    seed=args.seed))
+    planner = JourneyPlanner.from_records(records)
+    rng = random.Random(args.seed)
+    queries = [(rng.choice(planner.stop_names), rng.choice(planner.stop_names),
+                f"{rng.randint(5, 19):02d}:{rng.randint(0, 59):02d}") for _ in range(args.queries)]
+    print(f"{len(records)} records, {len(planner.stop_names)} stops, {len(queries)} queries")
+
+    latencies, found = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        found += planner.earliest_arrival(*query) is not None
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"single: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {latencies[-1]:.2f} ms ({found} journeys found)")
+
+    start = time.perf_counter()
+    planner.earliest_arrivals(queries)
+    print(f" batch: {(time.perf_counter() - start) * 1000 / len(queries):.2f} ms per query")
+
+    if args.max_p99 is not None and p99 > args.max_p99:
+        raise SystemExit(f"The p99 latency {p99:.2f} ms is over {args.max_p99} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the Easy Rider validation.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    times = commands.add_parser("times", help="Compare the records/sec of the time parsing before and after the "
+                                              "parsing layer.")
+    times.add_argument("--records", type=int, default=1_000_000, help="Number of synthetic records.")
+    times.add_argument("--repeat", type=int, default=3, help="Number of runs of each parser, the best one is kept.")
+    times.add_argument("--seed", type=int, default=0, help="Seed used to generate the records.")
+    times.set_defaults(function=compare_times)
+
+    plan = commands.add_parser("plan", help="Measure the latency of the journey planner queries.")
+    plan.add_argument("--lines", type=int, default=10_000, help="Number of bus lines.")
+    plan.add_argument("--queries", type=int, default=2000, help="Number of random queries.")
+    plan.add_argument("--max-p99", type=float, metavar="MS", help="Fail if the p99 latency is over this many ms.")
+    add_network_arguments(plan)
+    plan.set_defaults(function=measure_planner)
+
+    generate = commands.add_parser("generate", help="Write a synthetic bus network into a JSON file.")
+    generate.add_argument("output", help="JSON file where the records are written.")
+    generate.add_argument("--lines", type=int, default=1000, help="Number of bus lines.")
+    add_network_arguments(generate)
+    generate.set_defaults(function=generate_file)
+
+    run = commands.add_parser("run", help="Measure every validator and the main() flow on networks of each size and "
+                                          "write the results as JSON.")
+    run.add_argument("-o", "--output", metavar="FILE", help="File where the results are written (default: stdout).")
+    run.add_argument("--records", type=int, action="append",
+                     help="Number of records of a network (can be repeated, default: 10k, 1M and 10M).")
+    run.add_argument("--repeat", type=int, default=3, help="Number of runs of each scenario, the best one is kept.")
+    run.add_argument("--scenario", action="append", choices=SCENARIOS,
+                     help="Only measure this scenario (can be repeated).")
+    add_network_arguments(run)
+    run.set_defaults(function=run_suite)
+
+    compare = commands.add_parser("compare", help="Fail if the throughput regressed against a baseline.")
+    compare.add_argument("baseline", help="JSON results of the baseline run.")
+    compare.add_argument("current", help="JSON results of the current run.")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="Maximum accepted throughput loss, as a fraction (default: 0.10).")
+    compare.set_defaults(function=compare_results)
+
+    # internal command, each scenario is measured in its own process
+    measure_command = commands.add_parser("measure")
+    measure_command.add_argument("file_name")
+    measure_command.add_argument("records", type=int)
+    measure_command.add_argument("scenario", choices=SCENARIOS)
+    measure_command.add_argument("--repeat", type=int, default=3)
+    measure_command.set_defaults(function=lambda args: print(json.dumps(measure(args.file_name, args.records,
+                                                                               args.scenario, args.repeat))))
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# imports the necessary packages
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import easy_rider
+
+
+# records of a valid network: bus line 128 runs along the stops 1, 3 and 5, bus line 256 along the stops 1 and 2
+NETWORK = [
+    {"bus_id": 128, "stop_id": 1, "stop_name": "Prospekt Avenue", "next_stop": 3, "stop_type": "S", "a_time": "08:12"},
+    {"bus_id": 128, "stop_id": 3, "stop_name": "Elm Street", "next_stop": 5, "stop_type": "", "a_time": "08:19"},
+    {"bus_id": 128, "stop_id": 5, "stop_name": "Fifth Avenue", "next_stop": 0, "stop_type": "F", "a_time": "08:37"},
+    {"bus_id": 256, "stop_id": 1, "stop_name": "Pilotow Street", "next_stop": 2, "stop_type": "S", "a_time": "09:20"},
+    {"bus_id": 256, "stop_id": 2, "stop_name": "Elm Street", "next_stop": 0, "stop_type": "F", "a_time": "09:45"},
+]
+
+
+# function that returns what a function prints
+def printed(function, *args, **kwargs):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        function(*args, **kwargs)
+    return output.getvalue()
+
+
+# function that returns what the main function prints with the given arguments and standard input
+def printed_main(arguments, stdin):
+    argv, sys.argv = sys.argv, ["easy_rider.py"] + arguments
+    stdin, sys.stdin = sys.stdin, io.StringIO(stdin)
+    try:
+        return printed(easy_rider.main)
+    finally:
+        sys.argv, sys.stdin = argv, stdin
+
+
+# incremental parsing of a JSON array against json.loads
+class IterJsonArrayTest(unittest.TestCase):
+    # document whose strings hold escapes, delimiters and non-ASCII characters
+    DOCUMENT = json.dumps([
+        {"stop_name": "Elm \"Street\"", "a_time": "08:12"},
+        ["a\\b", "[1, 2]", "}{", "\u00e9\ud83d\ude8c", "\n"],
+        12345, -1.5e3, True, None, "", {},
+    ]) + " \n"
+
+    @staticmethod
+    def parse(text, chunk_size):
+        return list(easy_rider.iter_json_array(io.StringIO(text), chunk_size))
+
+    def test_chunk_boundaries(self):
+        # the chunks split the document at every position
+        for chunk_size in range(1, len(self.DOCUMENT) + 1):
+            self.assertEqual(self.parse(self.DOCUMENT, chunk_size), json.loads(self.DOCUMENT), chunk_size)
+
+    def test_escapes(self):
+        text = json.dumps(["\\\"", "\\", "\u20ac", "\t,]"], ensure_ascii=True)
+        self.assertEqual(self.parse(text, 3), ["\\\"", "\\", "\u20ac", "\t,]"])
+
+    def test_empty(self):
+        self.assertEqual(self.parse(" [ ] ", 1), [])
+        self.assertEqual(self.parse("[]", 1 << 16), [])
+
+    def test_truncated(self):
+        for end in range(len(self.DOCUMENT.rstrip()) - 1):
+            with self.assertRaises(json.JSONDecodeError, msg=self.DOCUMENT[:end]):
+                self.parse(self.DOCUMENT[:end], 4)
+
+    def test_malformed(self):
+        for text in ("", "{}", "[1 2]", "[1,]", "[,1]", "[1,,2]", '["a]', "[tru]", "[{]"):
+            for chunk_size in (1, 1 << 16):
+                with self.assertRaises(json.JSONDecodeError, msg=text):
+                    self.parse(text, chunk_size)
+
+    def test_elements_before_the_error(self):
+        elements = easy_rider.iter_json_array(io.StringIO("[1, 2 3]"), 1)
+        self.assertEqual([next(elements), next(elements)], [1, 2])
+        self.assertRaises(json.JSONDecodeError, next, elements)
+
+    def test_main_stream(self):
+        document = json.dumps(NETWORK)
+        report = printed_main([], document + "\n")
+        self.assertIn("Type and required field validation", report)
+        self.assertEqual(printed_main(["--stream"], document), report)
+
+        # the stream doesn't need the document on a single line
+        self.assertEqual(printed_main(["--stream"], json.dumps(NETWORK, indent=4)), report)
+
+        # and the file is read as a stream too
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "feed.json")
+            with open(file_name, "w", encoding="utf-8") as f:
+                json.dump(NETWORK, f, indent=4)
+            self.assertEqual(printed_main([file_name], ""), report)
+
+
+# incremental validation of the network against the checks of its whole feed with --routes
+class IncrementalValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "state.db")
+        self.validator = easy_rider.IncrementalValidator(self.file_name)
+
+    def tearDown(self):
+        self.validator.close()
+        self.directory.cleanup()
+
+    # returns the report of the whole feed checked at once
+    @staticmethod
+    def full_report(records):
+        return printed(easy_rider.run_checks, records, easy_rider.default_checks(routes=True))
+
+    def test_load(self):
+        self.validator.load(NETWORK)
+        self.assertEqual(printed(self.validator.report), self.full_report(NETWORK))
+
+    def test_insert_in_the_middle_of_a_route(self):
+        self.validator.load(NETWORK)
+        bus_ids = self.validator.apply([
+            {"op": "update", "bus_id": 128, "stop_id": 3, "next_stop": 4},
+            {"op": "insert", "bus_id": 128, "stop_id": 4, "stop_name": "Sesame Street", "next_stop": 5,
+             "stop_type": "", "a_time": "08:25"},
+        ])
+        self.assertEqual(bus_ids, [128])
+
+        report = printed(self.validator.report)
+        self.assertIn("Arrival time test:\nOK\n", report)
+        self.assertNotIn("wrong time", report)
+
+        records = NETWORK[:1] + [{**NETWORK[1], "next_stop": 4}] + NETWORK[2:] + \
+            [{"bus_id": 128, "stop_id": 4, "stop_name": "Sesame Street", "next_stop": 5, "stop_type": "",
+              "a_time": "08:25"}]
+        self.assertEqual(report, self.full_report(records))
+
+    def test_wrong_time_inserted(self):
+        self.validator.load(NETWORK)
+        self.validator.apply([
+            {"op": "update", "bus_id": 128, "stop_id": 3, "next_stop": 4},
+            {"op": "insert", "bus_id": 128, "stop_id": 4, "stop_name": "Sesame Street", "next_stop": 5,
+             "stop_type": "", "a_time": "08:15"},
+        ])
+        self.assertIn("bus_id line 128: wrong time on station Sesame Street", printed(self.validator.report, [128]))
+
+    def test_unordered_feed(self):
+        records = NETWORK[::-1]
+        self.validator.load(records)
+        report = printed(self.validator.report)
+        self.assertIn("Arrival time test:\nOK\n", report)
+        self.assertEqual(report, self.full_report(records))
+
+    def test_main_with_unordered_feed(self):
+        feed_name = os.path.join(self.directory.name, "feed.json")
+        with open(feed_name, "w", encoding="utf-8") as f:
+            json.dump(NETWORK[::-1], f)
+
+        report = printed_main([feed_name, "--state", os.path.join(self.directory.name, "main.db")], "")
+        self.assertIn("Route test:\nOK\nArrival time test:\nOK\n", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,71 +1,186 @@
-# imports the necessary packages
-import requests
-import string
-import os
-from bs4 import BeautifulSoup
-
-
-# removes punctuations and replaces whitespaces by _ in the article's title
-def adjust_title(title):
-    for letter in title:
-        if letter in string.punctuation:
-            title = title.replace(letter, '')
-    return title.replace(' ', '_') + '.txt'
-
-
-# retrieves the content of one article and saves it to a txt file
-def get_article_content(page_url, filename):
-    resp = requests.get(page_url, headers={'Accept-Language': 'en-US,en;q=0.5'})
-    if resp:
-        page = BeautifulSoup(resp.content, 'html.parser')
-        content = page.find('div', {'class': 'c-article-body'}).text.strip().encode()
-
-        # saves the article content into a file
-        with open(filename, 'wb') as file:
-            file.write(content)
-    else:
-        print("Error retrieving article '" + os.path.basename(filename) + "' content. Code " + str(resp.status_code) + ".")
-
-
-# variables initialization
-url = "https://www.nature.com/nature/articles?sort=PubDate&year=2020&page="
-articles_list = []
-
-# asks for the inputs
-print("How many pages?")
-num_pages = int(input())
-print("What type of articles?")
-article_type = input()
-
-# gets every article_type in the first num_pages of the url
-for num in range(1, num_pages + 1):
-    print(f"Processing page {num}...")
-
-    # tries to access the url in the 'num' page
-    response = requests.get(url + str(num), headers={'Accept-Language': 'en-US,en;q=0.5'})
-    if response:
-        # creates a directory for the page 'num'
-        dir_name = 'Page_' + str(num)
-        if not os.access(dir_name, os.F_OK):
-            os.mkdir(dir_name)
-
-        # parses the response HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # finds all the articles of the type "News"
-        for article in soup.find_all('article'):
-            if article.find('span', {'data-test': 'article.type'}).text.strip().lower() == article_type.lower():
-                # gets the url and the title of the article
-                article_url = article.find('a', {'data-track-action': 'view article'}).get('href').strip()
-                article_title = adjust_title(article.find('a', {'data-track-action': 'view article'}).text.strip())
-
-                # gets the article content
-                get_article_content("https://www.nature.com" + article_url, os.path.join(dir_name, article_title))
-
-                # saves the article title in an output list
-                articles_list.append(article_title)
-    else:
-        print("Error accessing url: code " + str(response.status_code) + ".")
-
-if len(articles_list) > 0:
-    print("Saved articles: ", articles_list)
+# imports the necessary packages
+import requests
+import string
+import os
+import threading
+import time
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlsplit
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+# the retries need the backoff_jitter of urllib3 2
+if int(urllib3.__version__.split('.')[0]) < 2:
+    raise ImportError("scraper.py needs urllib3 2.0 or later, found " + urllib3.__version__)
+
+
+# address of the listing pages, followed by the page number, and headers of every request
+URL = "https://www.nature.com/nature/articles?sort=PubDate&year=2020&page="
+HEADERS = {'Accept-Language': 'en-US,en;q=0.5'}
+
+# compressions the server can answer with, gzip and deflate, and br when the brotli package is installed
+HEADERS.update(make_headers(keep_alive=True, accept_encoding=True))
+
+# number of requests in flight, at most PER_HOST of them to the same host, whose starts are DELAY seconds apart
+CONCURRENCY = 8
+PER_HOST = 4
+DELAY = 0.0
+
+# seconds a request waits for the server before it fails
+TIMEOUT = 30
+
+# a request answered with one of these codes, or that fails to connect, is tried again up to RETRIES times: the first
+# retry is immediate and the n-th one waits BACKOFF * 2 ** (n - 1) seconds plus a random jitter of up to JITTER seconds,
+# unless a 429 or 503 answer has a Retry-After header, whose delay is used instead
+RETRIES = 5
+RETRY_CODES = (429, 500, 502, 503, 504)
+BACKOFF = 0.5
+JITTER = 0.5
+
+
+# politeness towards each host: a limit of requests in flight and a delay between the starts of two requests
+class HostLimiter:
+    def __init__(self, limit=PER_HOST, delay=DELAY):
+        self.limit = limit
+        self.delay = delay
+        self.lock = threading.Lock()
+
+        # semaphore of each host and time from which its next request can start
+        self.semaphores = {}
+        self.next_starts = {}
+
+    # waits for a free slot of the host of the url and holds it during the request
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            semaphore = self.semaphores.setdefault(host, threading.Semaphore(self.limit))
+
+        with semaphore:
+            with self.lock:
+                start = max(time.monotonic(), self.next_starts.get(host, 0))
+                self.next_starts[host] = start + self.delay
+            time.sleep(max(0, start - time.monotonic()))
+            yield
+
+
+# returns a session shared by all the fetches: its connections are kept alive and reused, with a pool of
+# pool_size connections to each host, and the transient errors are retried
+def make_session(pool_size=CONCURRENCY, retries=RETRIES):
+    retry = Retry(total=retries, status_forcelist=RETRY_CODES, backoff_factor=BACKOFF, backoff_jitter=JITTER,
+                  allowed_methods=['GET'], respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# gets a url through the session once the limiter allows it
+def fetch(url, limiter, session):
+    with limiter.slot(url):
+        return session.get(url, timeout=TIMEOUT)
+
+
+# removes punctuations and replaces whitespaces by _ in the article's title
+def adjust_title(title):
+    for letter in title:
+        if letter in string.punctuation:
+            title = title.replace(letter, '')
+    return title.replace(' ', '_') + '.txt'
+
+
+# retrieves the content of one article and saves it to a txt file as soon as it arrives
+def get_article_content(page_url, filename, limiter, session):
+    try:
+        resp = fetch(page_url, limiter, session)
+    except requests.RequestException as error:
+        print("Error retrieving article '" + os.path.basename(filename) + "' content. " + str(error) + ".")
+        return
+
+    if resp:
+        page = BeautifulSoup(resp.content, 'html.parser')
+        content = page.find('div', {'class': 'c-article-body'}).text.strip().encode()
+
+        # saves the article content into a file
+        with open(filename, 'wb') as file:
+            file.write(content)
+    else:
+        print("Error retrieving article '" + os.path.basename(filename) + "' content. Code "
+              + str(resp.status_code) + ".")
+
+
+# returns the url and the file name of the articles of a type in a listing page
+def find_articles(content, page_url, article_type, dir_name):
+    articles = []
+    soup = BeautifulSoup(content, 'html.parser')
+    for article in soup.find_all('article'):
+        if article.find('span', {'data-test': 'article.type'}).text.strip().lower() == article_type.lower():
+            # gets the url and the title of the article, the url can be relative to the listing page
+            link = article.find('a', {'data-track-action': 'view article'})
+            article_url = urljoin(page_url, link.get('href').strip())
+            articles.append((article_url, os.path.join(dir_name, adjust_title(link.text.strip()))))
+    return articles
+
+
+# gets every article of a type in the first num_pages listing pages and returns their titles, in the order of the
+# pages: the listing pages and the articles are fetched by a pool of threads, the pages are processed in their order,
+# the articles of a page are queued as soon as it's parsed and each article is saved as soon as it arrives
+def scrape(num_pages, article_type, url=URL, concurrency=CONCURRENCY, per_host=PER_HOST, delay=DELAY, directory="."):
+    limiter = HostLimiter(per_host, delay)
+    page_titles = {}
+    with make_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pages = [executor.submit(fetch, url + str(num), limiter, session) for num in range(1, num_pages + 1)]
+        downloads = []
+
+        # the next pages are fetched while one waits for its response
+        for num, future in enumerate(pages, start=1):
+            print(f"Processing page {num}...")
+
+            # tries to access the url in the 'num' page
+            try:
+                response = future.result()
+            except requests.RequestException as error:
+                print("Error accessing url: " + str(error) + ".")
+                continue
+            if not response:
+                print("Error accessing url: code " + str(response.status_code) + ".")
+                continue
+
+            # creates a directory for the page 'num'
+            dir_name = os.path.join(directory, 'Page_' + str(num))
+            os.makedirs(dir_name, exist_ok=True)
+
+            # queues the articles of the page
+            articles = find_articles(response.content, url + str(num), article_type, dir_name)
+            downloads += [executor.submit(get_article_content, article_url, filename, limiter, session)
+                          for article_url, filename in articles]
+            page_titles[num] = [os.path.basename(filename) for article_url, filename in articles]
+
+        # an article that failed unexpectedly doesn't stop the others
+        for future in wait(downloads).done:
+            if future.exception() is not None:
+                print("Error retrieving article: " + repr(future.exception()) + ".")
+
+    return [title for num in page_titles for title in page_titles[num]]
+
+
+def main():
+    # asks for the inputs
+    print("How many pages?")
+    num_pages = int(input())
+    print("What type of articles?")
+    article_type = input()
+
+    articles_list = scrape(num_pages, article_type)
+    if len(articles_list) > 0:
+        print("Saved articles: ", articles_list)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# imports the necessary packages
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scraper
+
+
+# number of listing pages served, articles of each page and seconds the server takes to answer an article
+PAGES = 4
+ARTICLES = 5
+ARTICLE_DELAY = 0.05
+
+
+# handler of the stub server: the listing pages link News articles on two hosts, 127.0.0.1 and localhost, and one
+# Research article, page 1 is the slowest one, an article of page 2 is missing and another one fails once
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        host = self.headers["Host"].split(":")[0]
+        with server.lock:
+            server.hits[self.path] += 1
+            server.in_flight[host] += 1
+            server.peaks[host] = max(server.peaks[host], server.in_flight[host])
+            server.peak = max(server.peak, sum(server.in_flight.values()))
+            hits = server.hits[self.path]
+        try:
+            code, body = self.answer(hits)
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+
+        body = body.encode()
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # returns the code and the body of the answer to the path, the hits of the path included this one
+    def answer(self, hits):
+        port = self.server.server_port
+        if "page=" in self.path:
+            num = int(self.path.split("page=")[1])
+            time.sleep(0.3 if num == 1 else 0.01)
+            links = [(f"http://{host}:{port}/articles/p{num}a{i}", "News", f"Title {num}-{i}!")
+                     for i, host in zip(range(ARTICLES), ["127.0.0.1", "localhost"] * ARTICLES)]
+            links.append((f"/articles/p{num}r", "Research", f"Research {num}"))
+            return 200, "".join(f'<article><span data-test="article.type">{article_type}</span>'
+                                f'<a data-track-action="view article" href="{href}">{title}</a></article>'
+                                for href, article_type, title in links)
+
+        time.sleep(ARTICLE_DELAY)
+        if self.path == "/articles/p2a1":
+            return 404, "not found"
+        if self.path == "/articles/p3a2" and hits == 1:
+            return 503, "busy"
+        return 200, f'<div class="c-article-body"> Body of {self.path} </div>'
+
+
+# scrapes the stub server with 8 threads and 2 requests in flight per host
+class ScrapeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.lock = threading.Lock()
+        cls.server.hits, cls.server.in_flight, cls.server.peaks = Counter(), Counter(), Counter()
+        cls.server.peak = 0
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.directory = tempfile.TemporaryDirectory()
+
+        cls.output = io.StringIO()
+        with contextlib.redirect_stdout(cls.output):
+            cls.titles = scraper.scrape(PAGES, "news", url=f"http://127.0.0.1:{cls.server.server_port}/articles?page=",
+                                        concurrency=8, per_host=2, directory=cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.directory.cleanup()
+
+    def test_titles_in_page_order(self):
+        self.assertEqual(self.titles, [f"Title_{num}{i}.txt" for num in range(1, PAGES + 1) for i in range(ARTICLES)])
+
+    def test_pages_processed_in_order(self):
+        lines = [line for line in self.output.getvalue().splitlines() if line.startswith("Processing page")]
+        self.assertEqual(lines, [f"Processing page {num}..." for num in range(1, PAGES + 1)])
+
+    def test_per_host_limit(self):
+        self.assertEqual(self.server.peaks["127.0.0.1"], 2)
+        self.assertEqual(self.server.peaks["localhost"], 2)
+
+        # the two hosts are fetched at the same time
+        self.assertGreater(self.server.peak, 2)
+
+    def test_articles_saved(self):
+        for num in range(1, PAGES + 1):
+            for i in range(ARTICLES):
+                file_name = os.path.join(self.directory.name, f"Page_{num}", f"Title_{num}{i}.txt")
+                if (num, i) == (2, 1):
+                    self.assertFalse(os.path.exists(file_name))
+                    continue
+                with open(file_name, encoding="utf-8") as file:
+                    self.assertEqual(file.read(), f"Body of /articles/p{num}a{i}")
+        self.assertEqual(self.server.hits["/articles/p1r"], 0)
+
+    def test_errors(self):
+        self.assertIn("Error retrieving article 'Title_21.txt' content. Code 404.", self.output.getvalue())
+
+        # the transient error is retried
+        self.assertEqual(self.server.hits["/articles/p3a2"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()